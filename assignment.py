@@ -0,0 +1,179 @@
+"""Batch assignment of drivers to riders
+
+This module builds travel time matrices between waiting riders and
+available drivers, and solves the assignment problem on them: pair up as
+many riders and drivers as possible, with the smallest total travel time.
+
+NumPy is used when it is installed. Without it, the same results are
+computed with plain Python lists.
+"""
+
+from typing import List, Sequence, Tuple
+from driver import Driver
+from location import paired_manhattan_distances
+from rider import Rider
+from travel import installed
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+
+def travel_time_matrix(riders: Sequence[Rider],
+                       drivers: Sequence[Driver]) -> list:
+    """Return a matrix whose entry [i][j] is the time <drivers>[j] takes to
+    reach <riders>[i], as a NumPy array if NumPy is installed and as a list
+    of lists otherwise.
+
+    Travel times are Manhattan distances divided by speed, rounded down,
+    computed for the whole matrix at once. If a travel service is
+    installed, every driver is asked for their travel time instead, as
+    Driver.get_travel_time gives it.
+
+    >>> from location import Location
+    >>> riders = [Rider("Almond", 5, Location(0, 0), Location(1, 1)),
+    ...           Rider("Bisque", 5, Location(4, 4), Location(1, 1))]
+    >>> drivers = [Driver("Amaranth", Location(1, 1), 1),
+    ...            Driver("Bergamot", Location(4, 0), 2)]
+    >>> [[int(time) for time in row]
+    ...  for row in travel_time_matrix(riders, drivers)]
+    [[2, 2], [6, 2]]
+    """
+    if np is None or installed() is not None:
+        return [[driver.get_travel_time(rider.origin) for driver in drivers]
+                for rider in riders]
+    rider_rows = np.array([rider.origin.row for rider in riders],
+                          dtype=np.int64)
+    rider_cols = np.array([rider.origin.column for rider in riders],
+                          dtype=np.int64)
+    driver_rows = np.array([driver.location.row for driver in drivers],
+                           dtype=np.int64)
+    driver_cols = np.array([driver.location.column for driver in drivers],
+                           dtype=np.int64)
+    speeds = np.array([driver.speed for driver in drivers], dtype=np.int64)
+    distances = paired_manhattan_distances(
+        rider_rows[:, None], rider_cols[:, None],
+        driver_rows[None, :], driver_cols[None, :])
+    return distances // speeds[None, :]
+
+
+def min_cost_assignment(cost: list) -> List[Tuple[int, int]]:
+    """Return the (row, column) pairs of a minimum-cost assignment for the
+    integer matrix <cost>, in increasing order of row.
+
+    Every row is assigned a distinct column if there are at least as many
+    columns as rows; otherwise every column is assigned a distinct row.
+
+    >>> min_cost_assignment([[4, 1, 3], [2, 0, 5], [3, 2, 2]])
+    [(0, 1), (1, 0), (2, 2)]
+    >>> min_cost_assignment([[1, 9], [2, 9], [0, 3]])
+    [(0, 0), (2, 1)]
+    >>> min_cost_assignment([])
+    []
+    """
+    if len(cost) == 0 or len(cost[0]) == 0:
+        return []
+    if len(cost) > len(cost[0]):
+        transposed = [list(column) for column in zip(*cost)]
+        return sorted((i, j) for j, i in _hungarian(transposed))
+    return _hungarian(cost)
+
+
+def _hungarian(cost: list) -> List[Tuple[int, int]]:
+    """Return a minimum-cost assignment of every row of <cost> to a distinct
+    column, as (row, column) pairs in increasing order of row.
+
+    This is the O(n^2 m) Hungarian algorithm with row and column
+    potentials. When NumPy is installed, each step updates every column at
+    once; ties are broken towards the lowest column either way.
+
+    Precondition: 0 < len(cost) <= len(cost[0])
+    """
+    if np is not None:
+        return _hungarian_numpy(np.asarray(cost, dtype=np.int64))
+    rows, cols = len(cost), len(cost[0])
+    infinity = float('inf')
+    # Index 0 is a sentinel column; p[j] is the row (1-based) assigned to
+    # column j, and way[j] is the previous column on the augmenting path.
+    u = [0] * (rows + 1)
+    v = [0] * (cols + 1)
+    p = [0] * (cols + 1)
+    way = [0] * (cols + 1)
+    for i in range(1, rows + 1):
+        p[0] = i
+        j0 = 0
+        minv = [infinity] * (cols + 1)
+        used = [False] * (cols + 1)
+        while p[j0] != 0:
+            used[j0] = True
+            row = cost[p[j0] - 1]
+            u_i0 = u[p[j0]]
+            delta = infinity
+            j1 = 0
+            for j in range(1, cols + 1):
+                if not used[j]:
+                    current = row[j - 1] - u_i0 - v[j]
+                    if current < minv[j]:
+                        minv[j] = current
+                        way[j] = j0
+                    if minv[j] < delta:
+                        delta = minv[j]
+                        j1 = j
+            for j in range(cols + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+        while j0 != 0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    return sorted((p[j] - 1, j - 1) for j in range(1, cols + 1) if p[j])
+
+
+def _hungarian_numpy(cost: 'np.ndarray') -> List[Tuple[int, int]]:
+    """Return the same assignment as _hungarian, using NumPy arrays.
+
+    Precondition: 0 < cost.shape[0] <= cost.shape[1]
+    """
+    rows, cols = cost.shape
+    infinity = np.iinfo(np.int64).max // 4
+    u = np.zeros(rows + 1, dtype=np.int64)
+    v = np.zeros(cols + 1, dtype=np.int64)
+    p = np.zeros(cols + 1, dtype=np.int64)
+    way = np.zeros(cols + 1, dtype=np.int64)
+    for i in range(1, rows + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(cols + 1, infinity, dtype=np.int64)
+        used = np.zeros(cols + 1, dtype=bool)
+        while p[j0] != 0:
+            used[j0] = True
+            i0 = p[j0]
+            current = cost[i0 - 1] - u[i0] - v[1:]
+            free = ~used[1:]
+            better = free & (current < minv[1:])
+            minv[1:][better] = current[better]
+            way[1:][better] = j0
+            candidates = np.where(free, minv[1:], infinity)
+            j1 = int(np.argmin(candidates)) + 1
+            delta = candidates[j1 - 1]
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[~used] -= delta
+            j0 = j1
+        while j0 != 0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    return sorted((int(p[j]) - 1, j - 1) for j in range(1, cols + 1) if p[j])
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(
+        config={'extra-imports': ['typing', 'numpy', 'driver', 'location',
+                                  'rider', 'travel']})
@@ -0,0 +1,764 @@
+"""Micro-benchmarks for the simulation
+
+Run this module directly to print timings for the simulation's data
+structures. Each benchmark returns its measurements so that they can also
+be used from an interactive session.
+"""
+
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from operator import attrgetter
+from random import Random
+from time import perf_counter
+from typing import Callable, Dict, List, Optional
+from container import CalendarQueue, Container, PriorityQueue
+from dispatcher import Dispatcher, FLEET, GRID, LINEAR, NEAREST, OLDEST
+from driver import Driver
+from event import Event, create_event_list, stream_events
+from loader import EventFile, convert_events, read_events
+from location import Location, manhattan_distance, manhattan_distances
+from monitor import DRIVER, DROPOFF, Monitor, PICKUP, REQUEST, RIDER
+from rider import Rider
+from roads import DistanceOracle, load_road_network
+from shard import ShardedStrategy
+from simulation import Simulation
+from strategy import BatchStrategy, DispatchStrategy, FleetStrategy, \
+    GridStrategy, LinearStrategy
+from travel import TravelTimes, install
+
+
+class _SortedListQueue(Container):
+    """The original sorted-list priority queue, kept as a baseline.
+
+    add() finds the insertion point with a linear scan and remove() pops
+    the front of the list, so both operations are O(n).
+    """
+
+    # === Private Attributes ===
+    _items: list
+    #     The items stored in the queue, in priority order.
+
+    def __init__(self) -> None:
+        """Initialize an empty _SortedListQueue.
+
+        """
+        self._items = []
+
+    def add(self, item: object) -> None:
+        """Add <item> to this queue.
+
+        """
+        for index, list_item in enumerate(self._items):
+            if item < list_item:
+                self._items.insert(index, item)
+                return None
+        self._items.append(item)
+        return None
+
+    def remove(self) -> object:
+        """Remove and return the next item from this queue.
+
+        """
+        return self._items.pop(0)
+
+    def peek(self) -> object:
+        """Return the next item in this queue without removing it.
+
+        """
+        return self._items[0]
+
+    def is_empty(self) -> bool:
+        """Return True iff this queue is empty.
+
+        """
+        return len(self._items) == 0
+
+
+class _CountingQueue(PriorityQueue):
+    """A PriorityQueue that counts the items removed from it.
+
+    === Attributes ===
+    removed: The number of items removed so far.
+    """
+    # Attribute Types
+    removed: int
+
+    def __init__(self) -> None:
+        """Initialize an empty _CountingQueue, keyed by timestamp like the
+        simulation's default event queue.
+
+        """
+        super().__init__(attrgetter('timestamp'))
+        self.removed = 0
+
+    def remove(self) -> object:
+        """Remove and return the next item from this queue.
+
+        """
+        self.removed += 1
+        return super().remove()
+
+
+STRATEGIES = {
+    'linear': LinearStrategy,
+    'grid': GridStrategy,
+    'fleet': FleetStrategy,
+    'sharded': ShardedStrategy,
+    'batch2': lambda: BatchStrategy(2),
+}
+
+
+def _time_queue(make_queue: Callable[[], Container],
+                timestamps: List[int]) -> float:
+    """Return the seconds taken to add and then remove one Event per
+    timestamp in <timestamps> using a queue built by <make_queue>.
+    """
+    queue = make_queue()
+    events = [Event(timestamp) for timestamp in timestamps]
+    start = perf_counter()
+    for event in events:
+        queue.add(event)
+    while not queue.is_empty():
+        queue.remove()
+    return perf_counter() - start
+
+
+def bench_priority_queue(sizes: List[int],
+                         seed: int = 148) -> Dict[int, Dict[str, float]]:
+    """Return the seconds taken by each queue to add and drain <sizes>
+    events with random timestamps.
+
+    'heap' is a PriorityQueue that compares the events themselves, and
+    'keyed' is one that compares their timestamps. The sorted-list baseline
+    is skipped for sizes above 20000, where it takes minutes.
+    """
+    rng = Random(seed)
+    by_timestamp = attrgetter('timestamp')
+    results = {}
+    for size in sizes:
+        timestamps = [rng.randrange(size) for _ in range(size)]
+        results[size] = {
+            'heap': _time_queue(PriorityQueue, timestamps),
+            'keyed': _time_queue(lambda: PriorityQueue(by_timestamp),
+                                 timestamps)}
+        if size <= 20000:
+            results[size]['list'] = _time_queue(_SortedListQueue, timestamps)
+    return results
+
+
+def bench_bulk_load(sizes: List[int],
+                    seed: int = 148) -> Dict[int, Dict[str, float]]:
+    """Return the seconds taken to load <sizes> events with random
+    timestamps into a PriorityQueue, one at a time and with add_many().
+    """
+    rng = Random(seed)
+    results = {}
+    for size in sizes:
+        events = [Event(rng.randrange(size)) for _ in range(size)]
+        queue = PriorityQueue()
+        start = perf_counter()
+        for event in events:
+            queue.add(event)
+        one_at_a_time = perf_counter() - start
+        queue = PriorityQueue()
+        start = perf_counter()
+        queue.add_many(events)
+        results[size] = {'add': one_at_a_time,
+                         'add_many': perf_counter() - start}
+    return results
+
+
+def bench_distances(sizes: List[int], size: int = 1000,
+                    seed: int = 148) -> Dict[int, Dict[str, float]]:
+    """Return the seconds taken to compute the Manhattan distances from one
+    location to n others on a <size> by <size> grid, for each n in
+    <sizes>, one at a time and with manhattan_distances.
+    """
+    rng = Random(seed)
+    results = {}
+    for n in sizes:
+        origin = Location(rng.randrange(size), rng.randrange(size))
+        locations = [Location(rng.randrange(size), rng.randrange(size))
+                     for _ in range(n)]
+        rows = [location.row for location in locations]
+        columns = [location.column for location in locations]
+        start = perf_counter()
+        for location in locations:
+            manhattan_distance(origin, location)
+        results[n] = {'scalar': perf_counter() - start}
+        start = perf_counter()
+        manhattan_distances(origin, rows, columns)
+        results[n]['batch'] = perf_counter() - start
+    return results
+
+
+def bench_request_driver(fleet_sizes: List[int], requests: int = 1000,
+                         size: int = 1000,
+                         seed: int = 148) -> Dict[int, Dict[str, float]]:
+    """Return the seconds taken by Dispatcher.request_driver to serve
+    <requests> riders from fleets of <fleet_sizes> drivers on a <size> by
+    <size> grid, with each way of indexing the available drivers.
+
+    Each assigned driver asks for a rider again right away, at the rider's
+    destination, so the fleet size stays constant.
+    """
+    results = {}
+    for fleet_size in fleet_sizes:
+        results[fleet_size] = {}
+        for index in [LINEAR, GRID, FLEET]:
+            rng = Random(seed)
+            dispatcher = Dispatcher(index)
+            for i in range(fleet_size):
+                location = Location(rng.randrange(size), rng.randrange(size))
+                dispatcher.request_rider(
+                    Driver(f'D{i}', location, rng.randint(1, 3)))
+            riders = [Rider(f'R{i}', 10,
+                            Location(rng.randrange(size), rng.randrange(size)),
+                            Location(rng.randrange(size), rng.randrange(size)))
+                      for i in range(requests)]
+            start = perf_counter()
+            for rider in riders:
+                driver = dispatcher.request_driver(rider)
+                driver.location = rider.destination
+                dispatcher.request_rider(driver)
+            results[fleet_size][index] = perf_counter() - start
+    return results
+
+
+def bench_request_rider(waiting_sizes: List[int], requests: int = 1000,
+                        size: int = 1000,
+                        seed: int = 148) -> Dict[int, Dict[str, float]]:
+    """Return the seconds taken to give <requests> drivers the nearest of
+    <waiting_sizes> waiting riders on a <size> by <size> grid, with a
+    linear scan of the waiting list and with Dispatcher.request_rider.
+
+    A new rider joins the waiting list after each request, so the number
+    of waiting riders stays constant.
+    """
+    results = {}
+    for waiting_size in waiting_sizes:
+        rng = Random(seed)
+        riders = [Rider(f'R{i}', 10,
+                        Location(rng.randrange(size), rng.randrange(size)),
+                        Location(0, 0))
+                  for i in range(waiting_size + requests)]
+        drivers = [Driver(f'D{i}', Location(rng.randrange(size),
+                                            rng.randrange(size)),
+                          rng.randint(1, 3))
+                   for i in range(requests)]
+        waiting = dict((rider.id, rider) for rider in riders[:waiting_size])
+        start = perf_counter()
+        for i, driver in enumerate(drivers):
+            rider = min(waiting.values(),
+                        key=lambda r: driver.get_travel_time(r.origin))
+            del waiting[rider.id]
+            waiting[riders[waiting_size + i].id] = riders[waiting_size + i]
+        linear = perf_counter() - start
+        dispatcher = Dispatcher(rider_policy=NEAREST)
+        for rider in riders[:waiting_size]:
+            dispatcher.request_driver(rider)
+        start = perf_counter()
+        for i, driver in enumerate(drivers):
+            dispatcher.request_rider(driver)
+            dispatcher.request_driver(riders[waiting_size + i])
+        results[waiting_size] = {'linear': linear,
+                                 'grid': perf_counter() - start}
+    return results
+
+
+def bench_rider_policies(filename: str) -> Dict[str, Dict[str, float]]:
+    """Return the seconds taken to simulate the events in <filename>, and
+    the resulting report, with each rider policy.
+    """
+    results = {}
+    for policy in [OLDEST, NEAREST]:
+        events = create_event_list(filename)
+        start = perf_counter()
+        report = Simulation(
+            dispatcher=Dispatcher(rider_policy=policy)).run(events)
+        results[policy] = {'seconds': perf_counter() - start, **report}
+    return results
+
+
+def write_event_file(filename: str, num_drivers: int, num_riders: int,
+                     size: int = 100, seed: int = 148) -> None:
+    """Write a random event file in the events.txt format.
+
+    Drivers and riders are placed uniformly on a <size> by <size> grid.
+    Drivers all request at time 0 and riders request over a period long
+    enough for the fleet to keep up with about half of them.
+    """
+    rng = Random(seed)
+    duration = max(1, num_riders * size // max(1, num_drivers))
+    lines = []
+    for i in range(num_drivers):
+        lines.append(f'0 DriverRequest D{i} {rng.randrange(size)},'
+                     f'{rng.randrange(size)} {rng.randint(1, 3)}')
+    times = sorted(rng.randrange(duration) for _ in range(num_riders))
+    for i, timestamp in enumerate(times):
+        lines.append(f'{timestamp} RiderRequest R{i} '
+                     f'{rng.randrange(size)},{rng.randrange(size)} '
+                     f'{rng.randrange(size)},{rng.randrange(size)} '
+                     f'{rng.randint(1, size)}')
+    with open(filename, 'w') as file:
+        file.write('\n'.join(lines) + '\n')
+
+
+def bench_event_queues(filename: str) -> Dict[str, float]:
+    """Return the seconds taken to simulate the events in <filename> with
+    each kind of event queue.
+    """
+    results = {}
+    for name, make_queue in [('PriorityQueue', PriorityQueue),
+                             ('CalendarQueue', CalendarQueue)]:
+        events = create_event_list(filename)
+        start = perf_counter()
+        Simulation(make_queue()).run(events)
+        results[name] = perf_counter() - start
+    return results
+
+
+def bench_streaming(filename: str) -> Dict[str, Dict[str, float]]:
+    """Return the seconds taken to read and simulate the events in
+    <filename>, the file events done per second, and the peak resident set
+    size in megabytes, when the events are loaded into a list ('list'),
+    when they are streamed from the file ('stream'), and when they are
+    streamed to a monitor without history ('stream/totals').
+
+    Each run is in a fresh process, so that its peak resident set size is
+    its own.
+    """
+    results = {}
+    context = multiprocessing.get_context('spawn')
+    for mode, stream, history in [('list', False, True),
+                                  ('stream', True, True),
+                                  ('stream/totals', True, False)]:
+        with ProcessPoolExecutor(1, mp_context=context) as pool:
+            seconds, count, peak_kb = pool.submit(
+                _simulate_file, filename, stream, history).result()
+        results[mode] = {'seconds': seconds,
+                         'events/s': count / max(seconds, 1e-9),
+                         'peak_rss_mb': peak_kb / 2 ** 10}
+    return results
+
+
+def _simulate_file(filename: str, stream: bool, history: bool) -> tuple:
+    """Read and simulate the events in <filename>, streaming them if
+    <stream> is True and keeping the monitor's history if <history> is
+    True, and return the seconds taken, the number of events in the file,
+    and the peak resident set size of this process in kilobytes.
+    """
+    simulation = Simulation(monitor=Monitor(history))
+    start = perf_counter()
+    if stream:
+        count = [0]
+
+        def counted():
+            for event in stream_events(filename):
+                count[0] += 1
+                yield event
+        simulation.run(counted())
+        count = count[0]
+    else:
+        events = create_event_list(filename)
+        count = len(events)
+        simulation.run(events)
+        del events
+    seconds = perf_counter() - start
+    return seconds, count, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def bench_parsers(filename: str, workers: List[int]) -> Dict[str, float]:
+    """Return the seconds taken to load the events in <filename> with
+    create_event_list, and with read_events in each number of <workers>.
+    """
+    start = perf_counter()
+    create_event_list(filename)
+    results = {'create_event_list': perf_counter() - start}
+    for count in workers:
+        start = perf_counter()
+        read_events(filename, count)
+        results[f'read_events({count})'] = perf_counter() - start
+    return results
+
+
+def bench_event_file(filename: str) -> Dict[str, float]:
+    """Return the seconds taken to convert the events in <filename> to a
+    binary event file, to open that file, to build all of its events, and
+    to load <filename> with create_event_list for comparison.
+    """
+    binary_filename = os.path.join(tempfile.mkdtemp(), 'events.bin')
+    start = perf_counter()
+    convert_events(filename, binary_filename)
+    results = {'convert': perf_counter() - start}
+    start = perf_counter()
+    with EventFile(binary_filename) as events:
+        results['open'] = perf_counter() - start
+        start = perf_counter()
+        list(events)
+        results['build'] = perf_counter() - start
+    start = perf_counter()
+    create_event_list(filename)
+    results['create_event_list'] = perf_counter() - start
+    os.remove(binary_filename)
+    return results
+
+
+def bench_monitor_report(activities: int, drivers: int = 2000,
+                         size: int = 1000, seed: int = 148) \
+        -> Dict[str, float]:
+    """Return the seconds taken to notify a monitor with history and one
+    without of about <activities> activities, and to make each report.
+
+    Every rider requests and is picked up, and every ride is a pickup and a
+    dropoff by one of <drivers> drivers, at random locations on a <size> by
+    <size> grid.
+    """
+    rng = Random(seed)
+    locations = [Location(rng.randrange(size), rng.randrange(size))
+                 for _ in range(4096)]
+    results = {}
+    for name, history in [('history', True), ('totals', False)]:
+        rng.seed(seed)
+        monitor = Monitor(history)
+        start = perf_counter()
+        for i in range(activities // 4):
+            driver = f'D{rng.randrange(drivers)}'
+            rider = f'R{i}'
+            origin = locations[i % 4096]
+            destination = locations[(i * 7) % 4096]
+            monitor.notify(i, RIDER, REQUEST, rider, origin)
+            monitor.notify(i + 1, DRIVER, PICKUP, driver, origin)
+            monitor.notify(i + 1, RIDER, PICKUP, rider, origin)
+            monitor.notify(i + 2, DRIVER, DROPOFF, driver, destination)
+        results[f'{name}_notify'] = perf_counter() - start
+        start = perf_counter()
+        monitor.report()
+        results[f'{name}_report'] = perf_counter() - start
+    return results
+
+
+def bench_batch_matching(filename: str, windows: List[Optional[int]]) \
+        -> Dict[Optional[int], Dict[str, float]]:
+    """Return the seconds taken to simulate the events in <filename>, and
+    the resulting report, for a Dispatcher with each batch window in
+    <windows>. A window of None is the greedy dispatcher.
+    """
+    results = {}
+    for window in windows:
+        events = create_event_list(filename)
+        start = perf_counter()
+        report = Simulation(
+            dispatcher=Dispatcher(batch_window=window)).run(events)
+        results[window] = {'seconds': perf_counter() - start, **report}
+    return results
+
+
+def bench_sharded_batch(batch_sizes: List[int], workers: List[int],
+                        region_size: int = 125, size: int = 1000,
+                        seed: int = 148) -> Dict[int, Dict[str, float]]:
+    """Return the seconds taken to match one batch of n riders to n drivers
+    on a <size> by <size> grid, for each n in <batch_sizes>, and the total
+    travel time to the riders, for a Dispatcher and for a
+    ShardedStrategy with each number of <workers>.
+    """
+    results = {}
+    for batch_size in batch_sizes:
+        results[batch_size] = {}
+        for count in [None] + workers:
+            rng = Random(seed)
+            if count is None:
+                name, strategy = 'global', BatchStrategy(1)
+            else:
+                name = f'sharded{count}'
+                strategy = ShardedStrategy(region_size, workers=count,
+                                           batch_window=1)
+            dispatcher = Dispatcher(strategy)
+            for i in range(batch_size):
+                location = Location(rng.randrange(size), rng.randrange(size))
+                dispatcher.request_rider(
+                    Driver(f'D{i}', location, rng.randint(1, 3)))
+                dispatcher.request_driver(Rider(
+                    f'R{i}', 10, Location(rng.randrange(size),
+                                          rng.randrange(size)),
+                    Location(0, 0)))
+            start = perf_counter()
+            pairs = dispatcher.match_batch()
+            results[batch_size][name] = perf_counter() - start
+            results[batch_size][f'{name}_cost'] = sum(
+                driver.get_travel_time(rider.origin)
+                for rider, driver in pairs)
+            if count is not None:
+                strategy.close()
+    return results
+
+
+def bench_travel_cache(filename: str, capacities: List[int]) \
+        -> Dict[Optional[int], Dict[str, float]]:
+    """Return the seconds taken to simulate the events in <filename> with
+    a linear dispatcher, without a TravelTimes service (None) and with a
+    service of each of <capacities>, along with the service's hit rate.
+    """
+    results = {}
+    for capacity in [None] + capacities:
+        events = create_event_list(filename)
+        service = None if capacity is None else TravelTimes(capacity)
+        previous = install(service)
+        start = perf_counter()
+        Simulation(dispatcher=Dispatcher(LINEAR)).run(events)
+        results[capacity] = {'seconds': perf_counter() - start}
+        install(previous)
+        if service is not None:
+            results[capacity]['hit_rate'] = \
+                service.hits / max(1, service.hits + service.misses)
+    return results
+
+
+def write_road_file(filename: str, size: int, spacing: int = 10,
+                    blocked: float = 0.02, seed: int = 148) -> None:
+    """Write a road network on a <size> by <size> grid to <filename>.
+
+    Every <spacing>th row and column, starting half a spacing from the
+    edge, is a one-way street, in alternating directions. Each other
+    segment is blocked with probability <blocked>, unless that would leave
+    one of its intersections with fewer than two open segments.
+    """
+    rng = Random(seed)
+    lines = [f'{size} {size}']
+    open_segments = {}
+    for row in range(size):
+        for column in range(size):
+            open_segments[(row, column)] = 4 - (row in (0, size - 1)) - \
+                (column in (0, size - 1))
+    for row in range(size):
+        for column in range(size):
+            for d_row, d_col in [(0, 1), (1, 0)]:
+                start, end = (row, column), (row + d_row, column + d_col)
+                if end not in open_segments:
+                    continue
+                line = row if d_col else column
+                if line % spacing == spacing // 2:
+                    if line % (2 * spacing) != spacing // 2:
+                        start, end = end, start
+                    lines.append(f'oneway {start[0]},{start[1]} '
+                                 f'{end[0]},{end[1]}')
+                elif rng.random() < blocked and \
+                        open_segments[start] > 2 and open_segments[end] > 2:
+                    open_segments[start] -= 1
+                    open_segments[end] -= 1
+                    lines.append(f'block {row},{column} {end[0]},{end[1]}')
+    with open(filename, 'w') as file:
+        file.write('\n'.join(lines) + '\n')
+
+
+def bench_road_network(filename: str, queries: int = 200, hubs: int = 50,
+                       seed: int = 148) -> Dict[str, float]:
+    """Return the seconds taken to load the road network in <filename>
+    and to build a DistanceOracle for it, and the mean microseconds per
+    query for <queries> random queries, and for <queries> queries between
+    <hubs> hub locations after a warmup that makes them hot.
+    """
+    rng = Random(seed)
+    start = perf_counter()
+    network = load_road_network(filename)
+    results = {'load_s': perf_counter() - start}
+    start = perf_counter()
+    oracle = DistanceOracle(network, trees=2 * hubs)
+    results['oracle_s'] = perf_counter() - start
+
+    def random_location() -> Location:
+        """Return a random location on the network."""
+        return Location(rng.randrange(network.rows),
+                        rng.randrange(network.columns))
+
+    pairs = [(random_location(), random_location()) for _ in range(queries)]
+    start = perf_counter()
+    for origin, destination in pairs:
+        oracle.distance(origin, destination)
+    results['cold_us'] = (perf_counter() - start) / queries * 1e6
+
+    hub_locations = [random_location() for _ in range(hubs)]
+    for _ in range(4):
+        for hub in hub_locations:
+            oracle.distance(hub, random_location())
+    pairs = [(rng.choice(hub_locations), random_location())
+             for _ in range(10 * queries)]
+    start = perf_counter()
+    for origin, destination in pairs:
+        oracle.distance(origin, destination)
+    results['warm_us'] = (perf_counter() - start) / (10 * queries) * 1e6
+    return results
+
+
+def bench_road_day(road_file: str, event_file: str,
+                   **options: int) -> Dict[str, float]:
+    """Return the seconds taken to simulate the events in <event_file> on
+    the road network in <road_file>, with a DistanceOracle built with
+    <options> installed as the travel service, and how the oracle answered
+    its queries.
+
+    The time to load the network and build the oracle is not included.
+    """
+    oracle = DistanceOracle(load_road_network(road_file), **options)
+    events = create_event_list(event_file)
+    previous = install(TravelTimes(distance=oracle.distance))
+    try:
+        start = perf_counter()
+        Simulation().run(events)
+        seconds = perf_counter() - start
+    finally:
+        install(previous)
+    return {'seconds': seconds, 'searches': oracle.searches,
+            'run_hits': oracle.run_hits, 'trees_built': oracle.trees_built,
+            'tree_hits': oracle.tree_hits}
+
+
+def compare_strategies(filenames: List[str],
+                       strategies: Dict[str, Callable[[], DispatchStrategy]]
+                       ) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """Return the results of simulating the events in each of <filenames>
+    with a Dispatcher for each of <strategies>, keyed by file and then by
+    strategy name.
+
+    The results are the seconds taken, the events processed per second,
+    the peak memory allocated during the simulation in megabytes, and the
+    simulation report. Memory is measured in a second run, since tracing
+    allocations slows the simulation down.
+    """
+    results = {}
+    for filename in filenames:
+        results[filename] = {}
+        for name, make_strategy in strategies.items():
+            events = create_event_list(filename)
+            queue = _CountingQueue()
+            strategy = make_strategy()
+            start = perf_counter()
+            report = Simulation(queue, Dispatcher(strategy)).run(events)
+            seconds = perf_counter() - start
+            strategy.close()
+
+            events = create_event_list(filename)
+            strategy = make_strategy()
+            tracemalloc.start()
+            Simulation(dispatcher=Dispatcher(strategy)).run(events)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            strategy.close()
+            results[filename][name] = {
+                'seconds': seconds,
+                'events/s': queue.removed / max(seconds, 1e-9),
+                'peak_mb': peak / 2 ** 20, **report}
+    return results
+
+
+def _print_comparison(filenames: List[str]) -> None:
+    """Print compare_strategies for <filenames> and every strategy in
+    STRATEGIES, one line per strategy.
+    """
+    for filename, by_strategy in compare_strategies(
+            filenames, STRATEGIES).items():
+        print(filename)
+        for name, result in by_strategy.items():
+            print(f'{name:>9}', '  '.join(
+                f'{key}={value:.3f}' for key, value in result.items()))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        # Only compare the dispatch strategies on the given event files.
+        _print_comparison(sys.argv[1:])
+        sys.exit()
+
+    print('PriorityQueue: add + drain n events (seconds)')
+    for n, timings in bench_priority_queue(
+            [1000, 5000, 20000, 200000, 1000000]).items():
+        print(f'{n:>9}', '  '.join(f'{name}={seconds:.3f}'
+                                    for name, seconds in timings.items()))
+
+    print('PriorityQueue: load n initial events (seconds)')
+    for n, timings in bench_bulk_load([10000, 100000, 1000000]).items():
+        print(f'{n:>9}', '  '.join(f'{name}={seconds:.3f}'
+                                    for name, seconds in timings.items()))
+
+    print('Manhattan distances from one location to n others (seconds)')
+    for n, timings in bench_distances([1000, 100000, 1000000]).items():
+        print(f'{n:>9}', '  '.join(f'{name}={seconds:.4f}'
+                                    for name, seconds in timings.items()))
+
+    print('Dispatcher: 1000 rider requests against n drivers (seconds)')
+    for n, timings in bench_request_driver([1000, 5000, 20000, 50000]).items():
+        print(f'{n:>9}', '  '.join(f'{name}={seconds:.3f}'
+                                    for name, seconds in timings.items()))
+
+    print('Dispatcher: 1000 drivers given the nearest of n riders (seconds)')
+    for n, timings in bench_request_rider([1000, 10000, 50000]).items():
+        print(f'{n:>9}', '  '.join(f'{name}={seconds:.3f}'
+                                    for name, seconds in timings.items()))
+
+    event_file = os.path.join(tempfile.mkdtemp(), 'events.txt')
+    write_event_file(event_file, 100, 3000)
+    print('Simulation of 100 drivers and 3000 riders (seconds)')
+    for name, seconds in bench_event_queues(event_file).items():
+        print(f'{name:>14} {seconds:.3f}')
+
+    print('Loading the same day into a list and streaming it')
+    for mode, result in bench_streaming(event_file).items():
+        print(f'{mode:>8}', '  '.join(
+            f'{name}={value:.3f}' for name, value in result.items()))
+
+    print('Parsing the same day (seconds)')
+    for name, seconds in bench_parsers(event_file, [0, 4]).items():
+        print(f'{name:>20} {seconds:.3f}')
+
+    print('Converting the same day to a binary event file (seconds)')
+    print('  '.join(f'{name}={value:.4f}' for name, value
+                    in bench_event_file(event_file).items()))
+
+    print('Monitor: notify 1000000 activities and report (seconds)')
+    print('  '.join(f'{name}={value:.3f}' for name, value
+                    in bench_monitor_report(1000000).items()))
+
+    print('Oldest and nearest rider policies on the same day')
+    for policy, result in bench_rider_policies(event_file).items():
+        print(f'{policy:>8}', '  '.join(
+            f'{name}={value:.3f}' for name, value in result.items()))
+
+    print('Greedy (None) and batch dispatch of the same day')
+    for window, result in bench_batch_matching(
+            event_file, [None, 1, 2, 5]).items():
+        print(f'{str(window):>5}', '  '.join(
+            f'{name}={value:.3f}' for name, value in result.items()))
+
+    print('One batch of n riders and n drivers: seconds and travel time')
+    for n, result in bench_sharded_batch([500, 2000], [0, 4]).items():
+        print(f'{n:>9}', '  '.join(f'{name}={value:.3f}'
+                                    for name, value in result.items()))
+
+    hub_file = os.path.join(os.path.dirname(event_file), 'hubs.txt')
+    write_event_file(hub_file, 200, 5000, size=20)
+    print('Linear dispatch of a day on a 20 by 20 grid, by travel cache size')
+    for capacity, result in bench_travel_cache(
+            hub_file, [0, 1000, 100000]).items():
+        print(f'{str(capacity):>9}', '  '.join(
+            f'{name}={value:.3f}' for name, value in result.items()))
+
+    road_file = os.path.join(os.path.dirname(event_file), 'roads.txt')
+    write_road_file(road_file, 1000)
+    print('Road network on a 1000 by 1000 grid')
+    print('  '.join(f'{name}={value:.3f}' for name, value
+                    in bench_road_network(road_file).items()))
+    day_file = os.path.join(os.path.dirname(event_file), 'day.txt')
+    write_event_file(day_file, 100, 1000, size=1000)
+    print('A day of 100 drivers and 1000 riders on the same roads')
+    print('  '.join(f'{name}={value:.3f}' for name, value
+                    in bench_road_day(road_file, day_file).items()))
+
+    print('Every dispatch strategy on the same days')
+    dense_file = os.path.join(os.path.dirname(event_file), 'dense.txt')
+    write_event_file(dense_file, 1000, 10000)
+    _print_comparison([event_file, dense_file])
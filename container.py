@@ -1,5 +1,47 @@
 """Containers of objects"""
 
+from collections import deque
+from heapq import heapify, heappush, heappop
+from operator import attrgetter
+from typing import Callable, Iterable, List, Optional
+
+
+class Handle:
+    """A reference to an item that was added to a Container.
+
+    Cancelling a handle withdraws its item in O(1) time: the item is left in
+    place as a tombstone, and the container discards it when it reaches the
+    front instead of returning it.
+
+    === Attributes ===
+    item: The item that was added.
+    cancelled: True iff the item has been withdrawn from its container.
+    """
+    # Attribute Types
+    item: object
+    cancelled: bool
+
+    def __init__(self, item: object) -> None:
+        """Initialize a Handle for <item>.
+
+        >>> Handle("red").cancelled
+        False
+        """
+        self.item = item
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        """Withdraw this handle's item from its container.
+
+        This has no effect if the item has already been removed.
+
+        >>> handle = Handle("red")
+        >>> handle.cancel()
+        >>> handle.cancelled
+        True
+        """
+        self.cancelled = True
+
 
 class Container:
     """A container that holds objects.
@@ -7,18 +49,36 @@ class Container:
     This is an abstract class.  Only child classes should be instantiated.
     """
 
-    def add(self, item: object) -> None:
+    def add(self, item: object) -> Optional[Handle]:
         """Add <item> to this Container.
 
+        Return a Handle that withdraws <item> when cancelled, or None if
+        this kind of Container does not support withdrawing items.
         """
         raise NotImplementedError("Implemented in a subclass")
 
+    def add_many(self, items: Iterable[object]) -> None:
+        """Add every item in <items> to this Container, in order.
+
+        Subclasses may override this with a faster bulk operation.
+        """
+        for item in items:
+            self.add(item)
+
     def remove(self) -> object:
         """Remove and return a single item from this Container.
 
         """
         raise NotImplementedError("Implemented in a subclass")
 
+    def peek(self) -> object:
+        """Return the item that remove() would return next, without removing
+        it.
+
+        Precondition: <self> should not be empty.
+        """
+        raise NotImplementedError("Implemented in a subclass")
+
     def is_empty(self) -> bool:
         """Return True iff this Container is empty.
 
@@ -35,26 +95,48 @@ class PriorityQueue(Container):
     removed.
 
     Priority is defined by the rich comparison methods for the objects in the
-    container (__lt__, __le__, __gt__, __ge__).
+    container (__lt__, __le__, __gt__, __ge__), or for their keys if a key
+    function is given.
 
     If x < y, then x has a *HIGHER* priority than y.
 
     All objects in the container must be of the same type.
+
+    A key function such as attrgetter('timestamp') makes the queue compare
+    plain keys instead of calling the items' comparison methods, which is
+    much faster when the keys are built-in types such as ints.
     """
 
     # === Private Attributes ===
+    _key: Optional[Callable[[object], object]]
+    #     Returns the priority of an item, or None to use the item itself.
     _items: list
-    #     The items stored in the priority queue.
+    #     The items stored in the priority queue, as (priority, sequence,
+    #     item, handle) entries. The handle is None for items added by
+    #     add_many().
+    _count: int
+    #     The sequence number to give the next item added to the queue.
     #
     # === Representation Invariants ===
-    # _items is a sorted list, where the first item in the queue is the
-    # item with the highest priority.
+    # _items is a binary min-heap: for every index i, _items[i] <= the
+    # entries at indices 2 * i + 1 and 2 * i + 2 (when they exist).
+    # Sequence numbers are unique and increase with insertion order, so
+    # items of equal priority are removed in FIFO order. Only priorities
+    # and sequence numbers are ever compared.
 
-    def __init__(self) -> None:
-        """Initialize an empty PriorityQueue.
+    def __init__(self, key: Optional[Callable[[object], object]] = None) \
+            -> None:
+        """Initialize an empty PriorityQueue that orders items by <key>, or
+        by the items themselves if <key> is None.
 
+        >>> pq = PriorityQueue(key=len)
+        >>> pq.add_many(["red", "blue", "yellow", "tan"])
+        >>> [pq.remove() for _ in range(4)]
+        ['red', 'tan', 'blue', 'yellow']
         """
+        self._key = key
         self._items = []
+        self._count = 0
 
     def remove(self) -> object:
         """Remove and return the next item from this PriorityQueue.
@@ -62,10 +144,7 @@ class PriorityQueue(Container):
         Precondition: <self> should not be empty.
 
         >>> pq = PriorityQueue()
-        >>> pq.add("red")
-        >>> pq.add("blue")
-        >>> pq.add("yellow")
-        >>> pq.add("green")
+        >>> pq.add_many(["red", "blue", "yellow", "green"])
         >>> pq.remove()
         'blue'
         >>> pq.remove()
@@ -75,7 +154,22 @@ class PriorityQueue(Container):
         >>> pq.remove()
         'yellow'
         """
-        return self._items.pop(0)
+        self._discard_cancelled()
+        return heappop(self._items)[2]
+
+    def peek(self) -> object:
+        """Return the next item in this PriorityQueue, without removing it.
+
+        Precondition: <self> should not be empty.
+
+        >>> pq = PriorityQueue()
+        >>> pq.add_many(["red", "blue"])
+        >>> pq.add("green").cancel()
+        >>> pq.peek(), pq.remove()
+        ('blue', 'blue')
+        """
+        self._discard_cancelled()
+        return self._items[0][2]
 
     def is_empty(self) -> bool:
         """
@@ -84,39 +178,264 @@ class PriorityQueue(Container):
         >>> pq = PriorityQueue()
         >>> pq.is_empty()
         True
-        >>> pq.add("thing")
+        >>> handle = pq.add("thing")
         >>> pq.is_empty()
         False
+        >>> handle.cancel()
+        >>> pq.is_empty()
+        True
         """
+        self._discard_cancelled()
         return len(self._items) == 0
 
-    def add(self, item: object) -> None:
+    def add(self, item: object) -> Handle:
         """Add <item> to this PriorityQueue.
 
+        Return a Handle that withdraws <item> from this PriorityQueue when
+        cancelled.
+
         >>> pq = PriorityQueue()
-        >>> pq.add("yellow")
-        >>> pq.add("blue")
-        >>> pq.add("red")
-        >>> pq.add("green")
-        >>> pq._items
+        >>> pq.add_many(["yellow", "blue", "red"])
+        >>> handle = pq.add("green")
+        >>> pq.peek()
+        'blue'
+        >>> _ = pq.add("blue")
+        >>> handle.cancel()
+        >>> [pq.remove() for _ in range(4)]
+        ['blue', 'blue', 'red', 'yellow']
+        """
+        handle = Handle(item)
+        priority = item if self._key is None else self._key(item)
+        heappush(self._items, (priority, self._count, item, handle))
+        self._count += 1
+        return handle
+
+    def add_many(self, items: Iterable[object]) -> None:
+        """Add every item in <items> to this PriorityQueue, in order.
+
+        The heap is rebuilt once at the end, which takes O(n) time for n
+        items in total instead of O(n log n) for separate calls to add().
+
+        >>> pq = PriorityQueue()
+        >>> _ = pq.add("green")
+        >>> pq.add_many(["yellow", "blue", "red"])
+        >>> [pq.remove() for _ in range(4)]
         ['blue', 'green', 'red', 'yellow']
-        >>> pq.add("green")
-        >>> pq._items
-        ['blue', 'green', 'green', 'red', 'yellow']
         """
-        if self.is_empty():
-            self._items.append(item)
-            return None
+        size = len(self._items)
+        if self._key is None:
+            self._items.extend((item, self._count + i, item, None)
+                               for i, item in enumerate(items))
         else:
-            for list_item in self._items:
-                if item < list_item:
-                    l_item_index = self._items.index(list_item)
-                    self._items.insert(l_item_index, item)
-                    return None
-            self._items.append(item)
-            return None
+            key = self._key
+            self._items.extend((key(item), self._count + i, item, None)
+                               for i, item in enumerate(items))
+        self._count += len(self._items) - size
+        heapify(self._items)
+
+    def _discard_cancelled(self) -> None:
+        """Pop cancelled items off the front of the heap.
+
+        """
+        items = self._items
+        while items and items[0][3] is not None and items[0][3].cancelled:
+            heappop(items)
+
+
+class CalendarQueue(Container):
+    """A queue of items with integer priorities, kept in timestamp buckets.
+
+    Items are removed in increasing order of their integer key (by default,
+    their timestamp attribute); ties are resolved in FIFO order, exactly like
+    a PriorityQueue of events.
+
+    The queue is a timing wheel: a circular array of <width> buckets, one for
+    each of the next <width> time units after the current cursor. Items
+    further in the future wait in an overflow heap until the cursor gets
+    close enough. When most items are scheduled a short time ahead, as they
+    are in the simulation, add() and remove() take amortized O(1) time.
+    """
+
+    # === Private Attributes ===
+    _key: Callable[[object], int]
+    #     Returns the integer priority of an item.
+    _wheel: List[deque]
+    #     _wheel[t % len(_wheel)] holds the handles of the items with key t,
+    #     for every t in the window [_cursor, _cursor + len(_wheel)).
+    _in_wheel: int
+    #     The number of handles stored in _wheel, including cancelled ones.
+    _overflow: list
+    #     A heap of (key, sequence, handle) triples for items with a key at
+    #     or beyond the end of the window.
+    _cursor: Optional[int]
+    #     The first key in the window, or None if nothing has been added yet.
+    _count: int
+    #     The sequence number to give the next handle sent to _overflow.
+    #
+    # === Representation Invariants ===
+    # - No item has a key smaller than _cursor.
+    # - Handles in each bucket are in insertion order, and every handle in
+    #   _overflow was added before any handle with the same key in _wheel.
+
+    def __init__(self, width: int = 1024,
+                 key: Callable[[object], int] = attrgetter('timestamp')) \
+            -> None:
+        """Initialize an empty CalendarQueue with <width> buckets.
+
+        Precondition: width > 0
+        """
+        self._key = key
+        self._wheel = [deque() for _ in range(width)]
+        self._in_wheel = 0
+        self._overflow = []
+        self._cursor = None
+        self._count = 0
+
+    def add(self, item: object) -> Handle:
+        """Add <item> to this CalendarQueue.
+
+        Return a Handle that withdraws <item> from this CalendarQueue when
+        cancelled.
+
+        >>> from event import Event
+        >>> cq = CalendarQueue(4)
+        >>> handles = [cq.add(Event(timestamp)) for timestamp in [9, 2, 2, 0]]
+        >>> handles[1].cancel()
+        >>> [cq.remove().timestamp for _ in range(3)]
+        [0, 2, 9]
+        """
+        key = self._key(item)
+        if self._cursor is None:
+            self._cursor = key
+        elif key < self._cursor:
+            self._rewind(key)
+        handle = Handle(item)
+        if key - self._cursor < len(self._wheel):
+            self._wheel[key % len(self._wheel)].append(handle)
+            self._in_wheel += 1
+        else:
+            heappush(self._overflow, (key, self._count, handle))
+            self._count += 1
+        return handle
+
+    def add_many(self, items: Iterable[object]) -> None:
+        """Add every item in <items> to this CalendarQueue, in order.
+
+        When the queue is empty, the window starts at the smallest key in
+        <items>, so that loading unsorted items never rewinds it.
+
+        >>> from event import Event
+        >>> cq = CalendarQueue(4)
+        >>> cq.add_many([Event(9), Event(2), Event(0)])
+        >>> [cq.remove().timestamp for _ in range(3)]
+        [0, 2, 9]
+        """
+        items = list(items)
+        if items and self.is_empty():
+            self._cursor = min(self._key(item) for item in items)
+        for item in items:
+            self.add(item)
+
+    def remove(self) -> object:
+        """Remove and return the item with the smallest key.
+
+        Precondition: <self> should not be empty.
+
+        >>> from event import Event
+        >>> first, second = Event(3), Event(3)
+        >>> cq = CalendarQueue()
+        >>> cq.add_many([first, second])
+        >>> cq.remove() is first
+        True
+        """
+        self._find_next()
+        self._in_wheel -= 1
+        return self._wheel[self._cursor % len(self._wheel)].popleft().item
+
+    def peek(self) -> object:
+        """Return the item with the smallest key, without removing it.
+
+        Precondition: <self> should not be empty.
+
+        >>> from event import Event
+        >>> cq = CalendarQueue(4)
+        >>> cq.add(Event(1)).cancel()
+        >>> cq.add_many([Event(9), Event(2)])
+        >>> cq.peek().timestamp, cq.remove().timestamp
+        (2, 2)
+        """
+        self._find_next()
+        return self._wheel[self._cursor % len(self._wheel)][0].item
+
+    def is_empty(self) -> bool:
+        """Return True iff this CalendarQueue is empty.
+
+        >>> cq = CalendarQueue()
+        >>> cq.is_empty()
+        True
+        >>> from event import Event
+        >>> handle = cq.add(Event(1))
+        >>> cq.is_empty()
+        False
+        >>> handle.cancel()
+        >>> cq.is_empty()
+        True
+        """
+        return not self._find_next()
+
+    def _find_next(self) -> bool:
+        """Move the cursor to the bucket holding the next item that has not
+        been cancelled, discarding cancelled items on the way.
+
+        Return True iff there is such an item; it is then at the front of
+        the bucket for the cursor.
+        """
+        width = len(self._wheel)
+        while self._in_wheel > 0 or self._overflow:
+            if self._in_wheel == 0:
+                # Jump straight to the earliest key instead of walking the
+                # empty buckets in between.
+                self._advance(self._overflow[0][0])
+            bucket = self._wheel[self._cursor % width]
+            while bucket and bucket[0].cancelled:
+                bucket.popleft()
+                self._in_wheel -= 1
+            if bucket:
+                return True
+            if self._in_wheel > 0:
+                self._advance(self._cursor + 1)
+        return False
+
+    def _advance(self, cursor: int) -> None:
+        """Move the window to start at <cursor>, bringing in any overflow
+        items that now fall inside it.
+
+        Precondition: the buckets for keys below <cursor> are empty.
+        """
+        self._cursor = cursor
+        end = cursor + len(self._wheel)
+        while self._overflow and self._overflow[0][0] < end:
+            key, _, handle = heappop(self._overflow)
+            self._wheel[key % len(self._wheel)].append(handle)
+            self._in_wheel += 1
+
+    def _rewind(self, cursor: int) -> None:
+        """Move the window back to start at <cursor>.
+
+        Every handle in the wheel is moved to the overflow heap first, so
+        that the window can be refilled from scratch in the right order.
+        """
+        width = len(self._wheel)
+        for key in range(self._cursor, self._cursor + width):
+            for handle in self._wheel[key % width]:
+                heappush(self._overflow, (key, self._count, handle))
+                self._count += 1
+            self._wheel[key % width].clear()
+        self._in_wheel = 0
+        self._advance(cursor)
 
 
 if __name__ == '__main__':
     import python_ta
-    python_ta.check_all()
+    python_ta.check_all(config={
+        'extra-imports': ['collections', 'heapq', 'operator', 'typing']})
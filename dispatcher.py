@@ -1,8 +1,27 @@
-"""Dispatcher for the simulation"""
+"""Dispatcher for the simulation
 
-from typing import Optional
+=== Constants ===
+LINEAR: A constant used to name the LinearStrategy.
+GRID: A constant used to name the GridStrategy.
+FLEET: A constant used to name the FleetStrategy.
+OLDEST: A constant used to give drivers the rider who has waited longest.
+NEAREST: A constant used to give drivers the rider they can reach fastest.
+"""
+
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
 from driver import Driver
-from rider import Rider
+from grid import RiderGrid
+from rider import Rider, CANCELLED
+from strategy import BatchStrategy, DispatchStrategy, FleetStrategy, \
+    GridStrategy, LinearStrategy
+
+LINEAR = "linear"
+GRID = "grid"
+FLEET = "fleet"
+
+OLDEST = "oldest"
+NEAREST = "nearest"
 
 
 class Dispatcher:
@@ -15,90 +34,272 @@ class Dispatcher:
     picked up by a driver may cancel their request.
 
     When a driver requests a rider, the dispatcher assigns a rider from
-    the waiting list to the driver. If there is no rider on the waiting list
-    the dispatcher does nothing. Once a driver requests a rider, the driver
-    is registered with the dispatcher, and will be used to fulfill future
-    rider requests.
+    the waiting list to the driver: by default the rider who has waited
+    longest, or optionally the rider the driver can reach the fastest.
+    If there is no rider on the waiting list
+    the driver is registered with the dispatcher as available, and will be
+    used to fulfill a future rider request. A driver stops being available
+    once they are assigned to a rider, until they request a rider again.
+
+    The choice of driver for a rider is delegated to a DispatchStrategy.
+    A strategy given to the dispatcher still belongs to the caller, who
+    must close() it when done; the dispatcher never does. With a batch
+    strategy, requests are not matched one at a time. Riders
+    and drivers are collected for a window of time instead, and then
+    matched all at once.
 
     === Attributes ===
-    waiting_riders: A list of riders that are waiting for an available driver
-    available_drivers: A list of drivers ready to
+    waiting_riders: The riders that are waiting for an available driver,
+        keyed by rider id, in the order they started waiting
+    available_drivers: The drivers ready to be assigned a rider, keyed by
+        driver id, in the order they became available
     """
     # Attribute Types
-    waiting_riders: list
-    available_drivers: list
+    waiting_riders: OrderedDict
+    available_drivers: Dict[str, Driver]
+
+    # === Private Attributes ===
+    _strategy: DispatchStrategy
+    #     Chooses the drivers for riders.
+    _rider_index: Optional[RiderGrid]
+    #     A spatial index of waiting_riders, or None if drivers are given the
+    #     rider who has waited longest.
+    _batch_open: bool
+    #     True iff a batch window is open, waiting to be matched.
 
-    def __init__(self) -> None:
+    def __init__(self, strategy: Union[str, DispatchStrategy] = GRID,
+                 rider_policy: str = OLDEST,
+                 batch_window: Optional[int] = None) -> None:
         """Initialize a Dispatcher.
 
+        strategy: how to choose a driver for a rider: a DispatchStrategy,
+            which the caller must close() when done, or LINEAR, GRID or
+            FLEET for a new strategy of that kind. All three choose the
+            same driver.
+        rider_policy: which waiting rider to give a driver: OLDEST, or
+            NEAREST for the rider the driver can reach the fastest, with
+            ties going to the rider who has waited longest.
+        batch_window: if not None, use a BatchStrategy that collects
+            requests for this length of time before matching them, instead
+            of <strategy>.
+
+        Raise a ValueError if <strategy> is neither a DispatchStrategy nor
+        LINEAR, GRID or FLEET.
+
+        Precondition: batch_window is None or batch_window >= 0
+
         >>> di = Dispatcher()
         >>> di.waiting_riders
-        []
+        OrderedDict()
         >>> di.available_drivers
-        []
+        {}
         """
-        self.waiting_riders = []
-        self.available_drivers = []
+        if not isinstance(strategy, DispatchStrategy) and \
+                strategy not in [LINEAR, GRID, FLEET]:
+            raise ValueError(f"unknown dispatch strategy {strategy!r}")
+        self.waiting_riders = OrderedDict()
+        self.available_drivers = {}
+        if batch_window is not None:
+            self._strategy = BatchStrategy(batch_window)
+        elif strategy == LINEAR:
+            self._strategy = LinearStrategy()
+        elif strategy == GRID:
+            self._strategy = GridStrategy()
+        elif strategy == FLEET:
+            self._strategy = FleetStrategy()
+        else:
+            self._strategy = strategy
+        self._rider_index = RiderGrid() if rider_policy == NEAREST else None
+        self._batch_open = False
 
     def __str__(self) -> str:
         """Return a string representation.
 
         >>> di = Dispatcher()
-        >>> di.waiting_riders
-        []
-        >>> di.available_drivers
-        []
         >>> di.__str__()
-        'Waiting list: [] Availble Drivers: []'
+        'Waiting list: [] Available Drivers: []'
         """
-        new_str = f'Waiting list: {self.waiting_riders}' \
-                  f' Available Drivers: {self.available_drivers}'
+        riders = list(self.waiting_riders.values())
+        drivers = list(self.available_drivers.values())
+        new_str = f'Waiting list: {riders} Available Drivers: {drivers}'
         return new_str
 
     def request_driver(self, rider: Rider) -> Optional[Driver]:
         """Return a driver for the rider, or None if no driver is available.
 
-        Add the rider to the waiting list if there is no available driver.
+        The driver with the fastest travel time to the rider is chosen,
+        breaking ties in favour of the driver who became available first.
+        The chosen driver is no longer available.
 
+        Add the rider to the waiting list if there is no available driver,
+        or if the strategy matches riders in batches.
+
+        >>> from location import Location
+        >>> di = Dispatcher()
+        >>> di.request_rider(Driver("Amaranth", Location(1, 1), 1))
+        >>> di.request_rider(Driver("Bergamot", Location(5, 5), 1))
+        >>> rider = Rider("Almond", 10, Location(4, 4), Location(1, 1))
+        >>> di.request_driver(rider).id
+        'Bergamot'
+        >>> list(di.available_drivers)
+        ['Amaranth']
         """
-        if not self.available_drivers:
-            self.waiting_riders.append(rider)
+        if not self.available_drivers or \
+                self._strategy.batch_window is not None:
+            self._enqueue(rider)
             return None
-        else:
-            fastest_time = 9999999
-            fastest_driver = None
-            first_driver = True
-            for driver in self.available_drivers:
-                if first_driver:
-                    fastest_driver = driver
-                    fastest_time = driver.get_travel_time(rider.origin)
-                    first_driver = False
-                elif driver.get_travel_time(rider.origin) < fastest_time:
-                    fastest_driver = driver
-                    fastest_time = driver.get_travel_time(rider.origin)
-            return fastest_driver
+        fastest_driver = self._strategy.choose(rider, self.available_drivers)
+        self._check_out(fastest_driver)
+        return fastest_driver
 
     def request_rider(self, driver: Driver) -> Optional[Rider]:
         """Return a rider for the driver, or None if no rider is available.
 
-        If this is a new driver, register the driver for future rider requests.
+        If no rider is available, or if the strategy matches riders in
+        batches, register the driver as available for future rider
+        requests, unless they already are.
 
         """
-        if not self.waiting_riders:
-            self.available_drivers.append(driver)
+        if not self.waiting_riders or \
+                self._strategy.batch_window is not None:
+            self._check_in(driver)
             return None
+        elif self._rider_index is not None:
+            rider = self._rider_index.nearest(driver)
+            self._dequeue(rider)
+            return rider
         else:
-            rider = self.waiting_riders.pop(0)
+            _, rider = self.waiting_riders.popitem(last=False)
             return rider
 
+    def open_batch(self) -> Optional[int]:
+        """Open a batch window, if in batch mode and there is a waiting
+        rider and an available driver to match, but no window is open yet.
+
+        Return the length of the window that was opened, or None if no
+        window was opened.
+
+        >>> from location import Location
+        >>> di = Dispatcher(batch_window=5)
+        >>> di.request_rider(Driver("Amaranth", Location(1, 1), 1))
+        >>> di.open_batch() is None
+        True
+        >>> di.request_driver(Rider("Almond", 9, Location(4, 4),
+        ...                         Location(1, 1)))
+        >>> di.open_batch()
+        5
+        >>> di.open_batch() is None
+        True
+        """
+        if self._strategy.batch_window is None or self._batch_open or \
+                not self.waiting_riders or not self.available_drivers:
+            return None
+        self._batch_open = True
+        return self._strategy.batch_window
+
+    def match_batch(self) -> List[Tuple[Rider, Driver]]:
+        """Close the batch window, and match waiting riders to available
+        drivers with the strategy.
+
+        Return the (rider, driver) pairs, in the order the riders started
+        waiting. The matched riders and drivers are no longer waiting or
+        available.
+
+        >>> from location import Location
+        >>> di = Dispatcher(batch_window=5)
+        >>> for name, row in [("Amaranth", 0), ("Bergamot", 9)]:
+        ...     di.request_rider(Driver(name, Location(row, 0), 1))
+        >>> for name, row in [("Almond", 8), ("Bisque", 1), ("Cerise", 5)]:
+        ...     di.request_driver(Rider(name, 9, Location(row, 0),
+        ...                             Location(0, 0)))
+        >>> [(rider.id, driver.id) for rider, driver in di.match_batch()]
+        [('Almond', 'Bergamot'), ('Bisque', 'Amaranth')]
+        >>> list(di.waiting_riders)
+        ['Cerise']
+        """
+        self._batch_open = False
+        riders = list(self.waiting_riders.values())
+        drivers = list(self.available_drivers.values())
+        pairs = []
+        for i, j in self._strategy.match(riders, drivers):
+            self._dequeue(riders[i])
+            self._check_out(drivers[j])
+            pairs.append((riders[i], drivers[j]))
+        return pairs
+
+    def is_waiting(self, rider: Rider) -> bool:
+        """Return True iff <rider> is on the waiting list.
+
+        >>> from location import Location
+        >>> di = Dispatcher()
+        >>> rider = Rider("Almond", 10, Location(4, 4), Location(1, 1))
+        >>> di.is_waiting(rider)
+        False
+        >>> di.request_driver(rider)
+        >>> di.is_waiting(rider)
+        True
+        """
+        return rider.id in self.waiting_riders
+
     def cancel_ride(self, rider: Rider) -> None:
-        """Cancel the ride for rider.
+        """Cancel the ride for rider, taking them off the waiting list if
+        they are on it.
+
+        >>> from location import Location
+        >>> di = Dispatcher()
+        >>> rider = Rider("Almond", 10, Location(4, 4), Location(1, 1))
+        >>> di.request_driver(rider)
+        >>> di.cancel_ride(rider)
+        >>> di.is_waiting(rider), rider.status
+        (False, 'cancelled')
+        """
+        rider.status = CANCELLED
+        if self.is_waiting(rider):
+            self._dequeue(rider)
+
+    def _enqueue(self, rider: Rider) -> None:
+        """Put <rider> on the waiting list.
+
+        """
+        self.waiting_riders[rider.id] = rider
+        if self._rider_index is not None:
+            self._rider_index.add(rider)
+
+    def _dequeue(self, rider: Rider) -> None:
+        """Take <rider> off the waiting list.
+
+        Precondition: <rider> is on the waiting list.
+        """
+        del self.waiting_riders[rider.id]
+        if self._rider_index is not None:
+            self._rider_index.remove(rider)
+
+    def _check_in(self, driver: Driver) -> None:
+        """Make <driver> available, unless they already are.
+
+        >>> from location import Location
+        >>> di = Dispatcher()
+        >>> driver = Driver("Amaranth", Location(1, 1), 1)
+        >>> di._check_in(driver)
+        >>> di._check_in(driver)
+        >>> list(di.available_drivers)
+        ['Amaranth']
+        """
+        if driver.id not in self.available_drivers:
+            self.available_drivers[driver.id] = driver
+            self._strategy.add(driver)
+
+    def _check_out(self, driver: Driver) -> None:
+        """Make <driver> no longer available.
 
+        Precondition: <driver> is available.
         """
-        rider.status = "cancelled"
-        self.waiting_riders.remove(rider)
+        del self.available_drivers[driver.id]
+        self._strategy.remove(driver)
 
 
 if __name__ == '__main__':
     import python_ta
-    python_ta.check_all(config={'extra-imports': ['typing', 'driver', 'rider']})
+    python_ta.check_all(config={
+        'extra-imports': ['collections', 'typing', 'driver', 'grid', 'rider',
+                          'strategy']})
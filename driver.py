@@ -1,8 +1,13 @@
 """Drivers for the simulation"""
 
-from typing import Optional
-from location import Location, manhattan_distance
+from __future__ import annotations
+from typing import Optional, TYPE_CHECKING
+from location import Location
 from rider import Rider
+from travel import travel_time
+
+if TYPE_CHECKING:
+    from fleet import DriverFleet
 
 
 class Driver:
@@ -14,13 +19,20 @@ class Driver:
     speed: The speed of the driver's car
     is_idle: True if the driver is idle and False otherwise.'
     destination: Possible destination for Driver
+    fleet: The DriverFleet this driver is a view onto, or None. Setting the
+        driver's location or speed also updates the fleet.
     """
     # Attribute Types
     id: str
-    location: Location
-    speed: int
     is_idle: bool
     destination: Optional[Location]
+    fleet: Optional[DriverFleet]
+
+    # === Private Attributes ===
+    _location: Location
+    #     The current location of the driver.
+    _speed: int
+    #     The speed of the driver's car.
 
     def __init__(self, identifier: str, location: Location,
                  speed: int, destination: Optional[Location] = None) -> None:
@@ -31,11 +43,48 @@ class Driver:
         '(1,1)'
         """
         self.id = identifier
-        self.location = location
-        self.speed = speed
+        self.fleet = None
+        self._location = location
+        self._speed = speed
         self.is_idle = True
         self.destination = destination
 
+    @property
+    def location(self) -> Location:
+        """The current location of the driver.
+
+        >>> Driver("Amaranth", Location(1,1), 1).location.__str__()
+        '(1,1)'
+        """
+        return self._location
+
+    @location.setter
+    def location(self, location: Location) -> None:
+        """Move the driver to <location>.
+
+        """
+        self._location = location
+        if self.fleet is not None:
+            self.fleet.update(self)
+
+    @property
+    def speed(self) -> int:
+        """The speed of the driver's car.
+
+        >>> Driver("Amaranth", Location(1,1), 2).speed
+        2
+        """
+        return self._speed
+
+    @speed.setter
+    def speed(self, speed: int) -> None:
+        """Change the speed of the driver's car to <speed>.
+
+        """
+        self._speed = speed
+        if self.fleet is not None:
+            self.fleet.update(self)
+
     def __str__(self) -> str:
         """Return a string representation.
 
@@ -65,12 +114,14 @@ class Driver:
     def get_travel_time(self, destination: Location) -> int:
         """Return the time it will take to arrive at the destination,
         rounded to the nearest integer.
+
+        Travel times come from the travel module, which may cache them.
+
         >>> d = Driver("Amaranth", Location(5,5), 2)
         >>> d.get_travel_time(Location(9,7))
         3
         """
-        m_distance = manhattan_distance(self.location, destination)
-        return m_distance // self.speed
+        return travel_time(self._location, destination, self._speed)
 
     def start_drive(self, location: Location) -> int:
         """Start driving to the location.
@@ -120,4 +171,5 @@ class Driver:
 if __name__ == '__main__':
     import python_ta
     python_ta.check_all(
-        config={'extra-imports': ['location', 'rider']})
+        config={'extra-imports': ['typing', 'location', 'rider', 'travel',
+                                  'fleet']})
@@ -4,7 +4,8 @@ This file should contain all of the classes necessary to model the different
 kinds of events in the simulation.
 """
 from __future__ import annotations
-from typing import List
+from typing import Iterator, List, Optional
+from container import Handle
 from rider import Rider, WAITING, CANCELLED, SATISFIED
 from dispatcher import Dispatcher
 from driver import Driver
@@ -27,11 +28,21 @@ class Event:
 
     Document any such changes carefully!
 
+    Events keep their attributes in __slots__ instead of a per-instance
+    dict, to keep them small, so every subclass must declare __slots__ for
+    the attributes it adds.
+
     === Attributes ===
     timestamp: A timestamp for this event.
+    handle: The Handle returned when this event was added to the event
+        queue, or None if it has not been scheduled that way. It is set by
+        the simulation, and lets the event be withdrawn before it happens.
     """
 
     timestamp: int
+    handle: Optional[Handle]
+
+    __slots__ = ('timestamp', 'handle')
 
     def __init__(self, timestamp: int) -> None:
         """Initialize an Event with a given timestamp.
@@ -42,6 +53,7 @@ class Event:
         7
         """
         self.timestamp = timestamp
+        self.handle = None
 
     # The following six 'magic methods' are overridden to allow for easy
     # comparison of Event instances. All comparisons simply perform the
@@ -132,6 +144,23 @@ class Event:
         """
         raise NotImplementedError("Implemented in a subclass")
 
+    def withdraw(self) -> None:
+        """Withdraw this event from the event queue, so that it never
+        happens.
+
+        This has no effect if the event was not scheduled with a handle.
+
+        >>> from container import PriorityQueue
+        >>> pq = PriorityQueue()
+        >>> event = Event(3)
+        >>> event.handle = pq.add(event)
+        >>> event.withdraw()
+        >>> pq.is_empty()
+        True
+        """
+        if self.handle is not None:
+            self.handle.cancel()
+
     def do(self, dispatcher: Dispatcher, monitor: Monitor) -> List[Event]:
         """Do this Event.
 
@@ -160,6 +189,8 @@ class RiderRequest(Event):
 
     rider: Rider
 
+    __slots__ = ('rider',)
+
     def __init__(self, timestamp: int, rider: Rider) -> None:
         """Initialize a RiderRequest event.
 
@@ -172,8 +203,10 @@ class RiderRequest(Event):
         If the rider is assigned to a driver, the driver starts driving to
         the rider.
 
-        Return a Cancellation event. If the rider is assigned to a driver,
-        also return a Pickup event.
+        Return a Cancellation event, which is recorded as the rider's pending
+        cancellation. If the rider is assigned to a driver, also return a
+        Pickup event; if the rider opens a batch window instead, also
+        return a BatchMatch event for when it closes.
 
         """
         monitor.notify(self.timestamp, RIDER, REQUEST,
@@ -184,9 +217,15 @@ class RiderRequest(Event):
         if driver is not None:
             travel_time = driver.start_drive(self.rider.origin)
             events.append(Pickup(self.timestamp + travel_time,
-                                 self.rider, driver))
-        events.append(Cancellation(self.timestamp + self.rider.patience,
-                                   self.rider))
+                                 self.rider, driver, self.timestamp))
+        else:
+            window = dispatcher.open_batch()
+            if window is not None:
+                events.append(BatchMatch(self.timestamp + window))
+        cancellation = Cancellation(self.timestamp + self.rider.patience,
+                                    self.rider)
+        self.rider.cancellation = cancellation
+        events.append(cancellation)
         return events
 
     def __str__(self) -> str:
@@ -205,6 +244,8 @@ class DriverRequest(Event):
 
     driver: Driver
 
+    __slots__ = ('driver',)
+
     def __init__(self, timestamp: int, driver: Driver) -> None:
         """Initialize a DriverRequest event.
 
@@ -216,7 +257,9 @@ class DriverRequest(Event):
         """Register the driver, if this is the first request, and
         assign a rider to the driver, if one is available.
 
-        If a rider is available, return a Pickup event.
+        If a rider is available, return a Pickup event. If the driver opens
+        a batch window instead, return a BatchMatch event for when it
+        closes.
 
         """
         # Notify the monitor about the request.
@@ -233,7 +276,11 @@ class DriverRequest(Event):
         if requesting is not None:
             travel_time = self.driver.start_drive(requesting.origin)
             events.append(Pickup(self.timestamp + travel_time,
-                                 requesting, self.driver))
+                                 requesting, self.driver, self.timestamp))
+        else:
+            window = dispatcher.open_batch()
+            if window is not None:
+                events.append(BatchMatch(self.timestamp + window))
         return events
 
     def __str__(self) -> str:
@@ -251,6 +298,8 @@ class Cancellation(Event):
     """
     rider: Rider
 
+    __slots__ = ('rider',)
+
     def __init__(self, timestamp: int, rider: Rider) -> None:
         """Initialize a DriverRequest event.
 
@@ -265,12 +314,13 @@ class Cancellation(Event):
         return f"({self.timestamp}) -- ({self.rider.id}): Cancel a rider"
 
     def do(self, dispatcher: Dispatcher, monitor: Monitor) -> List[Event]:
-        """Changes a waiting rider to a cancelled rider
+        """Changes a waiting rider to a cancelled rider, and takes them off
+        the dispatcher's waiting list if they are still on it
         """
         monitor.notify(self.timestamp, RIDER, CANCEL,
                        self.rider.id, self.rider.origin)
 
-        self.rider.status = CANCELLED
+        dispatcher.cancel_ride(self.rider)
         return []
 
 
@@ -280,17 +330,24 @@ class Pickup(Event):
     === Attributes ===
     rider: The Rider.
     driver: The Driver.
+    dispatched: The time the driver started driving to the rider, or None
+        if it is not known.
     """
     rider: Rider
     driver: Driver
+    dispatched: Optional[int]
 
-    def __init__(self, timestamp: int, rider: Rider, driver: Driver) -> None:
+    __slots__ = ('rider', 'driver', 'dispatched')
+
+    def __init__(self, timestamp: int, rider: Rider, driver: Driver,
+                 dispatched: Optional[int] = None) -> None:
         """Initialize a Pickup event.
 
         """
         super().__init__(timestamp)
         self.rider = rider
         self.driver = driver
+        self.dispatched = dispatched
 
     def __str__(self) -> str:
         """Return a string representation of this event.
@@ -301,9 +358,12 @@ class Pickup(Event):
 
     def do(self, dispatcher: Dispatcher, monitor: Monitor) -> List[Event]:
         """Driver starts driving towards destination
+
+        A rider who is picked up no longer needs their pending
+        cancellation, so it is withdrawn from the event queue.
         """
         monitor.notify(self.timestamp, DRIVER, PICKUP,
-                       self.driver.id, self.rider.origin)
+                       self.driver.id, self.rider.origin, self.dispatched)
 
         events = []
         self.driver.location = self.rider.origin
@@ -314,6 +374,9 @@ class Pickup(Event):
             events.append(Dropoff(travel_time + self.timestamp,
                                   self.rider, self.driver))
             self.rider.status = SATISFIED
+            if self.rider.cancellation is not None:
+                self.rider.cancellation.withdraw()
+                self.rider.cancellation = None
         elif self.rider.status == CANCELLED:
             events.append(DriverRequest(self.timestamp, self.driver))
             self.driver.destination = None
@@ -330,6 +393,8 @@ class Dropoff(Event):
     rider: Rider
     driver: Driver
 
+    __slots__ = ('rider', 'driver')
+
     def __init__(self, timestamp: int, rider: Rider, driver: Driver) -> None:
         """Initialize a Dropoff event.
 
@@ -358,6 +423,35 @@ class Dropoff(Event):
         return events
 
 
+class BatchMatch(Event):
+    """The dispatcher matches the riders and drivers it has collected
+    during a batch window.
+    """
+
+    __slots__ = ()
+
+    def __str__(self) -> str:
+        """Return a string representation of this event.
+
+        >>> BatchMatch(5).__str__()
+        '(5) -- Match a batch of riders and drivers'
+        """
+        return f"({self.timestamp}) -- Match a batch of riders and drivers"
+
+    def do(self, dispatcher: Dispatcher, monitor: Monitor) -> List[Event]:
+        """Match the waiting riders to available drivers, and start each
+        matched driver driving to their rider.
+
+        Return a Pickup event for every match.
+        """
+        events = []
+        for rider, driver in dispatcher.match_batch():
+            travel_time = driver.start_drive(rider.origin)
+            events.append(Pickup(self.timestamp + travel_time, rider, driver,
+                                 self.timestamp))
+        return events
+
+
 def create_event_list(filename: str) -> List[Event]:
     """Return a list of Events based on raw list of events in <filename>.
 
@@ -375,39 +469,86 @@ def create_event_list(filename: str) -> List[Event]:
                 # Skip lines that are blank or start with #.
                 continue
 
-            # Create a list of words in the line, e.g.
-            # ['10', 'RiderRequest', 'Cerise', '4,2', '1,5', '15'].
-            # Note that these are strings, and you'll need to convert some
-            # of them to a different type.
-            tokens = line.split()
-            timestamp = int(tokens[0])
-            event_type = tokens[1]
-            event = None
-
-            # HINT: Use Location.deserialize to convert the location string to
-            # a location.
-
-            if event_type == "DriverRequest":
-                # Create a DriverRequest event.
-                location = deserialize_location(tokens[3])
-                driver = Driver(tokens[2], location, int(tokens[4]))
-                event = DriverRequest(timestamp, driver)
-            elif event_type == "RiderRequest":
-                # Create a RiderRequest event.
-                identifier = tokens[2]
-                patience = int(tokens[5])
-                origin = deserialize_location(tokens[3])
-                destination = deserialize_location(tokens[4])
-                rider = Rider(identifier, patience, origin, destination)
-                event = RiderRequest(timestamp, rider)
-            events.append(event)
+            events.append(parse_event(line))
     return events
 
 
+def stream_events(filename: str) -> Iterator[Event]:
+    """Yield the Events in <filename> one at a time, as the file is read.
+
+    Unlike create_event_list, this never holds more than one line of the
+    file in memory, so the file can be larger than memory. The events must
+    be in order of timestamp; a ValueError is raised when an event is found
+    that is earlier than the one before it. Lines with an unknown event type
+    are skipped.
+
+    Precondition: the file stored at <filename> is in the format specified
+    by the assignment handout.
+
+    filename: The name of a file that contains the list of events.
+    """
+    previous = None
+    with open(filename, "r") as file:
+        for number, line in enumerate(file, 1):
+            line = line.strip()
+
+            if not line or line.startswith("#"):
+                # Skip lines that are blank or start with #.
+                continue
+
+            event = parse_event(line)
+            if event is None:
+                continue
+            if previous is not None and event.timestamp < previous:
+                raise ValueError(f'{filename}, line {number}: timestamp '
+                                 f'{event.timestamp} is earlier than '
+                                 f'{previous}')
+            previous = event.timestamp
+            yield event
+
+
+def parse_event(line: str) -> Optional[Event]:
+    """Return the Event described by <line>, or None if its type is not
+    known.
+
+    Precondition: <line> is a non-blank line of an event file that is not
+    a comment.
+
+    >>> parse_event("10 DriverRequest Amaranth 1,1 1").driver.id
+    'Amaranth'
+    """
+    # Create a list of words in the line, e.g.
+    # ['10', 'RiderRequest', 'Cerise', '4,2', '1,5', '15'].
+    # Note that these are strings, and you'll need to convert some
+    # of them to a different type.
+    tokens = line.split()
+    timestamp = int(tokens[0])
+    event_type = tokens[1]
+    event = None
+
+    # HINT: Use Location.deserialize to convert the location string to
+    # a location.
+
+    if event_type == "DriverRequest":
+        # Create a DriverRequest event.
+        location = deserialize_location(tokens[3])
+        driver = Driver(tokens[2], location, int(tokens[4]))
+        event = DriverRequest(timestamp, driver)
+    elif event_type == "RiderRequest":
+        # Create a RiderRequest event.
+        identifier = tokens[2]
+        patience = int(tokens[5])
+        origin = deserialize_location(tokens[3])
+        destination = deserialize_location(tokens[4])
+        rider = Rider(identifier, patience, origin, destination)
+        event = RiderRequest(timestamp, rider)
+    return event
+
+
 if __name__ == '__main__':
     import python_ta
     python_ta.check_all(
         config={
-            'allowed-io': ['create_event_list'],
-            'extra-imports': ['rider', 'dispatcher', 'driver',
-                              'location', 'monitor']})
+            'allowed-io': ['create_event_list', 'stream_events'],
+            'extra-imports': ['typing', 'container', 'rider', 'dispatcher',
+                              'driver', 'location', 'monitor']})
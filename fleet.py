@@ -0,0 +1,210 @@
+"""Struct-of-arrays storage of drivers for the simulation"""
+
+from typing import Dict, List, Optional
+from driver import Driver
+from location import Location, manhattan_distances
+from travel import installed
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+
+class DriverFleet:
+    """The locations and speeds of a fleet of drivers, kept in contiguous
+    arrays so that the travel times from every available driver to a
+    location can be computed in a single vectorized expression.
+
+    A driver added to the fleet becomes a view onto it: setting the
+    driver's location or speed also updates the fleet's arrays. A driver
+    is only a view onto the last fleet they were added to, so every fleet
+    copies the driver's location and speed again when they are added.
+
+    Travel times are Manhattan distances divided by speed, rounded down,
+    as computed by Driver.get_travel_time. Ties go to the driver that
+    became available first.
+
+    NumPy is used when it is installed. Without it, the arrays are plain
+    lists and nearest() scans them in Python, with the same results. If a
+    travel service is installed, nearest() scans the available drivers and
+    asks each of them for their travel time, as the service gives it.
+    """
+
+    # === Private Attributes ===
+    _drivers: List[Driver]
+    #     The drivers in the fleet, indexed by slot.
+    _slots: Dict[str, int]
+    #     The slot of each driver, keyed by driver id.
+    _rows: list
+    #     The row of each driver's location, indexed by slot.
+    _columns: list
+    #     The column of each driver's location, indexed by slot.
+    _speeds: list
+    #     The speed of each driver, indexed by slot.
+    _available: list
+    #     Whether each driver is available to be assigned a rider.
+    _order: list
+    #     The order in which each available driver became available.
+    _count: int
+    #     The order to give the next driver that becomes available.
+    _num_available: int
+    #     The number of available drivers.
+    #
+    # === Representation Invariants ===
+    # - The arrays all have the same length, which is at least
+    #   len(_drivers), and entries past len(_drivers) are unused.
+
+    def __init__(self) -> None:
+        """Initialize an empty DriverFleet.
+
+        """
+        self._drivers = []
+        self._slots = {}
+        if np is None:
+            self._rows, self._columns, self._speeds = [], [], []
+            self._available, self._order = [], []
+        else:
+            self._rows = np.zeros(16, dtype=np.int64)
+            self._columns = np.zeros(16, dtype=np.int64)
+            self._speeds = np.ones(16, dtype=np.int64)
+            self._available = np.zeros(16, dtype=bool)
+            self._order = np.zeros(16, dtype=np.int64)
+        self._count = 0
+        self._num_available = 0
+
+    def __len__(self) -> int:
+        """Return the number of available drivers in this fleet.
+
+        >>> fleet = DriverFleet()
+        >>> fleet.add(Driver("Amaranth", Location(1, 1), 1))
+        >>> len(fleet)
+        1
+        """
+        return self._num_available
+
+    def __contains__(self, driver: Driver) -> bool:
+        """Return True iff <driver> is an available driver in this fleet.
+
+        >>> fleet = DriverFleet()
+        >>> driver = Driver("Amaranth", Location(1, 1), 1)
+        >>> driver in fleet
+        False
+        >>> fleet.add(driver)
+        >>> driver in fleet
+        True
+        """
+        slot = self._slots.get(driver.id)
+        return slot is not None and bool(self._available[slot])
+
+    def add(self, driver: Driver) -> None:
+        """Make <driver> available, adding them to this fleet if they are
+        not in it yet, at their current location and speed.
+
+        Precondition: <driver> is not available.
+        """
+        slot = self._slots.get(driver.id)
+        if slot is None:
+            slot = self._register(driver)
+        driver.fleet = self
+        self.update(driver)
+        self._available[slot] = True
+        self._order[slot] = self._count
+        self._count += 1
+        self._num_available += 1
+
+    def remove(self, driver: Driver) -> None:
+        """Make <driver> no longer available.
+
+        Precondition: <driver> is available.
+
+        >>> fleet = DriverFleet()
+        >>> driver = Driver("Amaranth", Location(1, 1), 1)
+        >>> fleet.add(driver)
+        >>> fleet.remove(driver)
+        >>> len(fleet)
+        0
+        """
+        self._available[self._slots[driver.id]] = False
+        self._num_available -= 1
+
+    def update(self, driver: Driver) -> None:
+        """Copy <driver>'s current location and speed into this fleet.
+
+        Drivers call this themselves when their location or speed is set.
+
+        >>> fleet = DriverFleet()
+        >>> driver = Driver("Amaranth", Location(1, 1), 1)
+        >>> fleet.add(driver)
+        >>> driver.location = Location(4, 2)
+        >>> int(fleet._rows[0]), int(fleet._columns[0])
+        (4, 2)
+        """
+        slot = self._slots[driver.id]
+        self._rows[slot] = driver.location.row
+        self._columns[slot] = driver.location.column
+        self._speeds[slot] = driver.speed
+
+    def nearest(self, location: Location) -> Optional[Driver]:
+        """Return the available driver with the fastest travel time to
+        <location>, or None if no driver is available.
+
+        >>> fleet = DriverFleet()
+        >>> fleet.add(Driver("Amaranth", Location(1, 1), 1))
+        >>> fleet.add(Driver("Bergamot", Location(9, 9), 4))
+        >>> fleet.add(Driver("Crocus", Location(5, 5), 1))
+        >>> fleet.nearest(Location(6, 6)).id
+        'Bergamot'
+        >>> fleet.nearest(Location(2, 2)).id
+        'Amaranth'
+        """
+        if self._num_available == 0:
+            return None
+        size = len(self._drivers)
+        if np is None or installed() is not None:
+            best = None
+            best_key = None
+            for slot in range(size):
+                if self._available[slot]:
+                    key = (self._drivers[slot].get_travel_time(location),
+                           self._order[slot])
+                    if best_key is None or key < best_key:
+                        best, best_key = slot, key
+            return self._drivers[best]
+        available = self._available[:size]
+        times = manhattan_distances(location, self._rows[:size],
+                                    self._columns[:size]) // \
+            self._speeds[:size]
+        times = np.where(available, times, np.iinfo(np.int64).max)
+        ties = np.flatnonzero(times == times.min())
+        return self._drivers[int(ties[np.argmin(self._order[ties])])]
+
+    def _register(self, driver: Driver) -> int:
+        """Add <driver> to this fleet as an unavailable driver.
+
+        Return the driver's slot.
+        """
+        slot = len(self._drivers)
+        self._drivers.append(driver)
+        self._slots[driver.id] = slot
+        if np is None:
+            self._rows.append(0)
+            self._columns.append(0)
+            self._speeds.append(1)
+            self._available.append(False)
+            self._order.append(0)
+        elif slot == len(self._rows):
+            self._rows = np.resize(self._rows, 2 * slot)
+            self._columns = np.resize(self._columns, 2 * slot)
+            self._speeds = np.resize(self._speeds, 2 * slot)
+            self._available = np.resize(self._available, 2 * slot)
+            self._order = np.resize(self._order, 2 * slot)
+        self._available[slot] = False
+        return slot
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(
+        config={'extra-imports': ['typing', 'numpy', 'driver', 'location',
+                                  'travel']})
@@ -0,0 +1,309 @@
+"""Spatial indexes of drivers and riders for the simulation"""
+
+from typing import Callable, Dict, Iterator, Optional, Tuple
+from driver import Driver
+from location import Location
+from rider import Rider
+
+
+class SpatialGrid:
+    """A uniform grid of items with locations, used to find the item with
+    the fastest travel time to or from a location without looking at every
+    item.
+
+    Items are bucketed into square cells of <cell_size> by <cell_size>
+    blocks, and are identified by a unique string id. A query visits cells
+    in rings of increasing Manhattan distance around the target's cell, and
+    stops as soon as no item in a further ring could be reached sooner than
+    the best item found so far.
+
+    Ties in travel time go to the item that was added to the grid first,
+    so that queries always agree with a linear scan of the items in the
+    order they were added.
+
+    This class is abstract; subclasses decide how travel times are
+    computed.
+
+    Precondition: travel times are never shorter than the Manhattan
+    distance divided by the driver's speed, rounded down.
+    """
+
+    # === Private Attributes ===
+    _cell_size: int
+    #     The width and height of a cell, in blocks.
+    _cells: Dict[Tuple[int, int], Dict[str, object]]
+    #     The items in each non-empty cell, keyed by id.
+    _entries: Dict[str, Tuple[Tuple[int, int], int]]
+    #     The cell and order of insertion of every item in the grid.
+    _count: int
+    #     The order of insertion to give the next item added.
+    _bounds: Optional[Tuple[int, int, int, int]]
+    #     The smallest and largest cell row and column of any item added
+    #     so far, or None if no item has been added.
+    #
+    # === Representation Invariants ===
+    # - Each item in the grid is in the cell containing its location.
+    # - No cell in _cells is empty.
+
+    def __init__(self, cell_size: int = 8) -> None:
+        """Initialize an empty SpatialGrid.
+
+        Precondition: cell_size > 0
+        """
+        self._cell_size = cell_size
+        self._cells = {}
+        self._entries = {}
+        self._count = 0
+        self._bounds = None
+
+    def __len__(self) -> int:
+        """Return the number of items in this grid.
+
+        >>> grid = DriverGrid()
+        >>> grid.add(Driver("Amaranth", Location(1, 1), 1))
+        >>> len(grid)
+        1
+        """
+        return len(self._entries)
+
+    def _insert(self, identifier: str, location: Location,
+                item: object) -> None:
+        """Add <item>, with id <identifier>, to this grid at <location>.
+
+        Precondition: no item with id <identifier> is in this grid.
+        """
+        cell = self._cell(location)
+        self._cells.setdefault(cell, {})[identifier] = item
+        self._entries[identifier] = (cell, self._count)
+        self._count += 1
+        if self._bounds is None:
+            self._bounds = (cell[0], cell[0], cell[1], cell[1])
+        else:
+            min_row, max_row, min_col, max_col = self._bounds
+            self._bounds = (min(min_row, cell[0]), max(max_row, cell[0]),
+                            min(min_col, cell[1]), max(max_col, cell[1]))
+
+    def _delete(self, identifier: str) -> None:
+        """Remove the item with id <identifier> from this grid.
+
+        Precondition: an item with id <identifier> is in this grid.
+        """
+        cell, _ = self._entries.pop(identifier)
+        items = self._cells[cell]
+        del items[identifier]
+        if not items:
+            del self._cells[cell]
+
+    def _search(self, location: Location,
+                travel_time: Callable[[object], int],
+                speed: int) -> Optional[object]:
+        """Return the item with the smallest <travel_time> to or from
+        <location>, or None if this grid is empty.
+
+        Precondition: no travel time is shorter than the Manhattan distance
+        between <location> and the item, divided by <speed> and rounded
+        down.
+        """
+        if self._bounds is None:
+            return None
+        row, col = self._cell(location)
+        min_row, max_row, min_col, max_col = self._bounds
+        last_ring = max(row - min_row, max_row - row) + \
+            max(col - min_col, max_col - col)
+        best = None
+        best_key = None
+        ring = 0
+        while ring <= last_ring:
+            if best_key is not None and \
+                    self._distance_bound(ring) // speed > best_key[0]:
+                break
+            if 4 * ring > len(self._cells):
+                # The rings are now bigger than the number of occupied
+                # cells, so it is cheaper to visit those cells directly.
+                cells = (cell for cell in self._cells
+                         if abs(cell[0] - row) + abs(cell[1] - col) >= ring)
+                last_ring = -1
+            else:
+                cells = cells_around(row, col, ring)
+            for cell in cells:
+                for identifier, item in self._cells.get(cell, {}).items():
+                    key = (travel_time(item), self._entries[identifier][1])
+                    if best_key is None or key < best_key:
+                        best, best_key = item, key
+            ring += 1
+        return best
+
+    def _cell(self, location: Location) -> Tuple[int, int]:
+        """Return the cell containing <location>.
+
+        >>> DriverGrid(cell_size=4)._cell(Location(9, 3))
+        (2, 0)
+        """
+        return location.row // self._cell_size, \
+            location.column // self._cell_size
+
+    def _distance_bound(self, ring: int) -> int:
+        """Return a lower bound on the Manhattan distance from a location to
+        any location in a cell <ring> rings away from its cell.
+
+        Along each axis where the cells differ by d > 0, the locations are
+        at least (d - 1) * cell_size + 1 blocks apart.
+
+        >>> DriverGrid(cell_size=4)._distance_bound(3)
+        6
+        """
+        if ring == 0:
+            return 0
+        return max(0, (ring - 2) * self._cell_size + 2)
+
+
+class DriverGrid(SpatialGrid):
+    """A spatial index of drivers, used to find the driver with the fastest
+    travel time to a location.
+
+    A query can stop early once no driver in a further ring could arrive
+    sooner than the best driver found so far, even at the highest speed
+    in the grid.
+    """
+
+    # === Private Attributes ===
+    _max_speed: int
+    #     The highest speed of any driver added to the grid so far.
+
+    def __init__(self, cell_size: int = 8) -> None:
+        """Initialize an empty DriverGrid.
+
+        Precondition: cell_size > 0
+        """
+        super().__init__(cell_size)
+        self._max_speed = 1
+
+    def __contains__(self, driver: Driver) -> bool:
+        """Return True iff <driver> is in this grid.
+
+        >>> grid = DriverGrid()
+        >>> driver = Driver("Amaranth", Location(1, 1), 1)
+        >>> driver in grid
+        False
+        >>> grid.add(driver)
+        >>> driver in grid
+        True
+        """
+        return driver.id in self._entries
+
+    def add(self, driver: Driver) -> None:
+        """Add <driver> to this grid at their current location.
+
+        Precondition: <driver> is not in this grid.
+        """
+        self._insert(driver.id, driver.location, driver)
+        self._max_speed = max(self._max_speed, driver.speed)
+
+    def remove(self, driver: Driver) -> None:
+        """Remove <driver> from this grid.
+
+        Precondition: <driver> is in this grid.
+
+        >>> grid = DriverGrid()
+        >>> driver = Driver("Amaranth", Location(1, 1), 1)
+        >>> grid.add(driver)
+        >>> grid.remove(driver)
+        >>> len(grid)
+        0
+        """
+        self._delete(driver.id)
+
+    def nearest(self, location: Location) -> Optional[Driver]:
+        """Return the driver with the fastest travel time to <location>, or
+        None if this grid is empty.
+
+        >>> grid = DriverGrid(cell_size=2)
+        >>> grid.add(Driver("Amaranth", Location(1, 1), 1))
+        >>> grid.add(Driver("Bergamot", Location(9, 9), 4))
+        >>> grid.add(Driver("Crocus", Location(5, 5), 1))
+        >>> grid.nearest(Location(6, 6)).id
+        'Bergamot'
+        >>> grid.nearest(Location(2, 2)).id
+        'Amaranth'
+        """
+        return self._search(location,
+                            lambda driver: driver.get_travel_time(location),
+                            self._max_speed)
+
+
+class RiderGrid(SpatialGrid):
+    """A spatial index of riders by origin, used to find the rider that a
+    driver can reach the fastest.
+    """
+
+    def __contains__(self, rider: Rider) -> bool:
+        """Return True iff <rider> is in this grid.
+
+        >>> grid = RiderGrid()
+        >>> rider = Rider("Almond", 5, Location(1, 1), Location(2, 2))
+        >>> rider in grid
+        False
+        >>> grid.add(rider)
+        >>> rider in grid
+        True
+        """
+        return rider.id in self._entries
+
+    def add(self, rider: Rider) -> None:
+        """Add <rider> to this grid at their origin.
+
+        Precondition: <rider> is not in this grid.
+        """
+        self._insert(rider.id, rider.origin, rider)
+
+    def remove(self, rider: Rider) -> None:
+        """Remove <rider> from this grid.
+
+        Precondition: <rider> is in this grid.
+
+        >>> grid = RiderGrid()
+        >>> rider = Rider("Almond", 5, Location(1, 1), Location(2, 2))
+        >>> grid.add(rider)
+        >>> grid.remove(rider)
+        >>> len(grid)
+        0
+        """
+        self._delete(rider.id)
+
+    def nearest(self, driver: Driver) -> Optional[Rider]:
+        """Return the rider <driver> can reach the fastest, or None if this
+        grid is empty.
+
+        >>> grid = RiderGrid(cell_size=2)
+        >>> grid.add(Rider("Almond", 5, Location(1, 1), Location(0, 0)))
+        >>> grid.add(Rider("Bisque", 5, Location(7, 7), Location(0, 0)))
+        >>> grid.add(Rider("Cerise", 5, Location(6, 8), Location(0, 0)))
+        >>> grid.nearest(Driver("Amaranth", Location(9, 9), 2)).id
+        'Bisque'
+        """
+        return self._search(driver.location,
+                            lambda rider: driver.get_travel_time(rider.origin),
+                            driver.speed)
+
+
+def cells_around(row: int, col: int, ring: int) -> Iterator[Tuple[int, int]]:
+    """Yield the cells exactly <ring> cells away from (<row>, <col>) in
+    Manhattan distance.
+
+    >>> sorted(cells_around(0, 0, 1))
+    [(-1, 0), (0, -1), (0, 1), (1, 0)]
+    """
+    if ring == 0:
+        yield row, col
+        return
+    for i in range(ring):
+        yield row + i, col + ring - i
+        yield row + ring - i, col - i
+        yield row - i, col - ring + i
+        yield row - ring + i, col + i
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(
+        config={'extra-imports': ['typing', 'driver', 'location', 'rider']})
@@ -0,0 +1,165 @@
+"""Histograms of non-negative integer values
+
+A Histogram counts values in buckets whose width grows with the value, in
+the style of an HDR histogram: values below 2 ** precision each have a
+bucket of their own, and above that every power of two is split into
+2 ** (precision - 1) buckets of equal width. Every value is therefore
+counted within a relative error of 2 ** (1 - precision), and the number of
+buckets only depends on the largest value, never on how many values are
+counted.
+
+Histograms with the same precision can be merged, and a merged histogram
+is exactly the histogram of all the values counted by either.
+"""
+
+from array import array
+from typing import Dict
+
+
+class Histogram:
+    """A histogram of non-negative integer values.
+
+    === Attributes ===
+    precision: The number of significant bits kept of every value.
+    count: The number of values counted.
+    total: The sum of the values counted.
+    max: The largest value counted, or 0 if there is none.
+    """
+    # Attribute Types
+    precision: int
+    count: int
+    total: int
+    max: int
+
+    # === Private Attributes ===
+    _counts: array
+    #     The number of values counted in each bucket, up to the bucket of
+    #     the largest value counted.
+    #
+    # === Representation Invariants ===
+    # - sum(_counts) == count
+
+    def __init__(self, precision: int = 8) -> None:
+        """Initialize an empty Histogram that keeps <precision> significant
+        bits of every value.
+
+        Precondition: precision >= 1
+        """
+        self.precision = precision
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self._counts = array("q")
+
+    def _bucket(self, value: int) -> int:
+        """Return the index of the bucket that counts <value>.
+
+        >>> histogram = Histogram(precision=3)
+        >>> [histogram._bucket(value) for value in [0, 7, 8, 9, 10, 16, 17]]
+        [0, 7, 8, 8, 9, 12, 12]
+        """
+        shift = max(0, value.bit_length() - self.precision)
+        return (shift << (self.precision - 1)) + (value >> shift)
+
+    def _highest(self, bucket: int) -> int:
+        """Return the largest value counted in <bucket>.
+
+        >>> histogram = Histogram(precision=3)
+        >>> [histogram._highest(bucket) for bucket in [7, 8, 9, 12]]
+        [7, 9, 11, 19]
+        """
+        half = 1 << (self.precision - 1)
+        shift = max(0, bucket // half - 1)
+        return ((bucket - (shift << (self.precision - 1)) + 1) << shift) - 1
+
+    def record(self, value: int) -> None:
+        """Count <value> once.
+
+        Raise a ValueError if <value> is negative.
+
+        >>> histogram = Histogram()
+        >>> histogram.record(5)
+        >>> histogram.count, histogram.total, histogram.max
+        (1, 5, 5)
+        """
+        if value < 0:
+            raise ValueError(f"cannot record negative value {value}")
+        bucket = self._bucket(value)
+        counts = self._counts
+        if bucket >= len(counts):
+            counts.extend([0] * (bucket + 1 - len(counts)))
+        counts[bucket] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: 'Histogram') -> None:
+        """Add every value counted by <other> to this histogram.
+
+        Raise a ValueError if <other> has a different precision.
+
+        >>> first, second = Histogram(), Histogram()
+        >>> first.record(3)
+        >>> second.record(900)
+        >>> first.merge(second)
+        >>> first.count, first.total, first.max
+        (2, 903, 900)
+        """
+        if other.precision != self.precision:
+            raise ValueError("cannot merge histograms with precisions "
+                             f"{self.precision} and {other.precision}")
+        counts = self._counts
+        if len(other._counts) > len(counts):
+            counts.extend([0] * (len(other._counts) - len(counts)))
+        for bucket, count in enumerate(other._counts):
+            counts[bucket] += count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percent: float) -> int:
+        """Return the smallest value that at least <percent> percent of the
+        counted values are at or below, to within the precision of this
+        histogram, or 0 if nothing has been counted.
+
+        The result is the largest value of its bucket, but never more than
+        the largest value counted.
+
+        Precondition: 0 <= percent <= 100
+
+        >>> histogram = Histogram()
+        >>> for value in range(1, 101):
+        ...     histogram.record(value)
+        >>> histogram.percentile(50), histogram.percentile(99)
+        (50, 99)
+        >>> histogram.record(100000)
+        >>> histogram.percentile(100)
+        100000
+        """
+        if self.count == 0:
+            return 0
+        rank = max(1, int(-(-self.count * percent // 100)))
+        seen = 0
+        for bucket, count in enumerate(self._counts):
+            seen += count
+            if seen >= rank:
+                return min(self._highest(bucket), self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, int]:
+        """Return the 50th, 90th and 99th percentiles and the largest value
+        counted, keyed by 'p50', 'p90', 'p99' and 'max'.
+
+        >>> histogram = Histogram()
+        >>> histogram.record(4)
+        >>> histogram.summary()
+        {'p50': 4, 'p90': 4, 'p99': 4, 'max': 4}
+        """
+        return {"p50": self.percentile(50), "p90": self.percentile(90),
+                "p99": self.percentile(99), "max": self.max}
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={'extra-imports': ['array', 'typing']})
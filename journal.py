@@ -0,0 +1,341 @@
+"""Journals of the activities of a simulation
+
+A Journal is a monitor that also writes every activity it is notified of to
+a binary journal file, so that the activities can be studied after the
+simulation without running it again. JournalFile maps a journal file into
+memory, and answers questions about it by reading records straight from
+the mapped file instead of building an object for every activity.
+
+A journal file is a header of an 8-byte magic string and four unsigned
+64-bit numbers: the number of records, the number of actors, the number of
+bytes in the id table, and 1 if the records are in order of time (0
+otherwise). Then come the records, one per activity, in the order they
+were notified. Each record is the time, the position of the actor's
+previous record (or -1), the time a driver was dispatched for a PICKUP,
+the actor's index, the row and column of the location, the codes of the
+category and the description, and 1 if the dispatch time is known (0
+otherwise), in _RECORD.
+
+After the records come the category of every actor, the position of every
+actor's last record, the offsets of the actors' ids in the id table, and
+the id table itself, which holds every actor's id in UTF-8. Every number is
+little-endian, and every column starts on an 8-byte boundary. The header
+and everything after the records are written when the journal is closed.
+"""
+
+import struct
+from array import array
+from typing import BinaryIO, Dict, Iterator, List, Optional, Sequence, \
+    Tuple
+from location import Location
+from mapped import MappedFile, write_column
+from monitor import Activity, Monitor, RIDER, DRIVER, REQUEST, CANCEL, \
+    PICKUP, DROPOFF
+
+_MAGIC = b"RIDEJNL1"
+# The first bytes of a journal file.
+_HEADER = struct.Struct("<8sQQQQ")
+# The header of a journal file.
+_RECORD = struct.Struct("<qqqIiiBBBx")
+# A record of a journal file: the time, the position of the previous record
+# of the same actor, the dispatch time, the actor, the row and column of the
+# location, the category and description codes, and whether the dispatch
+# time is known.
+_CATEGORIES = [RIDER, DRIVER]
+# The categories, in order of their code.
+_DESCRIPTIONS = [REQUEST, CANCEL, PICKUP, DROPOFF]
+# The descriptions, in order of their code.
+
+
+class Journal(Monitor):
+    """A monitor that also writes every activity it is notified of to a
+    journal file.
+
+    Records are collected in a buffer of about <buffer_size> bytes, which is
+    written to the file in one call whenever it fills up. Every actor's id
+    is written once, in the id table, and records refer to it by index.
+
+    Call close() when done to complete the file, or use the Journal in a
+    with statement.
+    """
+
+    # === Private Attributes ===
+    _file: BinaryIO
+    #     The journal file being written.
+    _buffer: bytearray
+    #     The records that have not yet been written to the file.
+    _buffer_size: int
+    #     The number of bytes to collect before writing them to the file.
+    _length: int
+    #     The number of records in the journal.
+    _ordered: bool
+    #     True iff every record so far is no earlier than the one before it.
+    _latest: Optional[int]
+    #     The time of the last record, or None if there is none.
+    _actors: Dict[str, Dict[str, int]]
+    #     The index of every actor, keyed by category and then id.
+    _categories: array
+    #     The category code of every actor, by index.
+    _last: array
+    #     The position of every actor's last record, by index.
+    _offsets: array
+    #     The offset of every actor's id in _table, by index, followed by
+    #     the length of _table.
+    _table: bytearray
+    #     Every actor's id in UTF-8, in order of index.
+
+    def __init__(self, filename: str, history: bool = True,
+                 buffer_size: int = 1 << 16) -> None:
+        """Initialize a Journal that writes to the file <filename>, and
+        keeps every activity in memory as well if <history> is True.
+
+        Precondition: buffer_size > 0
+        """
+        Monitor.__init__(self, history)
+        self._file = open(filename, "wb")
+        self._file.write(bytes(_HEADER.size))
+        self._buffer = bytearray()
+        self._buffer_size = buffer_size
+        self._length = 0
+        self._ordered = True
+        self._latest = None
+        self._actors = {category: {} for category in _CATEGORIES}
+        self._categories = array("B")
+        self._last = array("q")
+        self._offsets = array("Q", [0])
+        self._table = bytearray()
+
+    def notify(self, timestamp: int, category: str, description: str,
+               identifier: str, location: Location,
+               dispatched: Optional[int] = None) -> None:
+        """Notify the monitor of the activity, and add it to the journal.
+
+        Raise a ValueError if <description> is not REQUEST, CANCEL, PICKUP
+        or DROPOFF.
+
+        Precondition: category is RIDER or DRIVER, and <timestamp> and the
+        coordinates of <location> fit in signed 64-bit and 32-bit integers.
+        """
+        if description not in _DESCRIPTIONS:
+            raise ValueError(f"cannot journal description {description!r}")
+        code = _CATEGORIES.index(category)
+        actors = self._actors[category]
+        actor = actors.get(identifier)
+        if actor is None:
+            actor = actors[identifier] = len(self._last)
+            self._categories.append(code)
+            self._last.append(-1)
+            self._table += identifier.encode("utf-8")
+            self._offsets.append(len(self._table))
+        if self._latest is not None and timestamp < self._latest:
+            self._ordered = False
+        self._latest = timestamp
+        self._buffer += _RECORD.pack(
+            timestamp, self._last[actor], dispatched or 0, actor,
+            location.row, location.column, code,
+            _DESCRIPTIONS.index(description), dispatched is not None)
+        self._last[actor] = self._length
+        self._length += 1
+        if len(self._buffer) >= self._buffer_size:
+            self._flush()
+        Monitor.notify(self, timestamp, category, description, identifier,
+                       location, dispatched)
+
+    def _flush(self) -> None:
+        """Write the buffered records to the file.
+
+        """
+        self._file.write(self._buffer)
+        self._buffer.clear()
+
+    def __enter__(self) -> 'Journal':
+        """Return this Journal, for use in a with statement.
+
+        """
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Close this Journal at the end of a with statement.
+
+        """
+        self.close()
+
+    def close(self) -> None:
+        """Write the rest of the journal file, and close it.
+
+        This has no effect if the journal is already closed.
+        """
+        if self._file.closed:
+            return
+        self._flush()
+        for column in [self._categories, self._last, self._offsets,
+                       array("B", self._table)]:
+            write_column(self._file, column)
+        self._file.seek(0)
+        self._file.write(_HEADER.pack(_MAGIC, self._length, len(self._last),
+                                      len(self._table), int(self._ordered)))
+        self._file.close()
+
+
+class JournalFile(MappedFile):
+    """A journal file written by a Journal, mapped into memory.
+
+    Records are read from the mapped file when they are needed, so the
+    journal never has to fit in memory. Positions are the order in which
+    the activities were notified, starting from 0.
+
+    Call close() when done, or use the JournalFile in a with statement.
+    """
+
+    # === Private Attributes ===
+    _count: int
+    #     The number of records.
+    _ordered: bool
+    #     True iff the records are in order of time.
+    _columns: Dict[str, Sequence[int]]
+    #     The category, last record and id offset of every actor, keyed by
+    #     "categories", "last" and "offsets".
+    _table: memoryview
+    #     The id table.
+    _actors: Optional[Dict[Tuple[int, str], int]]
+    #     The index of every actor, keyed by category code and id, or None
+    #     until it is first needed.
+
+    def _open(self, filename: str) -> None:
+        """Read the header of the mapped file <filename>, and make views of
+        the columns after the records.
+        """
+        magic, count, actor_count, table_size, ordered = \
+            _HEADER.unpack_from(self._map)
+        if magic != _MAGIC:
+            raise ValueError(f"{filename} is not a complete journal file")
+        self._count = count
+        self._ordered = bool(ordered)
+        self._actors = None
+        self._columns = self._map_columns(
+            filename, _HEADER.size + count * _RECORD.size,
+            [("categories", "B", actor_count), ("last", "q", actor_count),
+             ("offsets", "Q", actor_count + 1), ("table", "B", table_size)])
+        self._table = self._columns.pop("table")
+
+    def __len__(self) -> int:
+        """Return the number of activities in the journal.
+
+        """
+        return self._count
+
+    def _record(self, position: int) -> tuple:
+        """Return the items of the record at <position>.
+
+        """
+        return _RECORD.unpack_from(self._map,
+                                   _HEADER.size + position * _RECORD.size)
+
+    def _id(self, actor: int) -> str:
+        """Return the id of the actor with index <actor>.
+
+        """
+        offsets = self._columns["offsets"]
+        return str(self._table[offsets[actor]:offsets[actor + 1]], "utf-8")
+
+    def _activity(self, record: tuple) -> Tuple[str, Activity]:
+        """Return the category and a new Activity for the items of
+        <record>.
+
+        """
+        time, _, _, actor, row, column, category, description, _ = record
+        return _CATEGORIES[category], Activity(
+            time, _DESCRIPTIONS[description], self._id(actor),
+            Location(row, column))
+
+    def activity(self, position: int) -> Tuple[str, Activity]:
+        """Return the category and a new Activity for the activity at
+        <position>.
+
+        """
+        if position < 0:
+            position += self._count
+        if not 0 <= position < self._count:
+            raise IndexError("activity position out of range")
+        return self._activity(self._record(position))
+
+    def activities(self, category: str, identifier: str) -> List[Activity]:
+        """Return the activities of the actor <identifier> in <category>, in
+        the order they were notified, such as the trajectory of a driver.
+
+        Only the actor's own records are read, by following each record's
+        link to the one before it.
+        """
+        if self._actors is None:
+            categories = self._columns["categories"]
+            self._actors = {(categories[actor], self._id(actor)): actor
+                            for actor in range(len(categories))}
+        actor = self._actors.get((_CATEGORIES.index(category), identifier))
+        if actor is None:
+            return []
+        activities = []
+        position = self._columns["last"][actor]
+        while position >= 0:
+            record = self._record(position)
+            activities.append(self._activity(record)[1])
+            position = record[1]
+        activities.reverse()
+        return activities
+
+    def between(self, start: int, end: int) \
+            -> Iterator[Tuple[str, Activity]]:
+        """Yield the category and a new Activity for every activity from
+        time <start> up to but not including time <end>, in the order they
+        were notified.
+
+        If the records are in order of time, as they are for a simulation,
+        the first one is found by binary search, and no records outside
+        the range are read. Otherwise every record is read.
+        """
+        position = 0
+        if self._ordered:
+            high = self._count
+            while position < high:
+                middle = (position + high) // 2
+                if self._record(middle)[0] < start:
+                    position = middle + 1
+                else:
+                    high = middle
+        while position < self._count:
+            record = self._record(position)
+            if start <= record[0] < end:
+                yield self._activity(record)
+            elif self._ordered and record[0] >= end:
+                return
+            position += 1
+
+    def report(self, detailed: bool = False) -> Dict[str, float]:
+        """Return the report that the Journal gave, or would have given,
+        after the last activity in the journal.
+
+        The records are replayed, in order, into a monitor without history,
+        so the report is only the same if every rider's first activity is
+        their only REQUEST, as it is in a simulation.
+        """
+        monitor = Monitor(history=False)
+        records = self._data[_HEADER.size:
+                             _HEADER.size + self._count * _RECORD.size]
+        try:
+            for time, _, dispatched, actor, row, column, category, \
+                    description, known in _RECORD.iter_unpack(records):
+                monitor.notify(time, _CATEGORIES[category],
+                               _DESCRIPTIONS[description], self._id(actor),
+                               Location(row, column),
+                               dispatched if known else None)
+        finally:
+            records.release()
+        return monitor.report(detailed)
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'max-args': 7,
+        'allowed-io': ['Journal.__init__'],
+        'extra-imports': ['struct', 'array', 'typing', 'location', 'mapped',
+                          'monitor']})
@@ -0,0 +1,410 @@
+"""Fast loading of event files
+
+read_events() gives the same list of events as event.create_event_list(),
+but parses the file in parallel. The file is split into chunks of about
+<chunk_size> bytes that end on line boundaries, and each chunk is parsed in
+a worker process into columns of plain numbers and strings, which are
+cheap to send back. The events are then built from the columns in one
+pass, in file order.
+
+A chunk that the fast parser cannot handle is parsed again line by line
+with event.parse_event(), so a malformed file raises the same exception as
+create_event_list() does.
+
+For repeated runs on the same day, convert_events() converts an event file
+to a binary columnar format once, and EventFile then maps the binary file
+into memory in a few milliseconds. Its columns are read straight from the
+mapped file, and each event is only built when it is asked for.
+
+A binary event file is a header of an 8-byte magic string and three
+unsigned 64-bit counts: of events, of distinct ids, and of bytes in the id
+table. Then come the columns of _LAYOUT, one item per event, the offsets
+of the ids in the id table, and the id table itself, which holds every
+distinct id in UTF-8. Every number is little-endian, and every column
+starts on an 8-byte boundary.
+"""
+
+import gc
+import os
+import struct
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, \
+    Tuple
+from driver import Driver
+from event import Event, DriverRequest, RiderRequest, parse_event
+from location import interned_location
+from mapped import MappedFile, write_column
+from rider import Rider
+
+_DRIVER = 0
+# The kind of a DriverRequest record.
+_RIDER = 1
+# The kind of a RiderRequest record.
+_UNKNOWN = 2
+# The kind of a record with an unknown event type, which becomes None.
+
+_MAGIC = b"RIDEEVT1"
+# The first bytes of a binary event file.
+_HEADER = struct.Struct("<8sQQQ")
+# The header of a binary event file.
+_LAYOUT = [("timestamps", "q"), ("kinds", "B"), ("ids", "I"),
+           ("values", "i"), ("origin_rows", "i"), ("origin_columns", "i"),
+           ("destination_rows", "i"), ("destination_columns", "i")]
+# The name and array typecode of every per-event column of a binary event
+# file, in file order. An id is an index into the id table, and a value is
+# a driver's speed or a rider's patience. Drivers have no destination, so
+# theirs is stored as 0,0.
+
+_Columns = Tuple[bytes, array, str, array, array, array, array, array]
+# The records parsed from one chunk: their kinds, timestamps, ids separated
+# by newlines, speeds or patiences, origin and destination indexes into the
+# chunk's table of locations, and the rows and columns of that table.
+
+
+def read_events(filename: str, workers: Optional[int] = None,
+                chunk_size: int = 1 << 22) -> List[Event]:
+    """Return a list of Events based on raw list of events in <filename>,
+    exactly as create_event_list(<filename>) does.
+
+    workers: the number of worker processes to parse chunks in, or None
+        for one per CPU. With fewer than two, chunks are parsed in this
+        process.
+    chunk_size: the approximate size of a chunk, in bytes.
+
+    Precondition: the file stored at <filename> is in the format specified
+    by the assignment handout, and chunk_size > 0.
+    """
+    with open(filename, "r") as file:
+        encoding = file.encoding
+    bounds = _chunk_bounds(filename, chunk_size)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 2 or len(bounds) < 2:
+        return _build_events(filename, encoding, bounds,
+                             (_parse_chunk(filename, start, end, encoding)
+                              for start, end in bounds))
+    with ProcessPoolExecutor(min(workers, len(bounds))) as pool:
+        return _build_events(filename, encoding, bounds,
+                             pool.map(_parse_chunk, repeat(filename),
+                                      *zip(*bounds), repeat(encoding)))
+
+
+def _chunk_bounds(filename: str, chunk_size: int) -> List[Tuple[int, int]]:
+    """Return the (start, end) byte offsets of the chunks of <filename>.
+
+    Every chunk but the last is at least <chunk_size> bytes long and ends
+    just after a newline.
+    """
+    size = os.path.getsize(filename)
+    bounds = []
+    start = 0
+    with open(filename, "rb") as file:
+        while start < size:
+            end = start + chunk_size
+            if end < size:
+                file.seek(end - 1)
+                file.readline()
+                end = file.tell()
+            else:
+                end = size
+            bounds.append((start, end))
+            start = end
+    return bounds
+
+
+def _read_lines(filename: str, start: int, end: int,
+                encoding: str) -> List[str]:
+    """Return the lines of <filename> from byte <start> to byte <end>, with
+    newlines translated as a file opened in text mode would.
+    """
+    with open(filename, "rb") as file:
+        file.seek(start)
+        text = file.read(end - start).decode(encoding)
+    return text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+
+
+def _parse_chunk(filename: str, start: int, end: int,
+                 encoding: str) -> Optional[_Columns]:
+    """Return the records parsed from the lines of <filename> from byte
+    <start> to byte <end>, or None if a line could not be parsed.
+    """
+    kinds = bytearray()
+    timestamps = array("q")
+    ids = []
+    values = array("q")
+    origins = array("l")
+    destinations = array("l")
+    rows = array("q")
+    columns = array("q")
+    table = {}
+
+    def index(location_str: str) -> int:
+        """Return the index of <location_str> in the table of locations,
+        adding it if it is new.
+        """
+        i = table.get(location_str)
+        if i is None:
+            coordinate = location_str.partition(",")
+            rows.append(int(coordinate[0]))
+            columns.append(int(coordinate[2]))
+            i = table[location_str] = len(table)
+        return i
+
+    try:
+        for line in _read_lines(filename, start, end, encoding):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            tokens = line.split()
+            timestamps.append(int(tokens[0]))
+            if tokens[1] == "DriverRequest":
+                kinds.append(_DRIVER)
+                ids.append(tokens[2])
+                origins.append(index(tokens[3]))
+                destinations.append(0)
+                values.append(int(tokens[4]))
+            elif tokens[1] == "RiderRequest":
+                kinds.append(_RIDER)
+                ids.append(tokens[2])
+                origins.append(index(tokens[3]))
+                destinations.append(index(tokens[4]))
+                values.append(int(tokens[5]))
+            else:
+                kinds.append(_UNKNOWN)
+                ids.append("")
+                origins.append(0)
+                destinations.append(0)
+                values.append(0)
+    except (ValueError, IndexError, OverflowError):
+        return None
+    return (bytes(kinds), timestamps, "\n".join(ids), values, origins,
+            destinations, rows, columns)
+
+
+def _build_events(filename: str, encoding: str,
+                  bounds: List[Tuple[int, int]],
+                  chunks: Iterable[Optional[_Columns]]) -> List[Event]:
+    """Return the events in <chunks>, which were parsed from the chunks of
+    <filename> at <bounds>, in order.
+
+    A chunk that could not be parsed is parsed again with parse_event(),
+    so that its error is raised from the same line as create_event_list().
+
+    The cyclic garbage collector is paused meanwhile. The new objects hold
+    no cycles, but creating millions of them would otherwise set off
+    repeated full collections.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _collect_events(filename, encoding, bounds, chunks)
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _collect_events(filename: str, encoding: str,
+                    bounds: List[Tuple[int, int]],
+                    chunks: Iterable[Optional[_Columns]]) -> List[Event]:
+    """Return the events in <chunks>, as _build_events does, without
+    pausing the garbage collector.
+    """
+    events = []
+    for (start, end), chunk in zip(bounds, chunks):
+        if chunk is None:
+            for line in _read_lines(filename, start, end, encoding):
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    events.append(parse_event(line))
+            continue
+        kinds, timestamps, ids, values, origins, destinations, rows, \
+            columns = chunk
+        if not kinds:
+            continue
+        locations = [interned_location(row, column)
+                     for row, column in zip(rows, columns)]
+        for kind, timestamp, identifier, value, origin, destination in zip(
+                kinds, timestamps, ids.split("\n"), values, origins,
+                destinations):
+            if kind == _DRIVER:
+                events.append(DriverRequest(
+                    timestamp,
+                    Driver(identifier, locations[origin], value)))
+            elif kind == _RIDER:
+                events.append(RiderRequest(
+                    timestamp,
+                    Rider(identifier, value, locations[origin],
+                          locations[destination])))
+            else:
+                events.append(None)
+    return events
+
+
+def convert_events(filename: str, binary_filename: str,
+                   chunk_size: int = 1 << 22) -> int:
+    """Convert the event file <filename> to a binary event file at
+    <binary_filename>, and return the number of events written.
+
+    The events are written in the order of the file. Lines with an unknown
+    event type are left out. Any error in <filename> is raised as
+    create_event_list() would raise it.
+
+    Precondition: the file stored at <filename> is in the format specified
+    by the assignment handout, every coordinate, speed and patience fits in
+    a signed 32-bit integer, and chunk_size > 0.
+    """
+    with open(filename, "r") as file:
+        encoding = file.encoding
+    columns = {name: array(typecode) for name, typecode in _LAYOUT}
+    appends = [columns[name].append for name, _ in _LAYOUT]
+    ids = {}
+    for start, end in _chunk_bounds(filename, chunk_size):
+        for record in _records(filename, start, end, encoding):
+            record[2] = ids.setdefault(record[2], len(ids))
+            for append, item in zip(appends, record):
+                append(item)
+
+    table = bytearray()
+    offsets = array("Q", [0])
+    for identifier in ids:
+        table += identifier.encode("utf-8")
+        offsets.append(len(table))
+    with open(binary_filename, "wb") as file:
+        file.write(_HEADER.pack(_MAGIC, len(columns["timestamps"]), len(ids),
+                                len(table)))
+        for name, _ in _LAYOUT:
+            write_column(file, columns[name])
+        write_column(file, offsets)
+        write_column(file, array("B", table))
+    return len(columns["timestamps"])
+
+
+def _records(filename: str, start: int, end: int,
+             encoding: str) -> Iterator[list]:
+    """Yield the events of known types in the lines of <filename> from byte
+    <start> to byte <end>, as lists of their items in the columns of
+    _LAYOUT, with the id itself in place of its index.
+    """
+    chunk = _parse_chunk(filename, start, end, encoding)
+    if chunk is None:
+        for line in _read_lines(filename, start, end, encoding):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            event = parse_event(line)
+            if isinstance(event, DriverRequest):
+                driver = event.driver
+                yield [event.timestamp, _DRIVER, driver.id, driver.speed,
+                       driver.location.row, driver.location.column, 0, 0]
+            elif isinstance(event, RiderRequest):
+                rider = event.rider
+                yield [event.timestamp, _RIDER, rider.id, rider.patience,
+                       rider.origin.row, rider.origin.column,
+                       rider.destination.row, rider.destination.column]
+        return
+    kinds, timestamps, ids, values, origins, destinations, rows, \
+        columns = chunk
+    if not kinds:
+        return
+    for kind, timestamp, identifier, value, origin, destination in zip(
+            kinds, timestamps, ids.split("\n"), values, origins,
+            destinations):
+        if kind == _DRIVER:
+            yield [timestamp, kind, identifier, value, rows[origin],
+                   columns[origin], 0, 0]
+        elif kind == _RIDER:
+            yield [timestamp, kind, identifier, value, rows[origin],
+                   columns[origin], rows[destination], columns[destination]]
+
+
+class EventFile(MappedFile):
+    """A binary event file written by convert_events(), mapped into memory.
+
+    An EventFile is a read-only sequence of the events in the file, which
+    are built each time they are indexed or iterated over. Iterating over
+    it gives the events in file order, so Simulation.run() streams it if
+    the events are in order of timestamp; otherwise run it on
+    list(<event file>).
+
+    Call close() when done, or use the EventFile in a with statement.
+
+    === Attributes ===
+    timestamps: The timestamp of every event, read from the mapped file.
+    """
+    # Attribute Types
+    timestamps: Sequence[int]
+
+    # === Private Attributes ===
+    _columns: Dict[str, Sequence[int]]
+    #     Every column of _LAYOUT, keyed by name, followed by the offsets of
+    #     the ids in the id table under "offsets".
+    _table: memoryview
+    #     The id table.
+
+    def _open(self, filename: str) -> None:
+        """Read the header of the mapped file <filename>, and make views of
+        its columns.
+        """
+        magic, count, id_count, table_size = _HEADER.unpack_from(self._map)
+        if magic != _MAGIC:
+            raise ValueError(f"{filename} is not a binary event file")
+        self._columns = self._map_columns(
+            filename, _HEADER.size,
+            [(name, typecode, count) for name, typecode in _LAYOUT] +
+            [("offsets", "Q", id_count + 1), ("table", "B", table_size)])
+        self._table = self._columns.pop("table")
+        self.timestamps = self._columns["timestamps"]
+
+    def __len__(self) -> int:
+        """Return the number of events in the file.
+
+        """
+        return len(self.timestamps)
+
+    def __getitem__(self, index: int) -> Event:
+        """Return a new event built from the event at <index> in the file.
+
+        """
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("event index out of range")
+        return self._event(*(self._columns[name][index]
+                             for name, _ in _LAYOUT))
+
+    def __iter__(self) -> Iterator[Event]:
+        """Yield a new event built from every event in the file, in order.
+
+        """
+        columns = self._columns
+        for items in zip(*(columns[name] for name, _ in _LAYOUT)):
+            yield self._event(*items)
+
+    def _event(self, timestamp: int, kind: int, identifier: int, value: int,
+               origin_row: int, origin_column: int, destination_row: int,
+               destination_column: int) -> Event:
+        """Return a new event with the given items of the columns.
+
+        """
+        offsets = self._columns["offsets"]
+        name = str(self._table[offsets[identifier]:
+                               offsets[identifier + 1]], "utf-8")
+        origin = interned_location(origin_row, origin_column)
+        if kind == _DRIVER:
+            return DriverRequest(timestamp, Driver(name, origin, value))
+        return RiderRequest(timestamp, Rider(
+            name, value, origin,
+            interned_location(destination_row, destination_column)))
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-io': ['_chunk_bounds', '_read_lines', 'read_events',
+                       'convert_events'],
+        'extra-imports': ['gc', 'os', 'struct', 'array',
+                          'concurrent.futures', 'itertools', 'typing',
+                          'driver', 'event', 'location', 'mapped',
+                          'rider']})
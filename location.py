@@ -1,11 +1,31 @@
 """Locations for the simulation"""
 
 from __future__ import annotations
+from collections import OrderedDict
+from typing import Sequence
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+_INTERNED_CAPACITY = 1 << 16
+# The largest number of locations kept in each interning cache.
+_interned: OrderedDict = OrderedDict()
+# The location deserialized from each recently seen string, least recently
+# used first.
+_by_coordinates: OrderedDict = OrderedDict()
+# The location shared by every string with the same coordinates, keyed by
+# (row, column), least recently used first.
 
 
 class Location:
     """A two-dimensional location.
 
+    Locations are immutable and hashable, so they can be used as dict keys
+    and set elements. Their attributes are kept in __slots__ instead of a
+    per-instance dict, to keep them small.
+
     === Attributes ===
     row: the number of blocks the location is from
         the left of the grid.
@@ -21,6 +41,8 @@ class Location:
     row: int
     column: int
 
+    __slots__ = ('row', 'column')
+
     def __init__(self, row: int, column: int) -> None:
         """Initialize a location.
 
@@ -32,19 +54,35 @@ class Location:
         >>> l.column
         0
         """
-        self.row = row
-        self.column = column
+        object.__setattr__(self, 'row', row)
+        object.__setattr__(self, 'column', column)
+
+    def __setattr__(self, name: str, value: object) -> None:
+        """Raise an AttributeError, since locations are immutable.
+
+        >>> l = Location(0,0)
+        >>> l.row = 1
+        Traceback (most recent call last):
+        AttributeError: Location is immutable
+        """
+        raise AttributeError('Location is immutable')
+
+    def __delattr__(self, name: str) -> None:
+        """Raise an AttributeError, since locations are immutable.
+
+        """
+        raise AttributeError('Location is immutable')
 
     def __str__(self) -> str:
         """Return a string representation.
 
         >>> l = Location(0,0)
         >>> l.__str__()
-        '0,0'
+        '(0,0)'
         """
         return f'({self.row},{self.column})'
 
-    def __eq__(self, other: Location) -> bool:
+    def __eq__(self, other: object) -> bool:
         """Return True if self equals other, and false otherwise.
 
         >>> l = Location(0,0)
@@ -55,8 +93,20 @@ class Location:
         >>> l.__eq__(l3)
         False
         """
+        if not isinstance(other, Location):
+            return NotImplemented
         return (self.row == other.row) and (self.column == other.column)
 
+    def __hash__(self) -> int:
+        """Return a hash of this location, equal for equal locations.
+
+        >>> hash(Location(1,2)) == hash(Location(1,2))
+        True
+        >>> len({Location(1,2), Location(1,2), Location(2,1)})
+        2
+        """
+        return hash((self.row, self.column))
+
 
 def manhattan_distance(origin: Location, destination: Location) -> int:
     """Return the Manhattan distance between the origin and the destination.
@@ -71,22 +121,120 @@ def manhattan_distance(origin: Location, destination: Location) -> int:
     return row_value + column_value
 
 
+def manhattan_distances(origin: Location, rows: Sequence[int],
+                        columns: Sequence[int]) -> list:
+    """Return the Manhattan distances between <origin> and each location
+    with a row in <rows> and the column at the same index in <columns>.
+
+    The distances are a NumPy array if NumPy is installed, and a list of
+    ints otherwise.
+
+    >>> [int(d) for d in manhattan_distances(Location(5,5), [9, 5], [7, 0])]
+    [6, 5]
+    """
+    if np is None:
+        return [abs(row - origin.row) + abs(column - origin.column)
+                for row, column in zip(rows, columns)]
+    return np.abs(np.asarray(rows, dtype=np.int64) - origin.row) + \
+        np.abs(np.asarray(columns, dtype=np.int64) - origin.column)
+
+
+def paired_manhattan_distances(origin_rows: Sequence[int],
+                               origin_columns: Sequence[int],
+                               destination_rows: Sequence[int],
+                               destination_columns: Sequence[int]) -> list:
+    """Return the Manhattan distance between each origin and the
+    destination at the same index, where origin i is at
+    (<origin_rows>[i], <origin_columns>[i]), and likewise for destinations.
+
+    The distances are a NumPy array if NumPy is installed, and a list of
+    ints otherwise. NumPy arrays of different shapes are broadcast against
+    each other, so a column of origins and a row of destinations give a
+    matrix of distances.
+
+    >>> [int(d) for d in paired_manhattan_distances([5, 0], [5, 0],
+    ...                                             [9, 0], [7, 3])]
+    [6, 3]
+    """
+    if np is None:
+        return [abs(o_row - d_row) + abs(o_column - d_column)
+                for o_row, o_column, d_row, d_column
+                in zip(origin_rows, origin_columns, destination_rows,
+                       destination_columns)]
+    return np.abs(np.asarray(origin_rows, dtype=np.int64) -
+                  np.asarray(destination_rows, dtype=np.int64)) + \
+        np.abs(np.asarray(origin_columns, dtype=np.int64) -
+               np.asarray(destination_columns, dtype=np.int64))
+
+
 def deserialize_location(location_str: str) -> Location:
     """Deserialize a location.
 
     location_str: A location in the format 'row,col'
 
+    Locations are interned: every string with the same coordinates gives
+    the same Location object, so that repeated coordinates in an event file
+    share one instance. Only the most recently used locations are
+    remembered, so a string whose location has been forgotten gives a new,
+    equal Location.
+
     >>> l = deserialize_location('0,0')
     >>> l.row
     0
     >>> l.column
     0
+    >>> deserialize_location('3,4') is deserialize_location('03,4')
+    True
+    """
+    location = _interned.get(location_str)
+    if location is None:
+        coordinate = location_str.partition(',')
+        location = interned_location(int(coordinate[0]),
+                                     int(coordinate[2]))
+        _interned[location_str] = location
+        if len(_interned) > _INTERNED_CAPACITY:
+            _interned.popitem(last=False)
+    else:
+        _interned.move_to_end(location_str)
+    return location
+
+
+def interned_location(row: int, column: int) -> Location:
+    """Return the interned location at <row> and <column>, which is the
+    same object that deserialize_location gives for those coordinates.
+
+    >>> interned_location(3, 4) is deserialize_location('3,4')
+    True
+    """
+    key = (row, column)
+    location = _by_coordinates.get(key)
+    if location is None:
+        location = _by_coordinates[key] = Location(row, column)
+        if len(_by_coordinates) > _INTERNED_CAPACITY:
+            _by_coordinates.popitem(last=False)
+    else:
+        _by_coordinates.move_to_end(key)
+    return location
+
+
+def clear_interned() -> None:
+    """Forget every interned location.
+
+    Locations that are still in use stay valid, but are no longer shared
+    with locations deserialized afterwards. The caches are bounded, so this
+    is never needed for memory; nothing in the simulation calls it.
+
+    >>> first = deserialize_location('3,4')
+    >>> clear_interned()
+    >>> deserialize_location('3,4') is first
+    False
     """
-    coordinate = location_str.partition(',')
-    return Location(int(coordinate[0]), int(coordinate[2]))
+    _interned.clear()
+    _by_coordinates.clear()
 
 
 if __name__ == '__main__':
     import python_ta
 
-    python_ta.check_all()
+    python_ta.check_all(
+        config={'extra-imports': ['collections', 'typing', 'numpy']})
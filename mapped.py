@@ -0,0 +1,136 @@
+"""Binary files of columns, mapped into memory
+
+The binary event files of the loader module and the journal files of the
+journal module both store their numbers in columns: little-endian typed
+arrays that each start on an 8-byte boundary. write_column() writes such a
+column, and MappedFile maps a file of them into memory and makes views of
+its columns without copying them.
+"""
+
+import mmap
+import struct
+import sys
+from array import array
+from typing import BinaryIO, Dict, List, Optional, Sequence, Tuple
+
+
+def write_column(file: BinaryIO, column: array) -> None:
+    """Write <column> to <file> in little-endian order, padded with zeros
+    to a multiple of 8 bytes.
+    """
+    if sys.byteorder != "little":
+        column = array(column.typecode, column)
+        column.byteswap()
+    data = column.tobytes()
+    file.write(data)
+    file.write(bytes(-len(data) % 8))
+
+
+class MappedFile:
+    """A binary file of columns, mapped into memory for reading.
+
+    This is an abstract class: subclasses read their header and make views
+    of their columns in _open().
+
+    Call close() when done, or use the MappedFile in a with statement.
+    """
+
+    # === Private Attributes ===
+    _file: BinaryIO
+    #     The open file.
+    _map: Optional[mmap.mmap]
+    #     The memory map of the file, or None if it has been closed.
+    _data: memoryview
+    #     A view of the whole memory map.
+    _views: List[memoryview]
+    #     Every view of the memory map, which must be released before the
+    #     map is closed.
+
+    def __init__(self, filename: str) -> None:
+        """Open and map the file <filename>, and read it with _open().
+
+        Raise a ValueError if <filename> is not a complete file of the
+        subclass's format.
+        """
+        self._file = open(filename, "rb")
+        self._map = None
+        self._views = []
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+            self._data = memoryview(self._map)
+            self._views.append(self._data)
+            self._open(filename)
+        except (ValueError, struct.error):
+            self.close()
+            raise
+
+    def _open(self, filename: str) -> None:
+        """Read the header of the mapped file <filename>, and make views of
+        its columns.
+
+        Raise a ValueError or struct.error if the file is not complete.
+        """
+        raise NotImplementedError("Implemented in a subclass")
+
+    def _map_columns(self, filename: str, offset: int,
+                     layout: Sequence[Tuple[str, str, int]]) \
+            -> Dict[str, Sequence[int]]:
+        """Return views of the columns of the mapped file <filename> that
+        start at byte <offset>, keyed by name.
+
+        <layout> gives the name, array typecode and length of every column,
+        in file order. Columns of bytes are memoryviews of the map; other
+        columns are cast to their typecode, or copied and byte-swapped on
+        big-endian machines.
+
+        Raise a ValueError if the file ends before the last column does.
+        """
+        columns = {}
+        for name, typecode, length in layout:
+            size = length * array(typecode).itemsize
+            if offset + size > len(self._data):
+                raise ValueError(f"{filename} is truncated")
+            column = self._data[offset:offset + size]
+            self._views.append(column)
+            if typecode == "B":
+                columns[name] = column
+            elif sys.byteorder == "little":
+                columns[name] = column.cast(typecode)
+                self._views.append(columns[name])
+            else:
+                columns[name] = array(typecode, column.tobytes())
+                columns[name].byteswap()
+            offset += size + -size % 8
+        return columns
+
+    def __enter__(self) -> 'MappedFile':
+        """Return this file, for use in a with statement.
+
+        """
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Close this file at the end of a with statement.
+
+        """
+        self.close()
+
+    def close(self) -> None:
+        """Unmap and close the file.
+
+        """
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-io': ['MappedFile.__init__'],
+        'extra-imports': ['mmap', 'struct', 'sys', 'array', 'typing']})
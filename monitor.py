@@ -1,7 +1,7 @@
 """
-The Monitor module contains the Monitor class, the Activity class,
-and a collection of constants. Together the elements of the module
-help keep a record of activities that have occurred.
+The Monitor module contains the Monitor class, the Activity class, the
+ActivityLog class, and a collection of constants. Together the elements of
+the module help keep a record of activities that have occurred.
 
 Activities fall into two categories: Rider activities and Driver
 activities. Each activity also has a description, which is one of
@@ -16,8 +16,16 @@ PICKUP: A constant used for the pickup activity description.
 DROPOFF: A constant used for the dropoff activity description.
 """
 
-from typing import Dict, List
-from location import Location, manhattan_distance
+from array import array
+from typing import Dict, List, Optional
+from histogram import Histogram
+from location import Location
+from travel import distance, installed
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
 
 RIDER = "rider"
 DRIVER = "driver"
@@ -27,6 +35,9 @@ CANCEL = "cancel"
 PICKUP = "pickup"
 DROPOFF = "dropoff"
 
+_CATEGORIES = [RIDER, DRIVER]
+# The categories, in order of their index in an ActivityLog.
+
 
 class Activity:
     """An activity that occurs in the simulation.
@@ -54,36 +65,261 @@ class Activity:
         self.location = location
 
 
-class Monitor:
-    """A monitor keeps a record of activities that it is notified about.
-    When required, it generates a report of the activities it has recorded.
+class ActivityLog:
+    """An append-only log of activities, stored as one typed array per
+    column instead of one object per activity.
+
+    Every actor is interned: their identifier is stored once, and each of
+    their activities refers to it by index. Identifiers are indexed
+    separately for each category, in order of first activity, and
+    descriptions are indexed in order of first use.
+
+    === Attributes ===
+    times: The time of every activity, in the order they were logged.
+    categories: The category of every activity: 0 for RIDER, 1 for DRIVER.
+    descriptions: The index of every activity's description.
+    actors: The index of every activity's actor within their category.
+    rows: The row of every activity's location.
+    columns: The column of every activity's location.
+    previous: The position in the log of the previous activity by the same
+        actor, or -1 for an actor's first activity.
     """
+    # Attribute Types
+    times: array
+    categories: array
+    descriptions: array
+    actors: array
+    rows: array
+    columns: array
+    previous: array
 
     # === Private Attributes ===
-    _activities: Dict[str, Dict[str, List[Activity]]]
-    #       A dictionary whose key is a category, and value is another
-    #       dictionary. The key of the second dictionary is an identifier
-    #       and its value is a list of Activities.
+    _identifiers: Dict[str, Dict[str, int]]
+    #     The index of every actor, keyed by category and then identifier.
+    _names: Dict[str, List[str]]
+    #     The identifier of every actor, by category and index.
+    _last: Dict[str, array]
+    #     The position of the last activity of every actor, by category and
+    #     index.
+    _codes: Dict[str, int]
+    #     The index of every description used so far.
+    _descriptions: List[str]
+    #     Every description used so far, by index.
 
     def __init__(self) -> None:
-        """Initialize a Monitor.
+        """Initialize an empty ActivityLog.
+
+        """
+        self.times = array("q")
+        self.categories = array("B")
+        self.descriptions = array("B")
+        self.actors = array("I")
+        self.rows = array("i")
+        self.columns = array("i")
+        self.previous = array("q")
+        self._identifiers = {RIDER: {}, DRIVER: {}}
+        self._names = {RIDER: [], DRIVER: []}
+        self._last = {RIDER: array("q"), DRIVER: array("q")}
+        self._codes = {}
+        self._descriptions = []
+
+    def __len__(self) -> int:
+        """Return the number of activities in this log.
+
+        >>> log = ActivityLog()
+        >>> log.append(0, RIDER, REQUEST, "Almond", Location(1, 1))
+        -1
+        >>> len(log)
+        1
+        """
+        return len(self.times)
+
+    def append(self, timestamp: int, category: str, description: str,
+               identifier: str, location: Location) -> int:
+        """Add an activity to the end of this log, and return the position
+        of the actor's previous activity, or -1 if this is their first.
+
+        Precondition: category is RIDER or DRIVER, and the coordinates of
+        <location> fit in signed 32-bit integers.
+        """
+        identifiers = self._identifiers[category]
+        actor = identifiers.get(identifier)
+        last = self._last[category]
+        if actor is None:
+            actor = identifiers[identifier] = len(identifiers)
+            self._names[category].append(identifier)
+            last.append(-1)
+        code = self._codes.get(description)
+        if code is None:
+            code = self._codes[description] = len(self._descriptions)
+            self._descriptions.append(description)
+        previous = last[actor]
+        self.previous.append(previous)
+        last[actor] = len(self.times)
+        self.times.append(timestamp)
+        self.categories.append(_CATEGORIES.index(category))
+        self.descriptions.append(code)
+        self.actors.append(actor)
+        self.rows.append(location.row)
+        self.columns.append(location.column)
+        return previous
+
+    def count(self, category: str) -> int:
+        """Return the number of actors in <category> with an activity.
+
+        """
+        return len(self._names[category])
+
+    def code(self, description: str) -> Optional[int]:
+        """Return the index of <description>, or None if it is not used.
+
+        """
+        return self._codes.get(description)
+
+    def activity(self, position: int) -> Activity:
+        """Return the activity at <position> in this log, as an Activity.
 
+        >>> log = ActivityLog()
+        >>> log.append(3, DRIVER, PICKUP, "Amaranth", Location(1, 2))
+        -1
+        >>> activity = log.activity(0)
+        >>> activity.time, activity.description, activity.id
+        (3, 'pickup', 'Amaranth')
         """
-        self._activities = {
-            RIDER: {},
-            DRIVER: {}
-        }
-        """@type _activities: dict[str, dict[str, list[Activity]]]"""
+        category = _CATEGORIES[self.categories[position]]
+        return Activity(self.times[position],
+                        self._descriptions[self.descriptions[position]],
+                        self._names[category][self.actors[position]],
+                        Location(self.rows[position],
+                                 self.columns[position]))
+
+    def activities(self, category: str, identifier: str) -> List[Activity]:
+        """Return the activities of the actor <identifier> in <category>, in
+        the order they were logged.
+
+        >>> log = ActivityLog()
+        >>> log.append(0, RIDER, REQUEST, "Almond", Location(1, 1))
+        -1
+        >>> log.append(0, RIDER, REQUEST, "Bisque", Location(2, 2))
+        -1
+        >>> log.append(5, RIDER, CANCEL, "Almond", Location(1, 1))
+        0
+        >>> [a.description for a in log.activities(RIDER, "Almond")]
+        ['request', 'cancel']
+        """
+        actor = self._identifiers[category].get(identifier)
+        if actor is None:
+            return []
+        activities = []
+        position = self._last[category][actor]
+        while position >= 0:
+            activities.append(self.activity(position))
+            position = self.previous[position]
+        activities.reverse()
+        return activities
+
+
+class Monitor:
+    """A monitor keeps a record of activities that it is notified about.
+    When required, it generates a report of the activities it has recorded.
+
+    A monitor with history keeps every activity in an ActivityLog. Its
+    report is computed with numpy over the columns of the log when numpy is
+    installed and distances are Manhattan distances, and by replaying the
+    log otherwise.
+
+    A monitor without history keeps running totals instead of the
+    activities themselves. It only remembers the request time of each rider
+    who is still waiting and each driver's last activity, so its memory
+    does not grow with the number of activities. It gives the same report
+    as long as every rider's first activity is their only REQUEST, as it is
+    in a simulation.
+
+    Either way, the monitor counts every rider's wait time, every driver's
+    pickup travel time (from when they were dispatched to their PICKUP) and
+    every ride duration (from a PICKUP to the DROPOFF that follows it) in
+    Histograms, whose size does not grow with the number of riders. Times
+    that would be negative, for activities notified out of order, are
+    counted as 0.
+
+    The monitor also counts rider activities in windows of time, which are
+    closed and reopened with close_window().
+    """
+
+    # === Private Attributes ===
+    _log: Optional[ActivityLog]
+    #       Every activity, or None if this monitor keeps no history.
+    _riders: Dict[str, int]
+    #       Without history: the time of the REQUEST of every rider whose
+    #       wait time has not yet been counted.
+    _rider_count: int
+    #       Without history: the number of riders who have made a REQUEST.
+    _drivers: Dict[str, list]
+    #       Without history: the location of every driver's last activity,
+    #       of their last PICKUP or DROPOFF that has not yet been paired
+    #       with the next one (or None), and the time and description of
+    #       their last activity.
+    _wait_time: int
+    #       Without history: the total wait time of the riders counted.
+    _waits: int
+    #       Without history: the number of riders whose wait is counted.
+    _total_distance: int
+    #       Without history: the total distance between the consecutive
+    #       activities of every driver.
+    _ride_distance: int
+    #       Without history: the total distance between every driver's
+    #       paired PICKUP and DROPOFF activities.
+    _wait_times: Histogram
+    #       The wait time of every rider whose wait is counted.
+    _pickup_times: Histogram
+    #       The time between every driver PICKUP and the time the driver was
+    #       dispatched, for every PICKUP notified with that time.
+    _ride_times: Histogram
+    #       The time between every driver DROPOFF and the PICKUP before it.
+    _window: Dict[str, int]
+    #       The number of rider activities of each description since the
+    #       current window was opened.
+
+    def __init__(self, history: bool = True) -> None:
+        """Initialize a Monitor, which keeps every activity if <history> is
+        True and only running totals otherwise.
+
+        >>> monitor = Monitor(history=False)
+        >>> monitor.notify(0, RIDER, REQUEST, "Almond", Location(1, 1))
+        >>> monitor.notify(4, RIDER, PICKUP, "Almond", Location(1, 1))
+        >>> monitor.notify(0, DRIVER, REQUEST, "Amaranth", Location(0, 0))
+        >>> monitor.notify(4, DRIVER, PICKUP, "Amaranth", Location(1, 1))
+        >>> monitor.notify(7, DRIVER, DROPOFF, "Amaranth", Location(2, 2))
+        >>> monitor.report()
+        {'rider_wait_time': 4.0, 'driver_total_distance': 4.0, \
+'driver_ride_distance': 2.0}
+        """
+        self._log = ActivityLog() if history else None
+        self._riders = {}
+        self._rider_count = 0
+        self._drivers = {}
+        self._wait_time = 0
+        self._waits = 0
+        self._total_distance = 0
+        self._ride_distance = 0
+        self._wait_times = Histogram()
+        self._pickup_times = Histogram()
+        self._ride_times = Histogram()
+        self._window = {}
 
     def __str__(self) -> str:
         """Return a string representation.
 
         """
+        if self._log is None:
+            return "Monitor ({} drivers, {} riders)".format(
+                len(self._drivers), self._rider_count)
         return "Monitor ({} drivers, {} riders)".format(
-            len(self._activities[DRIVER]), len(self._activities[RIDER]))
+            self._log.count(DRIVER), self._log.count(RIDER))
 
     def notify(self, timestamp: int, category: str, description: str,
-               identifier: str, location: Location) -> None:
+               identifier: str, location: Location,
+               dispatched: Optional[int] = None) -> None:
         """Notify the monitor of the activity.
 
         timestamp: The time of the activity.
@@ -92,92 +328,254 @@ class Monitor:
             of the activity.
         identifier: The identifier for the actor.
         location: The location of the activity.
+        dispatched: For a driver PICKUP, the time the driver started
+            driving to the rider, or None if it is not known.
+        """
+        if category == RIDER:
+            self._window[description] = self._window.get(description, 0) + 1
+        elif dispatched is not None and description == PICKUP:
+            self._pickup_times.record(max(0, timestamp - dispatched))
+        log = self._log
+        if log is None:
+            self._count(timestamp, category, description, identifier,
+                        location)
+            return
+        previous = log.append(timestamp, category, description, identifier,
+                              location)
+        if previous < 0:
+            return
+        if category == RIDER:
+            if log.previous[previous] < 0:
+                self._wait_times.record(
+                    max(0, timestamp - log.times[previous]))
+        elif description == DROPOFF and \
+                log.descriptions[previous] == log.code(PICKUP):
+            self._ride_times.record(max(0, timestamp - log.times[previous]))
+
+    def close_window(self) -> Dict[str, int]:
+        """Return the number of rider requests, pickups and cancellations
+        since the last window was closed, keyed by 'requests', 'pickups' and
+        'cancellations', and open a new window.
+
+        >>> monitor = Monitor(history=False)
+        >>> monitor.notify(0, RIDER, REQUEST, "Almond", Location(1, 1))
+        >>> monitor.notify(1, RIDER, REQUEST, "Bisque", Location(2, 2))
+        >>> monitor.close_window()
+        {'requests': 2, 'pickups': 0, 'cancellations': 0}
+        >>> monitor.notify(5, RIDER, CANCEL, "Almond", Location(1, 1))
+        >>> monitor.close_window()
+        {'requests': 0, 'pickups': 0, 'cancellations': 1}
         """
-        if identifier not in self._activities[category]:
-            self._activities[category][identifier] = []
+        window = self._window
+        self._window = {}
+        return {"requests": window.get(REQUEST, 0),
+                "pickups": window.get(PICKUP, 0),
+                "cancellations": window.get(CANCEL, 0)}
 
-        activity = Activity(timestamp, description, identifier, location)
-        self._activities[category][identifier].append(activity)
+    def activities(self, category: str, identifier: str) -> List[Activity]:
+        """Return the activities of the actor <identifier> in <category>, in
+        the order they happened.
 
-    def report(self) -> Dict[str, float]:
+        Precondition: this monitor keeps history.
+        """
+        return self._log.activities(category, identifier)
+
+    def _count(self, timestamp: int, category: str, description: str,
+               identifier: str, location: Location) -> None:
+        """Add the activity to the running totals, exactly as the report of
+        a monitor with history would count it.
+
+        """
+        if category == RIDER:
+            # Only the first two activities of a rider count: the wait is
+            # the time between them. The rider is forgotten once it has been
+            # counted, so only a REQUEST can be a rider's first activity;
+            # their later activities are not taken for a new rider's.
+            requested = self._riders.pop(identifier, None)
+            if requested is not None:
+                self._wait_time += timestamp - requested
+                self._waits += 1
+                self._wait_times.record(max(0, timestamp - requested))
+            elif description == REQUEST:
+                self._riders[identifier] = timestamp
+                self._rider_count += 1
+            return
+
+        state = self._drivers.get(identifier)
+        if state is None:
+            state = self._drivers[identifier] = [location, None, timestamp,
+                                                 description]
+        else:
+            self._total_distance += distance(state[0], location)
+            if description == DROPOFF and state[3] == PICKUP:
+                self._ride_times.record(max(0, timestamp - state[2]))
+            state[0] = location
+            state[2] = timestamp
+            state[3] = description
+        if description == PICKUP or description == DROPOFF:
+            # PICKUP and DROPOFF activities are paired in order, whatever
+            # their descriptions.
+            if state[1] is None:
+                state[1] = location
+            else:
+                self._ride_distance += distance(state[1], location)
+                state[1] = None
+
+    def histograms(self) -> Dict[str, Histogram]:
+        """Return the histograms of rider wait times, pickup travel times
+        and ride durations, keyed by 'rider_wait_time', 'pickup_travel_time'
+        and 'ride_duration'.
+
+        The histograms of monitors from separate runs can be merged.
+        """
+        return {"rider_wait_time": self._wait_times,
+                "pickup_travel_time": self._pickup_times,
+                "ride_duration": self._ride_times}
+
+    def report(self, detailed: bool = False) -> Dict[str, float]:
         """Return a report of the activities that have occurred.
 
+        If <detailed> is True, the report also has the 50th, 90th and 99th
+        percentiles and the largest of the rider wait times, pickup travel
+        times and ride durations, keyed like 'rider_wait_time_p90'.
+
+        >>> monitor = Monitor()
+        >>> monitor.notify(0, RIDER, REQUEST, "Almond", Location(1, 1))
+        >>> monitor.notify(4, RIDER, PICKUP, "Almond", Location(1, 1))
+        >>> monitor.notify(0, DRIVER, REQUEST, "Amaranth", Location(0, 0))
+        >>> monitor.notify(4, DRIVER, PICKUP, "Amaranth", Location(1, 1))
+        >>> monitor.notify(7, DRIVER, DROPOFF, "Amaranth", Location(2, 2))
+        >>> report = monitor.report(detailed=True)
+        >>> report['rider_wait_time_p50'], report['ride_duration_max']
+        (4, 3)
+        """
+        if self._log is None:
+            report = {"rider_wait_time": self._wait_time / self._waits,
+                      "driver_total_distance":
+                          self._total_distance / len(self._drivers),
+                      "driver_ride_distance":
+                          self._ride_distance / len(self._drivers)}
+        elif np is None or installed() is not None:
+            report = self._replay().report()
+        else:
+            report = {"rider_wait_time": self._average_wait_time(),
+                      "driver_total_distance":
+                          self._average_total_distance(),
+                      "driver_ride_distance": self._average_ride_distance()}
+        if detailed:
+            for name, histogram in self.histograms().items():
+                for key, value in histogram.summary().items():
+                    report[f"{name}_{key}"] = value
+        return report
+
+    def _replay(self) -> 'Monitor':
+        """Return a monitor without history that has been notified of every
+        activity in the log, in order.
+
         """
-        return {"rider_wait_time": self._average_wait_time(),
-                "driver_total_distance": self._average_total_distance(),
-                "driver_ride_distance": self._average_ride_distance()}
+        monitor = Monitor(history=False)
+        for position in range(len(self._log)):
+            activity = self._log.activity(position)
+            monitor.notify(activity.time,
+                           _CATEGORIES[self._log.categories[position]],
+                           activity.description, activity.id,
+                           activity.location)
+        return monitor
 
     def _average_wait_time(self) -> float:
         """Return the average wait time of riders that have either been picked
         up or have cancelled their ride.
 
+        The wait time of a rider is the time between their first two
+        activities: REQUEST, and then PICKUP or CANCEL.
+
+        Precondition: numpy is installed and this monitor keeps history.
         """
-        wait_time = 0
-        count = 0
-        for activities in self._activities[RIDER].values():
-            # A rider that has less than two activities hasn't finished
-            # waiting (they haven't cancelled or been picked up).
-            if len(activities) >= 2:
-                # The first activity is REQUEST, and the second is PICKUP
-                # or CANCEL. The wait time is the difference between the two.
-                wait_time += activities[1].time - activities[0].time
-                count += 1
-        return wait_time / count
+        log = self._log
+        times = np.frombuffer(log.times, dtype=np.int64)
+        previous = np.frombuffer(log.previous, dtype=np.int64)
+        # A rider's second activity follows one with no activity before it.
+        later = np.flatnonzero(
+            (np.frombuffer(log.categories, dtype=np.uint8) ==
+             _CATEGORIES.index(RIDER)) & (previous >= 0))
+        firsts = previous[later]
+        is_second = previous[firsts] < 0
+        seconds, firsts = later[is_second], firsts[is_second]
+        wait_time = int((times[seconds] - times[firsts]).sum())
+        return wait_time / len(seconds)
 
     def _average_total_distance(self) -> float:
         """Return the average distance drivers have driven.
 
-        """
-        num_drivers = 0
-        tot_dist = 0
-        location_list = []
-        for driver in self._activities[DRIVER]:
-            # adding to number of driver
-            num_drivers += 1
-
-            for activities in self._activities[DRIVER][driver]:
-                # add all the locations to a list
-                location_list.append(activities.location)
+        The distance a driver has driven is the total distance between the
+        locations of each of their activities and the next.
 
-            while len(location_list) > 1:
-                # take the first two locations and add them
-                # together and get new sum add man sum to tot_dist,
-                # pop the first location then continue
-                new_loc = manhattan_distance(location_list.pop(0),
-                                             location_list[0])
-                tot_dist += new_loc
-
-            location_list = []
-
-        return tot_dist / num_drivers
+        Precondition: numpy is installed, this monitor keeps history, and
+        no travel service is installed.
+        """
+        log = self._log
+        previous = np.frombuffer(log.previous, dtype=np.int64)
+        later = np.flatnonzero(
+            (np.frombuffer(log.categories, dtype=np.uint8) ==
+             _CATEGORIES.index(DRIVER)) & (previous >= 0))
+        total = self._distances(later, previous[later])
+        return total / log.count(DRIVER)
 
     def _average_ride_distance(self) -> float:
         """Return the average distance drivers have driven on rides.
 
+        Each driver's PICKUP and DROPOFF activities are taken in order and
+        paired up, first with second, third with fourth, and so on; the
+        ride distance is the total distance within each pair.
+
+        Precondition: numpy is installed, this monitor keeps history, and
+        no travel service is installed.
+        """
+        log = self._log
+        descriptions = np.frombuffer(log.descriptions, dtype=np.uint8)
+        is_ride = np.zeros(len(log), dtype=bool)
+        for description in (PICKUP, DROPOFF):
+            if log.code(description) is not None:
+                is_ride |= descriptions == log.code(description)
+        rides = np.flatnonzero(
+            is_ride & (np.frombuffer(log.categories, dtype=np.uint8) ==
+                       _CATEGORIES.index(DRIVER)))
+        actors = np.frombuffer(log.actors, dtype=np.uint32)[rides]
+        if log.count(DRIVER) <= 1 << 16:
+            # A stable sort of 16-bit keys is a radix sort.
+            actors = actors.astype(np.uint16)
+        rides = rides[np.argsort(actors, kind="stable")]
+        actors = np.sort(actors, kind="stable")
+        # The rank of each activity among its driver's rides, counted from
+        # the position where the driver's rides start.
+        starts = np.zeros(len(rides), dtype=np.int64)
+        changes = np.flatnonzero(actors[1:] != actors[:-1]) + 1
+        starts[changes] = changes
+        ends = np.flatnonzero(
+            (np.arange(len(rides)) - np.maximum.accumulate(starts)) % 2 == 1)
+        rows = np.frombuffer(log.rows, dtype=np.int32)[rides]
+        columns = np.frombuffer(log.columns, dtype=np.int32)[rides]
+        total = int(np.abs(rows[ends] - rows[ends - 1]).sum(dtype=np.int64) +
+                    np.abs(columns[ends] - columns[ends - 1]).sum(
+                        dtype=np.int64))
+        return total / log.count(DRIVER)
+
+    def _distances(self, first: 'np.ndarray', second: 'np.ndarray') -> int:
+        """Return the total Manhattan distance between the locations of the
+        activities at positions <first> and <second> in the log, pairwise.
+
         """
-        num_drivers = 0
-        tot_dist = 0
-        location_list = []
-        for driver in self._activities[DRIVER]:
-            # adding to number of driver
-            num_drivers += 1
-            for activities in self._activities[DRIVER][driver]:
-                if activities.description == PICKUP or \
-                        activities.description == DROPOFF:
-                    # add all the locations to a list
-                    location_list.append(activities.location)
-                    if len(location_list) > 1:
-                        location1 = location_list.pop(0)
-                        location2 = location_list.pop(0)
-                        new_loc = manhattan_distance(location1, location2)
-                        tot_dist += new_loc
-            location_list = []
-        return tot_dist / num_drivers
+        rows = np.frombuffer(self._log.rows, dtype=np.int32)
+        columns = np.frombuffer(self._log.columns, dtype=np.int32)
+        return int(np.abs(rows[first] - rows[second]).sum(dtype=np.int64) +
+                   np.abs(columns[first] - columns[second]).sum(
+                       dtype=np.int64))
 
 
 if __name__ == "__main__":
     import python_ta
     python_ta.check_all(
         config={
-            'max-args': 6,
-            'extra-imports': ['typing', 'location']})
+            'max-args': 7,
+            'extra-imports': ['array', 'typing', 'histogram', 'location',
+                              'travel', 'numpy']})
@@ -8,8 +8,13 @@ CANCELLED: A constant used for the cancelled rider status.
 SATISFIED: A constant used for the satisfied rider status
 """
 
+from __future__ import annotations
+from typing import Optional, TYPE_CHECKING
 from location import Location
 
+if TYPE_CHECKING:
+    from event import Cancellation
+
 WAITING = "waiting"
 CANCELLED = "cancelled"
 SATISFIED = "satisfied"
@@ -27,6 +32,8 @@ class Rider:
     destination: Desired location of the rider
     status: Current status of the rider: "waiting", "cancelled",
         or "satisfied"
+    cancellation: The Cancellation event scheduled for when the rider runs
+        out of patience, or None if there is none pending.
 
     """
     # Attribute Types
@@ -35,6 +42,7 @@ class Rider:
     origin: Location
     destination: Location
     status: str
+    cancellation: Optional[Cancellation]
 
     def __init__(self, identifier: str, patience: int, origin: Location,
                  destination: Location) -> None:
@@ -46,8 +54,10 @@ class Rider:
         self.origin = origin
         self.destination = destination
         self.status = WAITING
+        self.cancellation = None
 
 
 if __name__ == '__main__':
     import python_ta
-    python_ta.check_all(config={'extra-imports': ['location']})
+    python_ta.check_all(
+        config={'extra-imports': ['typing', 'location', 'event']})
@@ -0,0 +1,554 @@
+"""Road networks for the simulation
+
+A road network is a grid of intersections, one at every location, with a
+street segment of length 1 between each pair of neighbouring
+intersections. Segments can be blocked, or made one-way.
+
+A DistanceOracle answers shortest-path distance queries on a network. It
+keeps shortest-path trees for the locations that are queried most, answers
+runs of queries from or to one location with a single breadth-first
+search, and answers other queries with an A* search guided by landmark
+bounds.
+
+=== File format ===
+Lines that are blank or start with '#' are skipped. The first other line
+gives the number of rows and columns of the grid, and every line after it
+changes one segment:
+
+    <rows> <columns>
+    block <row>,<col> <row>,<col>
+    oneway <row>,<col> <row>,<col>
+
+A 'block' line closes the segment between two neighbouring intersections
+in both directions. A 'oneway' line only allows travel on it from the first
+intersection to the second.
+
+NumPy is used to compute shortest-path trees when it is installed; without
+it, the same trees are computed in plain Python, more slowly.
+"""
+
+from array import array
+from collections import OrderedDict
+from heapq import heappush, heappop
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, \
+    Tuple
+from location import Location, deserialize_location
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+# The (row, column) change of each direction of travel.
+_DIRECTIONS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+
+
+class RoadNetwork:
+    """A grid of intersections connected by street segments of length 1.
+
+    === Attributes ===
+    rows: The number of rows of intersections.
+    columns: The number of columns of intersections.
+    """
+    # Attribute Types
+    rows: int
+    columns: int
+
+    # === Private Attributes ===
+    _moves: List[bytearray]
+    #     _moves[k][n] is 1 iff a car at intersection n can travel in
+    #     direction _DIRECTIONS[k], and 0 otherwise.
+    _offsets: List[int]
+    #     The change in intersection number for each direction.
+    #
+    # === Representation Invariants ===
+    # - Intersection (row, column) is numbered row * columns + column.
+    # - No move leaves the grid.
+
+    def __init__(self, rows: int, columns: int) -> None:
+        """Initialize a RoadNetwork with every segment open both ways.
+
+        Precondition: rows > 0 and columns > 0
+        """
+        self.rows = rows
+        self.columns = columns
+        self._offsets = [d_row * columns + d_col
+                         for d_row, d_col in _DIRECTIONS]
+        size = rows * columns
+        self._moves = [bytearray(b'\x01') * size for _ in _DIRECTIONS]
+        for column in range(columns):
+            self._moves[0][(rows - 1) * columns + column] = 0
+            self._moves[1][column] = 0
+        for row in range(rows):
+            self._moves[2][row * columns + columns - 1] = 0
+            self._moves[3][row * columns] = 0
+
+    def __len__(self) -> int:
+        """Return the number of intersections in this network.
+
+        >>> len(RoadNetwork(3, 4))
+        12
+        """
+        return self.rows * self.columns
+
+    def node(self, location: Location) -> int:
+        """Return the number of the intersection at <location>.
+
+        Precondition: <location> is in the grid.
+
+        >>> RoadNetwork(3, 4).node(Location(2, 1))
+        9
+        """
+        return location.row * self.columns + location.column
+
+    def block(self, start: Location, end: Location) -> None:
+        """Close the segment between <start> and <end> in both directions.
+
+        Precondition: <start> and <end> are neighbouring intersections.
+
+        >>> network = RoadNetwork(1, 3)
+        >>> network.block(Location(0, 1), Location(0, 2))
+        >>> network.successors(1)
+        [0]
+        """
+        direction = self._direction(start, end)
+        self._moves[direction][self.node(start)] = 0
+        self._moves[direction ^ 1][self.node(end)] = 0
+
+    def one_way(self, start: Location, end: Location) -> None:
+        """Only allow travel on the segment between <start> and <end> from
+        <start> to <end>.
+
+        Precondition: <start> and <end> are neighbouring intersections.
+
+        >>> network = RoadNetwork(1, 3)
+        >>> network.one_way(Location(0, 1), Location(0, 2))
+        >>> network.successors(1), network.successors(2)
+        ([2, 0], [])
+        """
+        direction = self._direction(start, end)
+        self._moves[direction ^ 1][self.node(end)] = 0
+
+    def successors(self, node: int) -> List[int]:
+        """Return the intersections a car at intersection <node> can travel
+        to along one segment.
+
+        >>> RoadNetwork(2, 2).successors(0)
+        [2, 1]
+        """
+        return [node + offset
+                for moves, offset in zip(self._moves, self._offsets)
+                if moves[node]]
+
+    def predecessors(self, node: int) -> List[int]:
+        """Return the intersections from which a car can travel to
+        intersection <node> along one segment.
+
+        >>> network = RoadNetwork(1, 2)
+        >>> network.one_way(Location(0, 0), Location(0, 1))
+        >>> network.predecessors(0), network.predecessors(1)
+        ([], [0])
+        """
+        return [node - offset
+                for moves, offset in zip(self._moves, self._offsets)
+                if 0 <= node - offset < len(moves) and moves[node - offset]]
+
+    def shortest_paths(self, node: int, reverse: bool = False) -> array:
+        """Return the distance from intersection <node> to every
+        intersection, or to <node> from every intersection if <reverse>,
+        with -1 for intersections that cannot be reached.
+
+        >>> network = RoadNetwork(2, 3)
+        >>> network.block(Location(0, 0), Location(0, 1))
+        >>> list(network.shortest_paths(0))
+        [0, 3, 4, 1, 2, 3]
+        >>> network.one_way(Location(0, 0), Location(1, 0))
+        >>> list(network.shortest_paths(0, reverse=True))
+        [0, -1, -1, -1, -1, -1]
+        """
+        distances = None
+        for distances in self.levels(node, reverse):
+            pass
+        if np is None:
+            return distances
+        result = array('i')
+        result.frombytes(distances.tobytes())
+        return result
+
+    def levels(self, node: int, reverse: bool = False) \
+            -> Iterator[Sequence[int]]:
+        """Compute the distances of shortest_paths one breadth-first level
+        at a time, and yield them after each level, starting from level 0.
+
+        The same distances are yielded every time, updated in place, with
+        -1 for intersections not reached yet, so a caller can stop as soon
+        as the intersections it needs have been reached. They are a NumPy
+        array, computed a whole level at a time, if NumPy is installed.
+
+        >>> network = RoadNetwork(1, 3)
+        >>> [[int(d) for d in distances] for distances in network.levels(0)]
+        [[0, -1, -1], [0, 1, -1], [0, 1, 2]]
+        """
+        size = len(self)
+        level = 0
+        if np is None:
+            distances = array('i', [-1]) * size
+            distances[node] = 0
+            neighbours = self.predecessors if reverse else self.successors
+            frontier = [node]
+            yield distances
+            while True:
+                level += 1
+                reached = []
+                for current in frontier:
+                    for neighbour in neighbours(current):
+                        if distances[neighbour] < 0:
+                            distances[neighbour] = level
+                            reached.append(neighbour)
+                if not reached:
+                    return
+                frontier = reached
+                yield distances
+        distances = np.full(size, -1, dtype=np.int32)
+        distances[node] = 0
+        moves = [np.frombuffer(direction, dtype=bool)
+                 for direction in self._moves]
+        frontier = np.array([node], dtype=np.int64)
+        yield distances
+        while True:
+            level += 1
+            reached = []
+            for direction, offset in zip(moves, self._offsets):
+                if reverse:
+                    found = frontier - offset
+                    found = found[(found >= 0) & (found < size)]
+                    found = found[direction[found]]
+                else:
+                    found = frontier[direction[frontier]] + offset
+                found = found[distances[found] < 0]
+                distances[found] = level
+                reached.append(found)
+            frontier = np.concatenate(reached)
+            if not frontier.size:
+                return
+            yield distances
+
+    def _direction(self, start: Location, end: Location) -> int:
+        """Return the direction of travel from <start> to <end>.
+
+        Raise a ValueError if they are not neighbouring intersections.
+
+        >>> RoadNetwork(2, 2)._direction(Location(1, 1), Location(0, 1))
+        1
+        """
+        step = (end.row - start.row, end.column - start.column)
+        if step not in _DIRECTIONS:
+            raise ValueError(f'{start} and {end} are not neighbours')
+        return _DIRECTIONS.index(step)
+
+
+def load_road_network(filename: str) -> RoadNetwork:
+    """Return the road network described in <filename>.
+
+    Precondition: the file stored at <filename> is in the format described
+    in this module's docstring.
+    """
+    network = None
+    with open(filename, "r") as file:
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                # Skip lines that are blank or start with #.
+                continue
+            tokens = line.split()
+            if network is None:
+                network = RoadNetwork(int(tokens[0]), int(tokens[1]))
+                continue
+            start = deserialize_location(tokens[1])
+            end = deserialize_location(tokens[2])
+            if tokens[0] == "block":
+                network.block(start, end)
+            elif tokens[0] == "oneway":
+                network.one_way(start, end)
+    return network
+
+
+class DistanceOracle:
+    """Shortest-path distances between locations on a road network.
+
+    A few landmark intersections, spread far apart, have their distances
+    to and from every intersection computed up front. By the triangle
+    inequality, these give a lower bound on any distance, which guides an
+    A* search.
+
+    A run of consecutive queries from (or to) the same location, such as
+    the travel times from every available driver to one rider, is answered
+    from its <hot>th query on from one breadth-first search from that
+    location. The search is only taken as far as the run needs, a level at
+    a time.
+
+    Each location is counted whenever it is queried, as an origin or as a
+    destination, by a query that starts a run. Once a location has been
+    counted <hot> times, its whole shortest-path tree is computed, after
+    which every query from it (or to it) is a single lookup. Trees are thus
+    only computed for locations that recur across runs, not for every
+    location a fleet is asked about once. Up to <trees> trees are kept, and
+    the least recently used one is dropped to make room for another.
+
+    Distances are never shorter than the Manhattan distance, so an oracle
+    can be used with every dispatch strategy that finds drivers with a
+    DriverGrid.
+
+    === Attributes ===
+    tree_hits: The number of queries answered from a shortest-path tree.
+    run_hits: The number of queries answered from the search of a run.
+    searches: The number of queries answered with an A* search.
+    trees_built: The number of shortest-path trees computed.
+    """
+    # Attribute Types
+    tree_hits: int
+    run_hits: int
+    searches: int
+    trees_built: int
+
+    # === Private Attributes ===
+    _network: RoadNetwork
+    #     The road network.
+    _from_landmarks: List[array]
+    #     The distance from each landmark to every intersection.
+    _to_landmarks: List[array]
+    #     The distance from every intersection to each landmark.
+    _trees: OrderedDict
+    #     The cached shortest-path trees, least recently used first, keyed
+    #     by (intersection, reverse) as for RoadNetwork.shortest_paths.
+    _capacity: int
+    #     The largest number of trees to keep.
+    _hot: int
+    #     The number of queries that makes a location hot.
+    _counts: Dict[Tuple[int, bool], int]
+    #     The number of queries that started a run from (False) or to
+    #     (True) each intersection that does not have a tree, since the
+    #     counts were last reset.
+    _previous: Dict[Tuple[int, bool], int]
+    #     The number of consecutive queries so far in the runs of the last
+    #     query's origin and destination, keyed by (intersection, reverse).
+    _run: Optional[list]
+    #     The key of the last run that needed a search, the levels of its
+    #     breadth-first search, and the distances found so far, or None.
+
+    def __init__(self, network: RoadNetwork, landmarks: int = 8,
+                 trees: int = 16, hot: int = 4) -> None:
+        """Initialize a DistanceOracle for <network>.
+
+        Raise a ValueError if some intersection cannot be reached from
+        another one.
+
+        Precondition: landmarks > 0, trees >= 0 and hot > 0
+
+        >>> network = RoadNetwork(2, 2)
+        >>> network.one_way(Location(0, 0), Location(0, 1))
+        >>> network.block(Location(0, 0), Location(1, 0))
+        >>> DistanceOracle(network)
+        Traceback (most recent call last):
+        ValueError: the road network is not strongly connected
+        """
+        self._network = network
+        self._from_landmarks = []
+        self._to_landmarks = []
+        self._trees = OrderedDict()
+        self._capacity = trees
+        self._hot = hot
+        self._counts = {}
+        self._previous = {}
+        self._run = None
+        self.tree_hits = 0
+        self.run_hits = 0
+        self.searches = 0
+        self.trees_built = 0
+        # Pick each landmark as far as possible from the ones before it.
+        closest = None
+        landmark = 0
+        for _ in range(min(landmarks, len(network))):
+            from_landmark = network.shortest_paths(landmark)
+            to_landmark = network.shortest_paths(landmark, reverse=True)
+            if min(from_landmark) < 0 or min(to_landmark) < 0:
+                raise ValueError('the road network is not strongly connected')
+            self._from_landmarks.append(from_landmark)
+            self._to_landmarks.append(to_landmark)
+            if np is not None:
+                distances = np.frombuffer(from_landmark, dtype=np.int32)
+                closest = distances.copy() if closest is None else \
+                    np.minimum(closest, distances)
+                landmark = int(np.argmax(closest))
+            else:
+                closest = from_landmark if closest is None else \
+                    array('i', map(min, closest, from_landmark))
+                landmark = closest.index(max(closest))
+
+    def distance(self, origin: Location, destination: Location) -> int:
+        """Return the length of the shortest route from <origin> to
+        <destination>.
+
+        >>> network = RoadNetwork(3, 3)
+        >>> network.block(Location(0, 0), Location(0, 1))
+        >>> network.one_way(Location(1, 1), Location(1, 0))
+        >>> oracle = DistanceOracle(network, landmarks=2, hot=2)
+        >>> oracle.distance(Location(0, 0), Location(0, 1))
+        5
+        >>> oracle.distance(Location(2, 2), Location(0, 1))
+        3
+        >>> oracle.searches, oracle.run_hits, oracle.trees_built
+        (1, 1, 0)
+        >>> oracle.distance(Location(0, 0), Location(2, 2))
+        4
+        >>> oracle.distance(Location(0, 0), Location(2, 2))
+        4
+        >>> oracle.searches, oracle.trees_built, oracle.tree_hits
+        (1, 1, 1)
+        """
+        source = self._network.node(origin)
+        target = self._network.node(destination)
+        if source == target:
+            return 0
+        previous = self._previous
+        self._previous = {key: previous.get(key, 0) + 1
+                          for key in [(source, False), (target, True)]}
+        for key, node in [((source, False), target), ((target, True), source)]:
+            tree = self._trees.get(key)
+            if tree is not None:
+                self._trees.move_to_end(key)
+                self.tree_hits += 1
+                return tree[node]
+        for key, node in [((source, False), target), ((target, True), source)]:
+            if self._previous[key] >= self._hot:
+                return self._run_distance(key, node)
+        for key, node in [((source, False), target), ((target, True), source)]:
+            if key in previous:
+                # Only the first query of a run counts towards a tree.
+                continue
+            count = self._counts.get(key, 0) + 1
+            if count >= self._hot and self._capacity > 0:
+                return self._build_tree(key)[node]
+            if len(self._counts) >= 65536:
+                # Forget counts from time to time, so that only locations
+                # that are queried often become hot.
+                self._counts.clear()
+            self._counts[key] = count
+        self.searches += 1
+        return self._search(source, target)
+
+    def lower_bound(self, origin: Location, destination: Location) -> int:
+        """Return a lower bound on the length of the shortest route from
+        <origin> to <destination>, using the landmarks.
+
+        >>> network = RoadNetwork(3, 3)
+        >>> network.block(Location(0, 0), Location(0, 1))
+        >>> oracle = DistanceOracle(network, landmarks=2)
+        >>> oracle.lower_bound(Location(0, 0), Location(0, 1))
+        3
+        """
+        source = self._network.node(origin)
+        return self._bounds(source, self._network.node(destination))(source)
+
+    def _bounds(self, source: int, target: int,
+                active: int = 4) -> Callable[[int], int]:
+        """Return a function that gives a lower bound on the distance from
+        an intersection to <target>.
+
+        Only the <active> landmark bounds that are highest at <source> are
+        used, since a search from <source> stays near it, and checking
+        fewer landmarks makes each bound cheaper.
+        """
+        columns = self._network.columns
+        target_row, target_column = divmod(target, columns)
+        # Each bound is max(0, sign * (distances[node] - shift)), where
+        # d(node, target) >= d(L, target) - d(L, node) for each tree
+        # distances = d(L, .), and d(node, target) >= d(node, L) -
+        # d(target, L) for each tree distances = d(., L).
+        terms = [(from_landmark, -1, from_landmark[target])
+                 for from_landmark in self._from_landmarks]
+        terms += [(to_landmark, 1, to_landmark[target])
+                  for to_landmark in self._to_landmarks]
+        terms.sort(key=lambda term: term[1] * (term[0][source] - term[2]),
+                   reverse=True)
+        terms = terms[:active]
+
+        def bound(node: int) -> int:
+            """Return a lower bound on the distance from <node> to the
+            target.
+            """
+            row, column = divmod(node, columns)
+            best = abs(row - target_row) + abs(column - target_column)
+            for distances, sign, shift in terms:
+                difference = sign * (distances[node] - shift)
+                if difference > best:
+                    best = difference
+            return best
+        return bound
+
+    def _search(self, source: int, target: int) -> int:
+        """Return the distance from <source> to <target>, with an A*
+        search.
+
+        Ties are broken towards the intersection furthest from <source>, so
+        that the search follows one shortest route instead of exploring
+        all of them.
+        """
+        bound = self._bounds(source, target)
+        successors = self._network.successors
+        distances = {source: 0}
+        bounds = {}
+        heap = [(bound(source), 0, source)]
+        while heap:
+            _, negative_distance, node = heappop(heap)
+            distance = -negative_distance
+            if node == target:
+                return distance
+            if distance > distances[node]:
+                continue
+            distance += 1
+            for neighbour in successors(node):
+                if distance < distances.get(neighbour, distance + 1):
+                    distances[neighbour] = distance
+                    estimate = bounds.get(neighbour)
+                    if estimate is None:
+                        estimate = bounds[neighbour] = bound(neighbour)
+                    heappush(heap, (distance + estimate, -distance,
+                                    neighbour))
+        raise ValueError('the road network is not strongly connected')
+
+    def _run_distance(self, key: Tuple[int, bool], node: int) -> int:
+        """Return the distance from (or to) <node> in the breadth-first
+        search of the run of queries for <key>, extending the search only
+        until <node> is reached.
+
+        A new search is started if the last run to need one was not for
+        <key>.
+        """
+        if self._run is None or self._run[0] != key:
+            levels = self._network.levels(*key)
+            self._run = [key, levels, next(levels)]
+        _, levels, distances = self._run
+        while distances[node] < 0:
+            next(levels)
+        self.run_hits += 1
+        return int(distances[node])
+
+    def _build_tree(self, key: Tuple[int, bool]) -> array:
+        """Compute, cache and return the shortest-path tree for <key>.
+
+        """
+        tree = self._network.shortest_paths(*key)
+        self._counts.pop(key, None)
+        if len(self._trees) >= self._capacity:
+            self._trees.popitem(last=False)
+        self._trees[key] = tree
+        self.trees_built += 1
+        return tree
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['array', 'collections', 'heapq', 'typing',
+                          'numpy', 'location']})
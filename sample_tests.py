@@ -1,11 +1,25 @@
 import pytest
-from location import Location, deserialize_location
-from monitor import Monitor
+from operator import attrgetter
+from random import Random
+from location import Location, deserialize_location, manhattan_distance, \
+    manhattan_distances, paired_manhattan_distances
+from monitor import Monitor, RIDER, DRIVER, REQUEST, CANCEL, PICKUP, \
+    DROPOFF
 from dispatcher import Dispatcher
 from simulation import Simulation
-from event import create_event_list, RiderRequest, DriverRequest, Pickup, Dropoff, Cancellation
+from container import CalendarQueue, PriorityQueue
+from event import Event, create_event_list, stream_events, RiderRequest, DriverRequest, Pickup, Dropoff, Cancellation
 from driver import Driver
+from fleet import DriverFleet
+from grid import DriverGrid, RiderGrid
+from histogram import Histogram
+from journal import Journal, JournalFile
+from loader import EventFile, convert_events, read_events
 from rider import Rider
+from roads import DistanceOracle, RoadNetwork, load_road_network
+from shard import RegionGrid, ShardedStrategy
+from strategy import LinearStrategy
+from travel import TravelTimes, install
 
 def test_location_print() -> None:
     """ Tests for the currect implementation of the creating and print of the Location
@@ -84,5 +98,700 @@ def test_special_events() -> None:
     assert result == []
     assert rider.status == 'cancelled'
 
+def test_priority_queue_fifo_ties() -> None:
+    """Test that events with equal timestamps leave the queue in FIFO order"""
+    events = [Event(3), Event(1), Event(3), Event(0), Event(1), Event(3)]
+    for pq in [PriorityQueue(), PriorityQueue(attrgetter('timestamp'))]:
+        pq.add_many(events[:2])
+        for event in events[2:]:
+            pq.add(event)
+        removed = []
+        while not pq.is_empty():
+            removed.append(pq.remove())
+        assert [id(event) for event in removed] == \
+            [id(events[i]) for i in [3, 1, 4, 0, 2, 5]]
+
+def test_events_have_no_dict() -> None:
+    """Test that every kind of event keeps its attributes in slots"""
+    rider = Rider("Almond", 5, Location(0, 0), Location(1, 1))
+    driver = Driver("Amaranth", Location(1, 1), 1)
+    for event in [RiderRequest(1, rider), DriverRequest(1, driver),
+                  Cancellation(1, rider), Pickup(1, rider, driver),
+                  Dropoff(1, rider, driver)]:
+        assert not hasattr(event, '__dict__')
+
+def test_calendar_queue_matches_priority_queue() -> None:
+    """Test that a CalendarQueue removes events in PriorityQueue order"""
+    rng = Random(148)
+    cq, pq = CalendarQueue(8), PriorityQueue()
+    removed = {cq: [], pq: []}
+    for _ in range(2000):
+        if rng.random() < 0.6:
+            event = Event(rng.randrange(100))
+            cq.add(event)
+            pq.add(event)
+        elif not pq.is_empty():
+            for queue in removed:
+                removed[queue].append(id(queue.remove()))
+    while not pq.is_empty():
+        for queue in removed:
+            removed[queue].append(id(queue.remove()))
+    assert cq.is_empty()
+    assert removed[cq] == removed[pq]
+
+def test_simulation_run_calendar_queue() -> None:
+    """Test that both event queues give the same report"""
+    events = create_event_list("events.txt")
+    expected = Simulation().run(events)
+    events = create_event_list("events.txt")
+    assert Simulation(CalendarQueue()).run(events) == expected
+
+def test_pickup_withdraws_cancellation() -> None:
+    """Test that a rider who is picked up never gets a Cancellation"""
+    events = create_event_list("events.txt")
+    monitor = Monitor()
+    Simulation(monitor=monitor).run(events)
+    for event in events:
+        if isinstance(event, RiderRequest) and \
+                event.rider.status == 'satisfied':
+            activities = monitor.activities('rider', event.rider.id)
+            assert [a.description for a in activities] == ['request', 'pickup']
+            assert event.rider.cancellation is None
+
+@pytest.mark.parametrize('make_index, riders', [
+    (lambda: DriverGrid(cell_size=3), False),
+    (DriverFleet, False),
+    (lambda: RegionGrid(region_size=7), False),
+    (lambda: RiderGrid(cell_size=3), True)])
+def test_index_matches_linear_scan(make_index, riders: bool) -> None:
+    """Test that a spatial index finds the same driver, or rider if
+    <riders>, as a scan of everyone in it, ties included, as they come and
+    go and move while they are out of the index"""
+    rng = Random(148)
+    index = make_index()
+    present, absent = [], []
+    for i in range(300):
+        choice = rng.random()
+        if present and choice < 0.3:
+            actor = present.pop(rng.randrange(len(present)))
+            index.remove(actor)
+            location = Location(rng.randrange(40), rng.randrange(40))
+            if riders:
+                actor.origin = location
+            else:
+                actor.location = location
+            absent.append(actor)
+        elif absent and choice < 0.45:
+            actor = absent.pop(rng.randrange(len(absent)))
+            present.append(actor)
+            index.add(actor)
+        else:
+            location = Location(rng.randrange(40), rng.randrange(40))
+            if riders:
+                actor = Rider(str(i), 5, location, Location(0, 0))
+            else:
+                actor = Driver(str(i), location, rng.randint(1, 4))
+            present.append(actor)
+            index.add(actor)
+        target = Location(rng.randrange(-5, 45), rng.randrange(-5, 45))
+        if riders:
+            driver = Driver('Amaranth', target, rng.randint(1, 4))
+            expected = min(present,
+                           key=lambda r: driver.get_travel_time(r.origin),
+                           default=None)
+            assert index.nearest(driver) is expected
+        else:
+            expected = min(present, key=lambda d: d.get_travel_time(target),
+                           default=None)
+            assert index.nearest(target) is expected
+
+def test_driver_in_two_fleets() -> None:
+    """Test that a fleet finds a driver where they are, even if they moved
+    while they were a view onto another fleet"""
+    first, second = DriverFleet(), DriverFleet()
+    driver = Driver('Amaranth', Location(0, 0), 1)
+    other = Driver('Bergamot', Location(5, 5), 1)
+    first.add(driver)
+    first.add(other)
+    first.remove(driver)
+    second.add(driver)
+    second.remove(driver)
+    driver.location = Location(9, 9)
+    first.add(driver)
+    assert first.nearest(Location(9, 9)) is driver
+    driver.location = Location(0, 0)
+    assert first.nearest(Location(1, 1)) is driver
+
+def test_simulation_run_driver_indexes() -> None:
+    """Test that the dispatcher reports the same with every driver index,
+    and rejects anything else"""
+    expected = Simulation().run(create_event_list("events.txt"))
+    for index in ['linear', 'grid', 'fleet']:
+        sim = Simulation(dispatcher=Dispatcher(index))
+        assert sim.run(create_event_list("events.txt")) == expected
+    for strategy in ['lineer', None, LinearStrategy]:
+        with pytest.raises(ValueError):
+            Dispatcher(strategy)
+
+def test_waiting_list_fifo_after_cancel() -> None:
+    """Test that cancelled riders leave the waiting list in FIFO order"""
+    dispatcher = Dispatcher()
+    riders = [Rider(name, 5, Location(1, 1), Location(2, 2))
+              for name in ['Almond', 'Bisque', 'Cerise']]
+    for rider in riders:
+        assert dispatcher.request_driver(rider) is None
+    dispatcher.cancel_ride(riders[0])
+    assert not dispatcher.is_waiting(riders[0])
+    driver = Driver('Amaranth', Location(0, 0), 1)
+    assert dispatcher.request_rider(driver) is riders[1]
+    assert dispatcher.request_rider(driver) is riders[2]
+    assert dispatcher.request_rider(driver) is None
+
+def test_simulation_run_batch() -> None:
+    """Test a batch mode simulation, where every rider is still served"""
+    events = create_event_list("events.txt")
+    dispatcher = Dispatcher(batch_window=2)
+    report = Simulation(dispatcher=dispatcher).run(events)
+    assert len(report) == 3
+    for event in events:
+        if isinstance(event, RiderRequest):
+            assert event.rider.status in ['satisfied', 'cancelled']
+            assert not dispatcher.is_waiting(event.rider)
+
+def test_simulation_run_nearest_rider() -> None:
+    """Test a simulation where drivers are given the nearest rider"""
+    events = create_event_list("events.txt")
+    sim = Simulation(dispatcher=Dispatcher(rider_policy='nearest'))
+    assert len(sim.run(events)) == 3
+    for event in events:
+        if isinstance(event, RiderRequest):
+            assert event.rider.status in ['satisfied', 'cancelled']
+
+def test_region_grid_border() -> None:
+    """Test that a border radius only finds the fastest driver in regions
+    within the border, unless none of them has a driver"""
+    rng = Random(148)
+    for region_size, border in [(1, 0), (4, 3), (7, 12), (9, 40)]:
+        grid = RegionGrid(region_size, border)
+        drivers = []
+        for i in range(200):
+            if drivers and rng.random() < 0.3:
+                grid.remove(drivers.pop(rng.randrange(len(drivers))))
+            else:
+                drivers.append(Driver(str(i), Location(rng.randrange(-20, 60),
+                                                       rng.randrange(60)),
+                                      rng.randint(1, 4)))
+                grid.add(drivers[-1])
+            target = Location(rng.randrange(-30, 70), rng.randrange(-10, 70))
+            near = [driver for driver in drivers if sum(
+                max(0, start - coordinate,
+                    coordinate - start - region_size + 1)
+                for start, coordinate in zip(
+                    [region_size * r for r in grid.region(driver.location)],
+                    [target.row, target.column])) <= border]
+            expected = min(near or drivers,
+                           key=lambda d: d.get_travel_time(target),
+                           default=None)
+            assert grid.nearest(target) is expected
+
+def test_simulation_run_sharded() -> None:
+    """Test that the sharded dispatcher reports the same as the global one"""
+    expected = Simulation().run(create_event_list("events.txt"))
+    sim = Simulation(dispatcher=Dispatcher(ShardedStrategy(region_size=2)))
+    assert sim.run(create_event_list("events.txt")) == expected
+
+def test_sharded_batch_workers() -> None:
+    """Test that matching regions in worker processes changes nothing"""
+    rng = Random(148)
+    drivers = [Driver(str(i), Location(rng.randrange(40), rng.randrange(40)),
+                      rng.randint(1, 4)) for i in range(60)]
+    riders = [Rider(str(i), 5, Location(rng.randrange(40), rng.randrange(40)),
+                    Location(0, 0)) for i in range(80)]
+    results = []
+    for workers in [0, 2]:
+        strategy = ShardedStrategy(region_size=10, workers=workers,
+                                   batch_window=1)
+        dispatcher = Dispatcher(strategy)
+        for driver in drivers:
+            dispatcher.request_rider(driver)
+        for rider in riders:
+            dispatcher.request_driver(rider)
+        results.append([(rider.id, driver.id)
+                        for rider, driver in dispatcher.match_batch()])
+        strategy.close()
+    assert len(results[0]) == 60
+    assert results[0] == results[1]
+
+def test_simulation_run_travel_cache() -> None:
+    """Test that caching travel times does not change the report"""
+    expected = Simulation(dispatcher=Dispatcher('linear')).run(
+        create_event_list("events.txt"))
+    service = TravelTimes(capacity=8)
+    previous = install(service)
+    try:
+        sim = Simulation(dispatcher=Dispatcher('linear'))
+        assert sim.run(create_event_list("events.txt")) == expected
+    finally:
+        install(previous)
+    assert service.hits > 0 and service.evictions > 0
+    assert len(service) == 8
+
+def test_distance_oracle_matches_shortest_paths() -> None:
+    """Test the oracle's distances against breadth-first search"""
+    rng = Random(148)
+    network = RoadNetwork(15, 15)
+    for _ in range(40):
+        row, column = rng.randrange(14), rng.randrange(14)
+        step = Location(row + 1, column) if rng.random() < 0.5 \
+            else Location(row, column + 1)
+        if rng.random() < 0.5:
+            network.one_way(Location(row, column), step)
+        else:
+            network.one_way(step, Location(row, column))
+    network.block(Location(7, 7), Location(7, 8))
+    oracle = DistanceOracle(network, landmarks=3, trees=2, hot=3)
+    for _ in range(500):
+        origin = Location(rng.randrange(5), rng.randrange(15))
+        destination = Location(rng.randrange(15), rng.randrange(15))
+        expected = network.shortest_paths(network.node(origin))[
+            network.node(destination)]
+        assert oracle.distance(origin, destination) == expected
+    assert oracle.searches > 0 and oracle.tree_hits > 0
+    # Every driver asked about one rider is one run, answered by a single
+    # search; a rider location that recurs across runs becomes hot.
+    oracle = DistanceOracle(network, landmarks=3, hot=2)
+    to_rider = network.shortest_paths(network.node(Location(7, 7)),
+                                      reverse=True)
+    for row in [3, 0, 14, 9, 7]:
+        for column in [14, 0, 7]:
+            origin = Location(row, column)
+            assert oracle.distance(origin, Location(7, 7)) == \
+                to_rider[network.node(origin)]
+    assert (oracle.searches, oracle.run_hits, oracle.trees_built) == \
+        (1, 13, 0)
+    oracle.distance(Location(0, 14), Location(3, 3))
+    oracle.distance(Location(14, 14), Location(7, 7))
+    assert oracle.trees_built == 1
+
+def test_simulation_run_road_network(tmp_path) -> None:
+    """Test that an open road network reports Manhattan distances"""
+    expected = Simulation().run(create_event_list("events.txt"))
+    roads_file = tmp_path / "roads.txt"
+    roads_file.write_text("# An open grid\n6 6\n")
+    oracle = DistanceOracle(load_road_network(str(roads_file)))
+    previous = install(TravelTimes(distance=oracle.distance))
+    try:
+        assert Simulation().run(create_event_list("events.txt")) == expected
+    finally:
+        install(previous)
+
+def _road_events(seed: int) -> list:
+    """Return random driver and rider requests on a 15 by 15 grid"""
+    rng = Random(seed)
+    events = []
+    for i in range(120):
+        location = Location(rng.randrange(15), rng.randrange(15))
+        if i % 3 == 0:
+            events.append(DriverRequest(i // 2, Driver(
+                f'driver{i}', location, rng.randint(1, 3))))
+        else:
+            events.append(RiderRequest(i // 2, Rider(
+                f'rider{i}', rng.randint(5, 30), location,
+                Location(rng.randrange(15), rng.randrange(15)))))
+    return events
+
+def test_every_strategy_uses_installed_oracle() -> None:
+    """Test that every strategy makes the same choices with a road network
+    oracle installed, and that the oracle changes those choices"""
+    rng = Random(148)
+    network = RoadNetwork(15, 15)
+    for _ in range(60):
+        row, column = rng.randrange(14), rng.randrange(14)
+        network.block(Location(row, column), Location(row + 1, column))
+    oracle = DistanceOracle(network)
+    greedy = [lambda: Dispatcher('linear'), lambda: Dispatcher('grid'),
+              lambda: Dispatcher('fleet'),
+              lambda: Dispatcher(ShardedStrategy(region_size=4))]
+    batched = [lambda: Dispatcher(batch_window=3),
+               lambda: Dispatcher(ShardedStrategy(region_size=15,
+                                                  batch_window=3))]
+    manhattan = [Simulation(dispatcher=make()).run(_road_events(148))
+                 for make in greedy + batched]
+    previous = install(TravelTimes(distance=oracle.distance))
+    try:
+        reports = [Simulation(dispatcher=make()).run(_road_events(148))
+                   for make in greedy + batched]
+    finally:
+        install(previous)
+    assert all(report == reports[0] for report in reports[:len(greedy)])
+    assert reports[len(greedy)] == reports[len(greedy) + 1]
+    assert reports[0] != manhattan[0]
+    assert reports[len(greedy)] != manhattan[len(greedy)]
+
+def test_manhattan_distances_match_scalar() -> None:
+    """Test that the batch distance functions agree with the scalar one"""
+    rng = Random(148)
+    origins = [Location(rng.randrange(50), rng.randrange(50))
+               for _ in range(100)]
+    destinations = [Location(rng.randrange(50), rng.randrange(50))
+                    for _ in range(100)]
+    expected = [manhattan_distance(origins[0], destination)
+                for destination in destinations]
+    distances = manhattan_distances(origins[0],
+                                    [d.row for d in destinations],
+                                    [d.column for d in destinations])
+    assert [int(d) for d in distances] == expected
+    expected = [manhattan_distance(origin, destination)
+                for origin, destination in zip(origins, destinations)]
+    distances = paired_manhattan_distances(
+        [o.row for o in origins], [o.column for o in origins],
+        [d.row for d in destinations], [d.column for d in destinations])
+    assert [int(d) for d in distances] == expected
+
+def test_simulation_run_unsorted_sequences() -> None:
+    """Test that any sequence of initial events is loaded in bulk, in any
+    order, while an iterator of events out of order is rejected"""
+    expected = Simulation().run(create_event_list("events.txt"))
+    # Latest first, with events at the same time still in file order.
+    events = sorted(create_event_list("events.txt"),
+                    key=lambda event: -event.timestamp)
+    assert Simulation().run(tuple(events)) == expected
+    events = sorted(create_event_list("events.txt"),
+                    key=lambda event: -event.timestamp)
+    with pytest.raises(ValueError, match="not in order"):
+        Simulation().run(iter(events))
+
+def test_simulation_run_streamed(tmp_path) -> None:
+    """Test that streaming a sorted file gives the same report as loading
+    it into a list, with timestamps shared by file and spawned events"""
+    event_file = tmp_path / "events.txt"
+    rng = Random(148)
+    lines = [f'{rng.randrange(20)} DriverRequest D{i} '
+             f'{rng.randrange(10)},{rng.randrange(10)} 1' for i in range(15)]
+    lines += [f'{rng.randrange(200)} RiderRequest R{i} '
+              f'{rng.randrange(10)},{rng.randrange(10)} '
+              f'{rng.randrange(10)},{rng.randrange(10)} {rng.randint(1, 10)}'
+              for i in range(300)]
+    lines.sort(key=lambda line: int(line.split()[0]))
+    event_file.write_text('\n'.join(lines) + '\n')
+    for make_queue in [PriorityQueue, CalendarQueue]:
+        expected = Simulation(make_queue()).run(
+            create_event_list(str(event_file)))
+        assert Simulation(make_queue()).run(
+            stream_events(str(event_file))) == expected
+    assert Simulation().run(stream_events("events.txt")) == \
+        Simulation().run(create_event_list("events.txt"))
+
+def test_stream_events_unsorted(tmp_path) -> None:
+    """Test that streaming rejects a file that is not in timestamp order"""
+    event_file = tmp_path / "events.txt"
+    event_file.write_text("5 DriverRequest Amaranth 1,1 1\n"
+                          "# A comment\n"
+                          "3 DriverRequest Bergamot 2,2 1\n")
+    with pytest.raises(ValueError, match="line 3"):
+        list(stream_events(str(event_file)))
+
+def _describe(event: Event) -> tuple:
+    """Return the fields of an event parsed from a file"""
+    if isinstance(event, DriverRequest):
+        return ('D', event.timestamp, event.driver.id,
+                id(event.driver.location), event.driver.speed)
+    if isinstance(event, RiderRequest):
+        return ('R', event.timestamp, event.rider.id, id(event.rider.origin),
+                id(event.rider.destination), event.rider.patience)
+    return event
+
+def test_read_events_matches_create_event_list(tmp_path) -> None:
+    """Test that the parallel parser gives the same events, including
+    comments, blank lines, line endings and unknown event types"""
+    event_file = tmp_path / "events.txt"
+    rng = Random(148)
+    lines = ["# A comment", "", "   ", "\t# An indented comment"]
+    for i in range(400):
+        row, column = rng.randrange(12), rng.randrange(12)
+        if rng.random() < 0.3:
+            lines.append(f'{i} DriverRequest D{i} {row},0{column} 2')
+        elif rng.random() < 0.95:
+            lines.append(f'  {i}\tRiderRequest R{i} {row},{column} '
+                         f'{column},{row} {rng.randint(1, 9)} extra')
+        else:
+            lines.append(f'{i} Unknown U{i}')
+        lines.append(rng.choice(["", "# note", " "]))
+    event_file.write_bytes("\r\n".join(lines).encode())
+    expected = [_describe(e) for e in create_event_list(str(event_file))]
+    for workers, chunk_size in [(0, 1 << 22), (0, 50), (2, 300)]:
+        events = read_events(str(event_file), workers, chunk_size)
+        assert [_describe(e) for e in events] == expected
+    assert read_events("events.txt") is not None
+
+def test_read_events_raises_like_create_event_list(tmp_path) -> None:
+    """Test that the parallel parser raises on the same malformed line"""
+    event_file = tmp_path / "events.txt"
+    lines = [f'{i} DriverRequest D{i} 1,1 1' for i in range(100)]
+    lines[60] = '60 DriverRequest D60 1;1 1'
+    event_file.write_text("\n".join(lines))
+    with pytest.raises(ValueError) as expected:
+        create_event_list(str(event_file))
+    with pytest.raises(ValueError) as raised:
+        read_events(str(event_file), 2, 100)
+    assert str(raised.value) == str(expected.value)
+
+def test_event_file_matches_create_event_list(tmp_path) -> None:
+    """Test that a converted binary event file gives the same events"""
+    event_file = tmp_path / "events.txt"
+    rng = Random(148)
+    lines = ["# A comment", ""]
+    for i in range(300):
+        row, column = rng.randrange(12), rng.randrange(12)
+        if rng.random() < 0.3:
+            lines.append(f'{i} DriverRequest D{i} {row},0{column} 2')
+        elif rng.random() < 0.95:
+            lines.append(f'{i} RiderRequest R\u00e9{i} {row},{column} '
+                         f'{column},{row} {rng.randint(1, 9)}')
+        else:
+            lines.append(f'{i} Unknown U{i}')
+    event_file.write_text("\n".join(lines), encoding="utf-8")
+    binary_file = str(tmp_path / "events.bin")
+    expected = [_describe(e) for e in create_event_list(str(event_file))
+                if e is not None]
+    assert convert_events(str(event_file), binary_file, 500) == \
+        len(expected)
+    with EventFile(binary_file) as events:
+        assert len(events) == len(expected)
+        assert [_describe(e) for e in events] == expected
+        assert _describe(events[-1]) == expected[-1]
+        assert list(events.timestamps) == [e[1] for e in expected]
+        with pytest.raises(IndexError):
+            events[len(expected)]
+
+def test_event_file_rejects_other_files(tmp_path) -> None:
+    """Test that EventFile rejects text and truncated files"""
+    binary_file = tmp_path / "events.bin"
+    convert_events("events.txt", str(binary_file))
+    with pytest.raises(ValueError):
+        EventFile("events.txt")
+    binary_file.write_bytes(binary_file.read_bytes()[:-16])
+    with pytest.raises(ValueError):
+        EventFile(str(binary_file))
+
+def test_simulation_run_event_file(tmp_path) -> None:
+    """Test that streaming a binary event file gives the same report, and
+    that streaming events out of order is rejected"""
+    binary_file = str(tmp_path / "events.bin")
+    convert_events("events.txt", binary_file)
+    expected = Simulation().run(create_event_list("events.txt"))
+    with EventFile(binary_file) as events:
+        assert Simulation().run(events) == expected
+    events = create_event_list("events.txt")
+    with pytest.raises(ValueError):
+        Simulation().run(reversed(events))
+
+def test_monitor_without_history_matches_report() -> None:
+    """Test that running totals give exactly the report of the activities,
+    including drivers with unusual sequences of activities, and riders with
+    activities after their wait"""
+    rng = Random(148)
+    monitors = [Monitor(), Monitor(history=False)]
+    requested = set()
+    for timestamp in range(3000):
+        category = rng.choice([RIDER, DRIVER])
+        description = rng.choice([REQUEST, CANCEL, PICKUP, DROPOFF])
+        identifier = f'{category}{rng.randrange(200)}'
+        if category == RIDER:
+            description = REQUEST if identifier not in requested else \
+                rng.choice([CANCEL, PICKUP, DROPOFF])
+            requested.add(identifier)
+        location = Location(rng.randrange(30), rng.randrange(30))
+        for monitor in monitors:
+            monitor.notify(timestamp, category, description, identifier,
+                           location)
+    assert monitors[1].report() == monitors[0].report()
+    assert monitors[1].report(detailed=True) == \
+        monitors[0].report(detailed=True)
+    assert str(monitors[1]) == str(monitors[0])
+    # With a travel service installed, the log is replayed instead.
+    previous = install(TravelTimes(distance=lambda origin, destination:
+                                   manhattan_distance(origin, destination)))
+    try:
+        assert monitors[0].report() == monitors[1].report()
+    finally:
+        install(previous)
+    activities = monitors[0].activities(RIDER, f'{RIDER}7')
+    assert [a.time for a in activities] == sorted(a.time for a in activities)
+    assert all(a.id == f'{RIDER}7' for a in activities)
+
+def test_simulation_run_without_history() -> None:
+    """Test that a monitor without history gives the same report"""
+    for make_dispatcher in [Dispatcher, lambda: Dispatcher(batch_window=2)]:
+        expected = Simulation(dispatcher=make_dispatcher()).run(
+            create_event_list("events.txt"))
+        sim = Simulation(dispatcher=make_dispatcher(),
+                         monitor=Monitor(history=False))
+        assert sim.run(create_event_list("events.txt")) == expected
+
+def test_histogram_percentiles_and_merge() -> None:
+    """Test that percentiles are within the precision of a histogram, and
+    that merged histograms count exactly what one histogram would"""
+    rng = Random(148)
+    values = [int(rng.expovariate(1 / 5000)) for _ in range(5000)]
+    whole, first, second = Histogram(), Histogram(), Histogram()
+    for i, value in enumerate(values):
+        whole.record(value)
+        (first if i % 3 else second).record(value)
+    values.sort()
+    for percent in [0, 1, 50, 90, 99, 99.9, 100]:
+        exact = values[max(1, int(-(-len(values) * percent // 100))) - 1]
+        assert exact <= whole.percentile(percent) <= exact * (1 + 2 ** -7)
+    first.merge(second)
+    for percent in range(101):
+        assert first.percentile(percent) == whole.percentile(percent)
+    assert (first.count, first.total, first.max) == \
+        (whole.count, whole.total, whole.max)
+    with pytest.raises(ValueError):
+        first.merge(Histogram(precision=4))
+    with pytest.raises(ValueError):
+        first.record(-1)
+    assert Histogram().summary() == {'p50': 0, 'p90': 0, 'p99': 0, 'max': 0}
+
+def test_simulation_report_detailed() -> None:
+    """Test the percentiles of a detailed report, and that the histograms
+    of separate runs merge into those of both"""
+    expected = Simulation().run(create_event_list("events.txt"))
+    monitor = Monitor()
+    assert Simulation(monitor=monitor).run(
+        create_event_list("events.txt")) == expected
+    detailed = monitor.report(detailed=True)
+    assert {key: detailed[key] for key in expected} == expected
+    # The drives to riders in events.txt take 0, 0, 0, 1, 1 and 2 time
+    # units, however long the drivers were idle before being dispatched.
+    assert [detailed[f'pickup_travel_time_{key}']
+            for key in ['p50', 'p90', 'max']] == [0, 2, 2]
+    assert [detailed[f'rider_wait_time_{key}']
+            for key in ['p50', 'p90', 'max']] == [0, 1, 1]
+    assert [detailed[f'ride_duration_{key}']
+            for key in ['p50', 'p90', 'max']] == [4, 8, 8]
+    batched = Monitor()
+    Simulation(dispatcher=Dispatcher(batch_window=2), monitor=batched).run(
+        create_event_list("events.txt"))
+    assert batched.report(detailed=True)['pickup_travel_time_max'] == 1
+    histograms = monitor.histograms()
+    other = Monitor(history=False)
+    Simulation(monitor=other).run(create_event_list("events.txt"))
+    for name, histogram in other.histograms().items():
+        assert histogram.summary() == histograms[name].summary()
+        histogram.merge(histograms[name])
+        assert histogram.count == 2 * histograms[name].count
+        assert histogram.summary() == histograms[name].summary()
+
+def test_simulation_windows(tmp_path) -> None:
+    """Test that window snapshots cover the run without gaps, and count
+    every event and rider activity once, in the window it happened in"""
+    journal_file = str(tmp_path / "windows.jnl")
+    for make_dispatcher in [Dispatcher, lambda: Dispatcher(batch_window=2)]:
+        expected = Simulation(dispatcher=make_dispatcher()).run(
+            create_event_list("events.txt"))
+        snapshots = []
+        dispatcher = make_dispatcher()
+        with Journal(journal_file) as journal:
+            sim = Simulation(dispatcher=dispatcher, monitor=journal,
+                             window=4, on_window=snapshots.append)
+            assert sim.run(stream_events("events.txt")) == expected
+        assert snapshots[0]['start'] == 0
+        for before, after in zip(snapshots, snapshots[1:]):
+            assert before['end'] == after['start'] == before['start'] + 4
+        with JournalFile(journal_file) as activities:
+            for snapshot in snapshots:
+                window = [activity.description for category, activity
+                          in activities.between(snapshot['start'],
+                                                snapshot['end'])
+                          if category == RIDER]
+                for key, description in [('requests', REQUEST),
+                                         ('pickups', PICKUP),
+                                         ('cancellations', CANCEL)]:
+                    assert snapshot[key] == window.count(description)
+            assert snapshots[-1]['start'] <= activities.activity(-1)[1].time \
+                < snapshots[-1]['end']
+        assert snapshots[-1]['idle_drivers'] == \
+            len(dispatcher.available_drivers)
+        assert snapshots[-1]['waiting_riders'] == \
+            len(dispatcher.waiting_riders)
+    # Each event is counted in one window; windows with nothing happening
+    # in them are still reported.
+    snapshots = []
+    events = create_event_list("events.txt")
+    Simulation(window=1, on_window=snapshots.append).run(events)
+    assert [snapshot['start'] for snapshot in snapshots] == \
+        list(range(snapshots[-1]['end']))
+    assert sum(snapshot['events'] for snapshot in snapshots) > len(events)
+
+def test_journal_matches_monitor(tmp_path) -> None:
+    """Test that a journal file answers queries and gives the report exactly
+    as the monitor that wrote it, including activities out of order"""
+    journal_file = str(tmp_path / "activities.jnl")
+    rng = Random(148)
+    requested = set()
+    with Journal(journal_file, buffer_size=100) as journal:
+        for timestamp in range(3000):
+            category = rng.choice([RIDER, DRIVER])
+            description = rng.choice([REQUEST, CANCEL, PICKUP, DROPOFF])
+            identifier = f'{category}{rng.randrange(200)}'
+            if category == RIDER:
+                description = REQUEST if identifier not in requested else \
+                    rng.choice([CANCEL, PICKUP, DROPOFF])
+                requested.add(identifier)
+            dispatched = timestamp - rng.randrange(5) \
+                if category == DRIVER and description == PICKUP else None
+            journal.notify(timestamp - rng.randrange(3), category,
+                           description, identifier,
+                           Location(rng.randrange(30), rng.randrange(30)),
+                           dispatched)
+    with JournalFile(journal_file) as activities:
+        assert len(activities) == 3000
+        assert activities.report() == journal.report()
+        assert activities.report(detailed=True) == \
+            journal.report(detailed=True)
+        for category in [RIDER, DRIVER]:
+            for actor in range(200):
+                expected = journal.activities(category, f'{category}{actor}')
+                assert [vars(a) for a in activities.activities(
+                    category, f'{category}{actor}')] == \
+                    [vars(a) for a in expected]
+        assert activities.activities(RIDER, 'Nobody') == []
+        found = [(category, vars(a))
+                 for category, a in activities.between(100, 200)]
+        assert found == [(activities.activity(position)[0],
+                          vars(activities.activity(position)[1]))
+                         for position in range(len(activities))
+                         if 100 <= activities.activity(position)[1].time
+                         < 200]
+        with pytest.raises(IndexError):
+            activities.activity(3000)
+    with Journal(str(tmp_path / "other.jnl")) as other:
+        with pytest.raises(ValueError):
+            other.notify(0, RIDER, 'wait', 'Almond', Location(0, 0))
+
+def test_journal_of_simulation(tmp_path) -> None:
+    """Test that a simulation can be journalled, and that a journal file is
+    rejected unless it is complete"""
+    journal_file = tmp_path / "activities.jnl"
+    expected = Simulation().run(create_event_list("events.txt"))
+    journal = Journal(str(journal_file), history=False)
+    assert Simulation(monitor=journal).run(
+        create_event_list("events.txt")) == expected
+    with pytest.raises(ValueError):
+        JournalFile(str(journal_file))
+    journal.close()
+    with JournalFile(str(journal_file)) as activities:
+        assert activities.report() == expected
+        times = [a.time for _, a in activities.between(5, 8)]
+        assert times == sorted(times) and set(times) <= {5, 6, 7}
+        trajectory = activities.activities(DRIVER, 'Amaranth')
+        assert [a.description for a in trajectory][:2] == [REQUEST, PICKUP]
+    journal_file.write_bytes(journal_file.read_bytes()[:-16])
+    with pytest.raises(ValueError):
+        JournalFile(str(journal_file))
+    with pytest.raises(ValueError):
+        JournalFile("events.txt")
+
 if __name__ == "__main__":
     pytest.main(['sample_tests.py'])
@@ -0,0 +1,406 @@
+"""Geographic sharding of the available drivers
+
+The city is split into square regions, and every region keeps its own
+spatial index of available drivers. A rider's request is answered from
+their own region first, and neighbouring regions are only consulted when
+a driver there could possibly arrive sooner.
+
+In batch mode, each region's waiting riders and available drivers are
+matched independently, optionally in worker processes, and the riders and
+drivers left over are then matched across regions.
+"""
+
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+from assignment import min_cost_assignment, travel_time_matrix
+from driver import Driver
+from grid import DriverGrid, cells_around
+from location import Location
+from rider import Rider
+from strategy import DispatchStrategy
+from travel import installed
+
+
+class RegionGrid:
+    """An index of available drivers, sharded into square regions of
+    <region_size> by <region_size> blocks with one DriverGrid each.
+
+    nearest() returns the same driver as a search of every available
+    driver, with ties going to the driver who became available first.
+    Regions are visited in rings around the location's own region, as cells
+    are in a DriverGrid, until no region further out could have a faster
+    driver. If a border radius is given, only regions within <border>
+    blocks of the location are searched, unless none of them has a driver;
+    the result is then still the same whenever the fastest driver is within
+    <border> blocks of the location.
+    """
+
+    # === Private Attributes ===
+    _region_size: int
+    #     The width and height of a region, in blocks.
+    _border: Optional[int]
+    #     How far outside a location's own region to search, in blocks, or
+    #     None to search as far as needed for an exact answer.
+    _regions: Dict[Tuple[int, int], DriverGrid]
+    #     The available drivers in each non-empty region.
+    _homes: Dict[str, Tuple[int, int]]
+    #     The region of every available driver, keyed by driver id.
+    _order: Dict[str, int]
+    #     The order in which every available driver became available.
+    _count: int
+    #     The order to give the next driver that becomes available.
+    _max_speed: int
+    #     The highest speed of any driver added so far.
+    _bounds: Optional[Tuple[int, int, int, int]]
+    #     The smallest and largest region row and column of any driver added
+    #     so far, or None if no driver has been added.
+    #
+    # === Representation Invariants ===
+    # - No region in _regions is empty.
+
+    def __init__(self, region_size: int = 64,
+                 border: Optional[int] = None) -> None:
+        """Initialize an empty RegionGrid.
+
+        Precondition: region_size > 0 and (border is None or border >= 0)
+        """
+        self._region_size = region_size
+        self._border = border
+        self._regions = {}
+        self._homes = {}
+        self._order = {}
+        self._count = 0
+        self._max_speed = 1
+        self._bounds = None
+
+    def __len__(self) -> int:
+        """Return the number of available drivers in this index.
+
+        >>> grid = RegionGrid()
+        >>> grid.add(Driver("Amaranth", Location(1, 1), 1))
+        >>> len(grid)
+        1
+        """
+        return len(self._homes)
+
+    def __contains__(self, driver: Driver) -> bool:
+        """Return True iff <driver> is in this index.
+
+        >>> grid = RegionGrid()
+        >>> driver = Driver("Amaranth", Location(1, 1), 1)
+        >>> driver in grid
+        False
+        >>> grid.add(driver)
+        >>> driver in grid
+        True
+        """
+        return driver.id in self._homes
+
+    def region(self, location: Location) -> Tuple[int, int]:
+        """Return the region containing <location>.
+
+        >>> RegionGrid(region_size=10).region(Location(25, 3))
+        (2, 0)
+        """
+        return location.row // self._region_size, \
+            location.column // self._region_size
+
+    def add(self, driver: Driver) -> None:
+        """Add <driver> to the region of their current location.
+
+        Precondition: <driver> is not in this index.
+        """
+        home = self.region(driver.location)
+        if home not in self._regions:
+            self._regions[home] = DriverGrid()
+        self._regions[home].add(driver)
+        self._homes[driver.id] = home
+        self._order[driver.id] = self._count
+        self._count += 1
+        self._max_speed = max(self._max_speed, driver.speed)
+        if self._bounds is None:
+            self._bounds = (home[0], home[0], home[1], home[1])
+        else:
+            min_row, max_row, min_col, max_col = self._bounds
+            self._bounds = (min(min_row, home[0]), max(max_row, home[0]),
+                            min(min_col, home[1]), max(max_col, home[1]))
+
+    def remove(self, driver: Driver) -> None:
+        """Remove <driver> from this index.
+
+        Precondition: <driver> is in this index.
+
+        >>> grid = RegionGrid()
+        >>> driver = Driver("Amaranth", Location(1, 1), 1)
+        >>> grid.add(driver)
+        >>> grid.remove(driver)
+        >>> len(grid)
+        0
+        """
+        home = self._homes.pop(driver.id)
+        del self._order[driver.id]
+        drivers = self._regions[home]
+        drivers.remove(driver)
+        if len(drivers) == 0:
+            del self._regions[home]
+
+    def nearest(self, location: Location) -> Optional[Driver]:
+        """Return the driver with the fastest travel time to <location>, or
+        None if this index is empty.
+
+        >>> grid = RegionGrid(region_size=4)
+        >>> grid.add(Driver("Amaranth", Location(1, 1), 1))
+        >>> grid.add(Driver("Bergamot", Location(9, 9), 4))
+        >>> grid.add(Driver("Crocus", Location(5, 5), 1))
+        >>> grid.nearest(Location(6, 6)).id
+        'Bergamot'
+        >>> grid.nearest(Location(2, 2)).id
+        'Amaranth'
+        >>> grid = RegionGrid(region_size=4, border=0)
+        >>> grid.add(Driver("Bergamot", Location(9, 9), 4))
+        >>> grid.nearest(Location(6, 6)).id
+        'Bergamot'
+        >>> grid.add(Driver("Crocus", Location(5, 5), 1))
+        >>> grid.nearest(Location(6, 6)).id
+        'Crocus'
+        """
+        if self._border is not None:
+            best = self._search(location, self._border)
+            if best is not None:
+                return best
+        # Cross-region fallback: only fall back to distant regions when no
+        # region within the border has a driver.
+        return self._search(location, None)
+
+    def _search(self, location: Location,
+                border: Optional[int]) -> Optional[Driver]:
+        """Return the driver with the fastest travel time to <location> in
+        the regions within <border> blocks of it, or in any region if
+        <border> is None, or None if there is no such driver.
+        """
+        if not self._regions:
+            return None
+        row, col = self.region(location)
+        min_row, max_row, min_col, max_col = self._bounds
+        last_ring = max(row - min_row, max_row - row) + \
+            max(col - min_col, max_col - col)
+        best = None
+        best_key = None
+        ring = 0
+        while ring <= last_ring:
+            bound = self._distance_bound(ring)
+            if border is not None and bound > border:
+                break
+            if best_key is not None and \
+                    bound // self._max_speed > best_key[0]:
+                break
+            if 4 * ring > len(self._regions):
+                # The rings are now bigger than the number of non-empty
+                # regions, so it is cheaper to visit those regions directly.
+                regions = [region for region in self._regions
+                           if abs(region[0] - row) + abs(region[1] - col)
+                           >= ring]
+                last_ring = -1
+            else:
+                regions = [region for region in cells_around(row, col, ring)
+                           if region in self._regions]
+            for region in regions:
+                distance = self._distance(location, region)
+                if (border is not None and distance > border) or \
+                        (best_key is not None and
+                         distance // self._max_speed > best_key[0]):
+                    continue
+                driver = self._regions[region].nearest(location)
+                key = (driver.get_travel_time(location),
+                       self._order[driver.id])
+                if best_key is None or key < best_key:
+                    best, best_key = driver, key
+            ring += 1
+        return best
+
+    def _distance_bound(self, ring: int) -> int:
+        """Return a lower bound on the Manhattan distance from a location to
+        any location in a region <ring> rings away from its region.
+
+        >>> RegionGrid(region_size=4)._distance_bound(3)
+        6
+        """
+        if ring == 0:
+            return 0
+        return max(0, (ring - 2) * self._region_size + 2)
+
+    def _distance(self, location: Location, region: Tuple[int, int]) -> int:
+        """Return the Manhattan distance from <location> to the closest
+        location in <region>.
+
+        >>> RegionGrid(region_size=4)._distance(Location(1, 9), (1, 1))
+        5
+        """
+        size = self._region_size
+        rows = max(0, region[0] * size - location.row,
+                   location.row - (region[0] + 1) * size + 1)
+        columns = max(0, region[1] * size - location.column,
+                      location.column - (region[1] + 1) * size + 1)
+        return rows + columns
+
+
+class ShardedStrategy(DispatchStrategy):
+    """A strategy whose available drivers are sharded into regions.
+
+    A greedy ShardedStrategy chooses the same drivers as the other greedy
+    strategies, using a RegionGrid to find them.
+
+    With a batch window, every region with both waiting riders and
+    available drivers is matched on its own, in a pool of <workers>
+    processes if <workers> is positive. If a travel service is installed,
+    regions are matched in this process instead, with its travel times.
+    The riders and drivers left over in all regions are then matched
+    together, so that a region with no available driver is served from its
+    neighbours. The total travel time can be higher than a
+    BatchStrategy's, which matches everyone at once.
+
+    Call close() to shut down the worker processes when done.
+    """
+
+    # === Private Attributes ===
+    _regions: RegionGrid
+    #     The available drivers.
+    _workers: int
+    #     The number of worker processes to match regions in, or 0 to match
+    #     them in this process.
+    _pool: Optional[Executor]
+    #     The pool of worker processes, or None if it has not been started.
+
+    def __init__(self, region_size: int = 64, border: Optional[int] = None,
+                 workers: int = 0, batch_window: Optional[int] = None) \
+            -> None:
+        """Initialize a ShardedStrategy.
+
+        region_size: the width and height of a region, in blocks.
+        border: how far outside a rider's region to look for a driver, in
+            blocks, as long as one is found there; or None to always find
+            the fastest driver.
+        workers: the number of worker processes for batch matching.
+        batch_window: the length of a batch window, or None to match
+            riders greedily.
+
+        Precondition: region_size > 0 and workers >= 0
+        """
+        super().__init__(batch_window)
+        self._regions = RegionGrid(region_size, border)
+        self._workers = workers
+        self._pool = None
+
+    def add(self, driver: Driver) -> None:
+        """Record that <driver> has become available.
+
+        """
+        self._regions.add(driver)
+
+    def remove(self, driver: Driver) -> None:
+        """Record that <driver> is no longer available.
+
+        """
+        self._regions.remove(driver)
+
+    def choose(self, rider: Rider, drivers: Dict[str, Driver]) -> Driver:
+        """Return the available driver with the fastest travel time to
+        <rider>, breaking ties in favour of the driver who became available
+        first, within the border radius if there is one.
+
+        Precondition: <drivers> is not empty.
+        """
+        return self._regions.nearest(rider.origin)
+
+    def match(self, riders: Sequence[Rider],
+              drivers: Sequence[Driver]) -> List[Tuple[int, int]]:
+        """Return the (rider, driver) index pairs that match <riders> to
+        <drivers>, one region at a time and then across regions, in
+        increasing order of rider.
+
+        >>> strategy = ShardedStrategy(region_size=5)
+        >>> drivers = [Driver("Amaranth", Location(0, 0), 1),
+        ...            Driver("Bergamot", Location(9, 0), 1)]
+        >>> riders = [Rider(name, 9, Location(row, 0), Location(0, 0))
+        ...           for name, row in [("Almond", 6), ("Bisque", 1),
+        ...                             ("Cerise", 7)]]
+        >>> strategy.match(riders, drivers)
+        [(1, 0), (2, 1)]
+        """
+        shards = {}
+        for i, rider in enumerate(riders):
+            shards.setdefault(self._regions.region(rider.origin),
+                              ([], []))[0].append(i)
+        for j, driver in enumerate(drivers):
+            region = self._regions.region(driver.location)
+            if region in shards:
+                shards[region][1].append(j)
+        shards = [shard for shard in shards.values() if shard[1]]
+
+        if installed() is not None:
+            # Worker processes do not have the installed service, so every
+            # region is matched here, with the service's travel times.
+            solutions = (min_cost_assignment(travel_time_matrix(
+                [riders[i] for i in rows], [drivers[j] for j in columns]))
+                for rows, columns in shards)
+        else:
+            problems = [([(riders[i].origin.row, riders[i].origin.column)
+                          for i in rows],
+                         [(drivers[j].location.row,
+                           drivers[j].location.column, drivers[j].speed)
+                          for j in columns])
+                        for rows, columns in shards]
+            if self._workers > 0 and len(problems) > 1:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(self._workers)
+                solutions = self._pool.map(
+                    _match_region, *zip(*problems),
+                    chunksize=max(1, len(problems) // (4 * self._workers)))
+            else:
+                solutions = (_match_region(*problem)
+                             for problem in problems)
+        matches = {}
+        for (rows, columns), solution in zip(shards, solutions):
+            for i, j in solution:
+                matches[rows[i]] = columns[j]
+
+        left_riders = [i for i in range(len(riders)) if i not in matches]
+        taken = set(matches.values())
+        left_drivers = [j for j in range(len(drivers)) if j not in taken]
+        cost = travel_time_matrix([riders[i] for i in left_riders],
+                                  [drivers[j] for j in left_drivers])
+        for i, j in min_cost_assignment(cost):
+            matches[left_riders[i]] = left_drivers[j]
+        return sorted(matches.items())
+
+    def close(self) -> None:
+        """Shut down the worker processes, if any were started.
+
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+def _match_region(riders: Sequence[Tuple[int, int]],
+                  drivers: Sequence[Tuple[int, int, int]]) \
+        -> List[Tuple[int, int]]:
+    """Return a minimum-cost assignment of drivers to riders in one region.
+
+    Riders are given as (row, column) origins and drivers as (row, column,
+    speed) triples, so that only plain tuples are sent to worker processes.
+
+    >>> _match_region([(0, 0), (5, 5)], [(4, 4, 1), (1, 0, 1)])
+    [(0, 1), (1, 0)]
+    """
+    cost = [[(abs(row - d_row) + abs(col - d_col)) // speed
+             for d_row, d_col, speed in drivers] for row, col in riders]
+    return min_cost_assignment(cost)
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['concurrent.futures', 'typing', 'assignment',
+                          'driver', 'grid', 'location', 'rider',
+                          'strategy', 'travel']})
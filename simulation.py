@@ -1,7 +1,9 @@
 """Starting point for simulation"""
 
-from typing import List, Dict
-from container import PriorityQueue
+from collections.abc import Sequence
+from operator import attrgetter
+from typing import Callable, Dict, Iterable, List, Optional
+from container import Container, PriorityQueue
 from dispatcher import Dispatcher
 from event import Event, create_event_list
 from monitor import Monitor
@@ -26,52 +28,143 @@ class Simulation:
     """
 
     # === Private Attributes ===
-    _events: PriorityQueue
+    _events: Container
     #     A sequence of events arranged in priority determined by the event
-    #     sorting order.
+    #     sorting order. This is a PriorityQueue unless another container
+    #     was given to the initializer.
     _dispatcher: Dispatcher
     #     The dispatcher associated with the simulation.
     _monitor: Monitor
     #     The monitor associated with the simulation.
-
-    def __init__(self) -> None:
+    _window: Optional[int]
+    #     The length of the windows of simulated time to report on, or None
+    #     if there are no windows.
+    _on_window: Optional[Callable[[Dict[str, int]], None]]
+    #     Called with a snapshot each time a window closes.
+
+    def __init__(self, events: Optional[Container] = None,
+                 dispatcher: Optional[Dispatcher] = None,
+                 monitor: Optional[Monitor] = None,
+                 window: Optional[int] = None,
+                 on_window: Optional[Callable[[Dict[str, int]], None]] =
+                 None) -> None:
         """Initialize a Simulation.
 
+        events: An empty container to use as the event queue, such as a
+            CalendarQueue. It must remove events in the same order as a
+            PriorityQueue. Defaults to a new PriorityQueue keyed by
+            timestamp.
+        dispatcher: The dispatcher to use, such as one in batch mode.
+            Defaults to a new Dispatcher.
+        monitor: A new monitor to record the activities, such as one
+            without history for long runs. Defaults to a new Monitor.
+        window: The length of simulated time that each snapshot passed to
+            <on_window> covers.
+        on_window: Called during run() with a snapshot of each window of
+            <window> time units, as soon as the window closes.
+
+        Precondition: window and on_window are both None, or window > 0
         """
-        self._events = PriorityQueue()
-        self._dispatcher = Dispatcher()
-        self._monitor = Monitor()
-
-    def run(self, initial_events: List[Event]) -> Dict[str, float]:
+        if events is None:
+            events = PriorityQueue(attrgetter('timestamp'))
+        if dispatcher is None:
+            dispatcher = Dispatcher()
+        self._events = events
+        self._dispatcher = dispatcher
+        if monitor is None:
+            monitor = Monitor()
+        self._monitor = monitor
+        self._window = window
+        self._on_window = on_window
+
+    def run(self, initial_events: Iterable[Event]) -> Dict[str, float]:
         """Run the simulation on the list of events in <initial_events>.
 
         Return a dictionary containing statistics of the simulation,
         according to the specifications in the assignment handout.
 
-        initial_events: An initial list of events.
+        initial_events: An initial list of events, or another sequence of
+            them such as a tuple, in any order; or any other iterable of
+            events in order of timestamp, such as event.stream_events() or
+            a loader.EventFile. An iterable that is not a Sequence is only
+            read as far as the simulation has got to, so its events never
+            all have to be in memory at once. A ValueError is raised if its
+            events are out of order.
+
+        If the simulation was given an on_window callback, it is called with
+        a snapshot of every window of simulated time, starting with the
+        window of the first event and ending with the window of the last.
+        Windows start at multiples of the window length. Each snapshot maps
+        'start' and 'end' to the times the window covers, 'events' to the
+        number of events done in it, 'requests', 'pickups' and
+        'cancellations' to the number of rider activities, and
+        'idle_drivers' and 'waiting_riders' to the number of available
+        drivers and waiting riders when it closed.
         """
-        # Add all initial events to the event queue.
-        for event1 in initial_events:
-            self._events.add(event1)
-
-        # Until there are no more events, remove an event
-        # from the event queue and do it. Add any returned
-        # events to the event queue.
-        while not self._events.is_empty():
-            event2 = self._events.remove()
+        if isinstance(initial_events, Sequence):
+            # Add all initial events to the event queue in one bulk
+            # operation.
+            self._events.add_many(initial_events)
+            pending = iter([])
+        else:
+            pending = iter(initial_events)
+
+        # Until there are no more events, take the next event and do it.
+        # Add any returned events to the event queue, keeping their handles
+        # so that they can be withdrawn.
+        window = self._window if self._on_window is not None else None
+        start = end = None
+        done = 0
+        next_event = next(pending, None)
+        while next_event is not None or not self._events.is_empty():
+            # An initial event goes before any queued event with the same
+            # timestamp, as it would if it had been queued at the start.
+            if next_event is not None and (
+                    self._events.is_empty() or
+                    next_event.timestamp <= self._events.peek().timestamp):
+                event2 = next_event
+                next_event = next(pending, None)
+                if next_event is not None and \
+                        next_event.timestamp < event2.timestamp:
+                    raise ValueError('initial events are not in order of '
+                                     'timestamp')
+            else:
+                event2 = self._events.remove()
+            if window is not None:
+                if end is None:
+                    start = event2.timestamp // window * window
+                    end = start + window
+                while event2.timestamp >= end:
+                    self._close_window(start, end, done)
+                    start, end, done = end, end + window, 0
+                done += 1
             returned_event = event2.do(self._dispatcher, self._monitor)
             if returned_event:
                 for new_event in returned_event:
-                    self._events.add(new_event)
+                    new_event.handle = self._events.add(new_event)
 
+        if end is not None:
+            self._close_window(start, end, done)
         return self._monitor.report()
 
+    def _close_window(self, start: int, end: int, events: int) -> None:
+        """Pass a snapshot of the window from <start> to <end>, in which
+        <events> events were done, to the on_window callback.
+
+        """
+        snapshot = {"start": start, "end": end, "events": events}
+        snapshot.update(self._monitor.close_window())
+        snapshot["idle_drivers"] = len(self._dispatcher.available_drivers)
+        snapshot["waiting_riders"] = len(self._dispatcher.waiting_riders)
+        self._on_window(snapshot)
+
 
 if __name__ == "__main__":
     import python_ta
     python_ta.check_all(
         config={
-            'extra-imports': ['typing', 'container', 'dispatcher', 'event',
+            'extra-imports': ['collections.abc', 'operator', 'typing',
+                              'container', 'dispatcher', 'event',
                               'monitor']})
 
     events = create_event_list("events.txt")
@@ -0,0 +1,217 @@
+"""Strategies for matching riders to drivers
+
+A Dispatcher keeps track of waiting riders and available drivers, and
+delegates the choice of which driver to give each rider to a
+DispatchStrategy. Every strategy here makes the same choices as the
+others, except BatchStrategy, which matches riders in batches. They all
+take their travel times from the travel module, so they still agree when a
+travel service is installed, as long as its distances are never shorter
+than Manhattan distances.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+from assignment import min_cost_assignment, travel_time_matrix
+from driver import Driver
+from fleet import DriverFleet
+from grid import DriverGrid
+from rider import Rider
+
+
+class DispatchStrategy:
+    """A way of choosing drivers for riders.
+
+    A strategy is told whenever a driver becomes available or stops being
+    available, so that it can keep an index of the available drivers.
+
+    Greedy strategies give each rider a driver as soon as the rider asks
+    for one. Batch strategies collect riders and drivers for a window of
+    time instead, and then match them all at once.
+
+    This is an abstract class.  Only child classes should be instantiated.
+
+    === Attributes ===
+    batch_window: The length of a batch window, or None for a greedy
+        strategy.
+    """
+    # Attribute Types
+    batch_window: Optional[int]
+
+    def __init__(self, batch_window: Optional[int] = None) -> None:
+        """Initialize a DispatchStrategy.
+
+        Precondition: batch_window is None or batch_window >= 0
+        """
+        self.batch_window = batch_window
+
+    def add(self, driver: Driver) -> None:
+        """Record that <driver> has become available.
+
+        """
+
+    def remove(self, driver: Driver) -> None:
+        """Record that <driver> is no longer available.
+
+        """
+
+    def choose(self, rider: Rider, drivers: Dict[str, Driver]) -> Driver:
+        """Return the driver in <drivers> with the fastest travel time to
+        <rider>, breaking ties in favour of the driver who became available
+        first.
+
+        <drivers> are the available drivers, in the order they became
+        available.
+
+        Precondition: <drivers> is not empty.
+        """
+        raise NotImplementedError("Implemented in a subclass")
+
+    def match(self, riders: Sequence[Rider],
+              drivers: Sequence[Driver]) -> List[Tuple[int, int]]:
+        """Return the (rider, driver) index pairs that match <riders> to
+        <drivers> with the smallest total travel time, in increasing order
+        of rider.
+
+        >>> from location import Location
+        >>> riders = [Rider("Almond", 5, Location(0, 0), Location(1, 1)),
+        ...           Rider("Bisque", 5, Location(4, 4), Location(1, 1))]
+        >>> drivers = [Driver("Amaranth", Location(1, 1), 1)]
+        >>> LinearStrategy().match(riders, drivers)
+        [(0, 0)]
+        """
+        return min_cost_assignment(travel_time_matrix(riders, drivers))
+
+    def close(self) -> None:
+        """Release any resources held by this strategy.
+
+        """
+
+
+class LinearStrategy(DispatchStrategy):
+    """A greedy strategy that scans every available driver.
+
+    """
+
+    def choose(self, rider: Rider, drivers: Dict[str, Driver]) -> Driver:
+        """Return the driver in <drivers> with the fastest travel time to
+        <rider>, breaking ties in favour of the driver who became available
+        first.
+
+        Precondition: <drivers> is not empty.
+
+        >>> from location import Location
+        >>> drivers = {"Amaranth": Driver("Amaranth", Location(1, 1), 1),
+        ...            "Bergamot": Driver("Bergamot", Location(5, 5), 1)}
+        >>> rider = Rider("Almond", 10, Location(4, 4), Location(1, 1))
+        >>> LinearStrategy().choose(rider, drivers).id
+        'Bergamot'
+        """
+        fastest_driver = None
+        fastest_time = 0
+        for driver in drivers.values():
+            travel_time = driver.get_travel_time(rider.origin)
+            if fastest_driver is None or travel_time < fastest_time:
+                fastest_driver = driver
+                fastest_time = travel_time
+        return fastest_driver
+
+
+class GridStrategy(DispatchStrategy):
+    """A greedy strategy that keeps the available drivers in a DriverGrid.
+
+    """
+
+    # === Private Attributes ===
+    _grid: DriverGrid
+    #     The available drivers.
+
+    def __init__(self, cell_size: int = 8) -> None:
+        """Initialize a GridStrategy with cells of <cell_size> blocks.
+
+        Precondition: cell_size > 0
+        """
+        super().__init__()
+        self._grid = DriverGrid(cell_size)
+
+    def add(self, driver: Driver) -> None:
+        """Record that <driver> has become available.
+
+        """
+        self._grid.add(driver)
+
+    def remove(self, driver: Driver) -> None:
+        """Record that <driver> is no longer available.
+
+        """
+        self._grid.remove(driver)
+
+    def choose(self, rider: Rider, drivers: Dict[str, Driver]) -> Driver:
+        """Return the available driver with the fastest travel time to
+        <rider>, breaking ties in favour of the driver who became available
+        first.
+
+        Precondition: <drivers> is not empty.
+        """
+        return self._grid.nearest(rider.origin)
+
+
+class FleetStrategy(DispatchStrategy):
+    """A greedy strategy that computes the travel times from every
+    available driver at once, with a DriverFleet.
+
+    """
+
+    # === Private Attributes ===
+    _fleet: DriverFleet
+    #     The drivers that have been available.
+
+    def __init__(self) -> None:
+        """Initialize a FleetStrategy.
+
+        """
+        super().__init__()
+        self._fleet = DriverFleet()
+
+    def add(self, driver: Driver) -> None:
+        """Record that <driver> has become available.
+
+        """
+        self._fleet.add(driver)
+
+    def remove(self, driver: Driver) -> None:
+        """Record that <driver> is no longer available.
+
+        """
+        self._fleet.remove(driver)
+
+    def choose(self, rider: Rider, drivers: Dict[str, Driver]) -> Driver:
+        """Return the available driver with the fastest travel time to
+        <rider>, breaking ties in favour of the driver who became available
+        first.
+
+        Precondition: <drivers> is not empty.
+        """
+        return self._fleet.nearest(rider.origin)
+
+
+class BatchStrategy(LinearStrategy):
+    """A strategy that collects riders and drivers for <batch_window> units
+    of time, and then matches them with the smallest total travel time.
+
+    """
+
+    def __init__(self, batch_window: int) -> None:
+        """Initialize a BatchStrategy.
+
+        Precondition: batch_window >= 0
+
+        >>> BatchStrategy(5).batch_window
+        5
+        """
+        super().__init__(batch_window)
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['typing', 'assignment', 'driver', 'fleet', 'grid',
+                          'rider']})
@@ -0,0 +1,176 @@
+"""Travel times for the simulation
+
+Drivers ask this module how long it takes to travel between two locations,
+and the monitor asks it how far drivers have driven. By default, the
+distance between locations is their Manhattan distance, and nothing is
+cached. Installing a TravelTimes service changes the distance function,
+memoizes travel times, or both.
+
+Every dispatch strategy uses the installed service. The grid and sharded
+strategies need every distance to be at least the Manhattan distance, and
+the fleet and batch strategies fall back from their vectorized Manhattan
+distances to asking the service for every travel time.
+"""
+
+from collections import OrderedDict
+from typing import Callable, Optional
+from location import Location, manhattan_distance
+
+
+class TravelTimes:
+    """A service that computes travel times with a distance function, and
+    remembers the most recently used ones.
+
+    Travel times are distances divided by speed, rounded down. Up to
+    <capacity> of them are kept in a least-recently-used cache keyed by
+    origin, destination and speed; a capacity of 0 disables the cache.
+
+    === Attributes ===
+    distance: The function giving the distance between two locations.
+    hits: The number of travel times found in the cache.
+    misses: The number of travel times that had to be computed.
+    evictions: The number of travel times dropped from the full cache.
+    """
+    # Attribute Types
+    distance: Callable[[Location, Location], int]
+    hits: int
+    misses: int
+    evictions: int
+
+    # === Private Attributes ===
+    _capacity: int
+    #     The largest number of travel times to remember.
+    _cache: OrderedDict
+    #     The remembered travel times, keyed by the coordinates of the
+    #     origin and destination and the speed, least recently used first.
+
+    def __init__(self, capacity: int = 65536,
+                 distance: Callable[[Location, Location], int] =
+                 manhattan_distance) -> None:
+        """Initialize a TravelTimes service.
+
+        Precondition: capacity >= 0, and <distance> always gives the same
+        distance for the same pair of locations.
+        """
+        self.distance = distance
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._capacity = capacity
+        self._cache = OrderedDict()
+
+    def __len__(self) -> int:
+        """Return the number of travel times in the cache.
+
+        >>> service = TravelTimes()
+        >>> service.travel_time(Location(0, 0), Location(3, 4), 2)
+        3
+        >>> len(service)
+        1
+        """
+        return len(self._cache)
+
+    def travel_time(self, origin: Location, destination: Location,
+                    speed: int) -> int:
+        """Return the time it takes to travel from <origin> to
+        <destination> at <speed>, rounded down.
+
+        >>> service = TravelTimes(capacity=2)
+        >>> for column in [1, 2, 1, 3, 2]:
+        ...     _ = service.travel_time(Location(0, 0), Location(0, column), 1)
+        >>> service.hits, service.misses, service.evictions
+        (1, 4, 2)
+        """
+        key = (origin.row, origin.column, destination.row,
+               destination.column, speed)
+        cache = self._cache
+        time = cache.get(key)
+        if time is not None:
+            self.hits += 1
+            cache.move_to_end(key)
+            return time
+        self.misses += 1
+        time = self.distance(origin, destination) // speed
+        if self._capacity > 0:
+            if len(cache) >= self._capacity:
+                cache.popitem(last=False)
+                self.evictions += 1
+            cache[key] = time
+        return time
+
+    def clear(self) -> None:
+        """Forget every remembered travel time, and reset the counters.
+
+        >>> service = TravelTimes()
+        >>> service.travel_time(Location(0, 0), Location(3, 4), 2)
+        3
+        >>> service.clear()
+        >>> len(service), service.misses
+        (0, 0)
+        """
+        self._cache.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+_service: Optional[TravelTimes] = None
+# The installed service, or None to use uncached Manhattan distances.
+
+
+def install(service: Optional[TravelTimes]) -> Optional[TravelTimes]:
+    """Make <service> compute every travel time from now on, or go back to
+    uncached Manhattan distances if <service> is None.
+
+    Return the service that was installed before.
+
+    >>> service = TravelTimes(distance=lambda origin, destination: 10)
+    >>> previous = install(service)
+    >>> travel_time(Location(0, 0), Location(3, 4), 2)
+    5
+    >>> install(previous) is service
+    True
+    """
+    global _service
+    previous = _service
+    _service = service
+    return previous
+
+
+def installed() -> Optional[TravelTimes]:
+    """Return the installed service, or None if there is none.
+
+    >>> installed() is None
+    True
+    """
+    return _service
+
+
+def distance(origin: Location, destination: Location) -> int:
+    """Return the distance from <origin> to <destination>, using the
+    installed service's distance function if there is one.
+
+    >>> distance(Location(5, 5), Location(9, 7))
+    6
+    """
+    if _service is None:
+        return manhattan_distance(origin, destination)
+    return _service.distance(origin, destination)
+
+
+def travel_time(origin: Location, destination: Location, speed: int) -> int:
+    """Return the time it takes to travel from <origin> to <destination>
+    at <speed>, rounded down, using the installed service if there is one.
+
+    >>> travel_time(Location(5, 5), Location(9, 7), 2)
+    3
+    """
+    if _service is None:
+        return manhattan_distance(origin, destination) // speed
+    return _service.travel_time(origin, destination, speed)
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(
+        config={'extra-imports': ['collections', 'typing', 'location']})